@@ -0,0 +1,35 @@
+-- ============================================================
+-- MIGRAZIONE: Contatori annunci per stato/proprietario
+-- Mia Per Sempre - totali dashboard in O(1)
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS property_counters (
+    owner_id INTEGER NOT NULL,          -- 0 = totali globali
+    status propertystatus NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_id, status)
+);
+
+-- Backfill dai dati esistenti (i successivi aggiornamenti sono applicativi)
+TRUNCATE property_counters;
+
+INSERT INTO property_counters (owner_id, status, count)
+SELECT owner_id, status, COUNT(*)
+FROM properties
+GROUP BY owner_id, status;
+
+INSERT INTO property_counters (owner_id, status, count)
+SELECT 0, status, COUNT(*)
+FROM properties
+GROUP BY status;
+
+-- ============================================================
+-- VERIFICA (deve restituire 0 righe)
+-- ============================================================
+
+-- SELECT c.status, c.count, COUNT(p.id)
+-- FROM property_counters c
+-- LEFT JOIN properties p ON p.status = c.status
+-- WHERE c.owner_id = 0
+-- GROUP BY c.status, c.count
+-- HAVING c.count <> COUNT(p.id);
@@ -0,0 +1,28 @@
+-- ============================================================
+-- MIGRAZIONE: Metriche derivate annunci
+-- Mia Per Sempre - ordinamento/filtri per sconto, €/mq, deal score
+-- ============================================================
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS discount_pct FLOAT;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS price_per_sqm FLOAT;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS omi_price_sqm FLOAT;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS deal_score FLOAT;
+
+-- Valori calcolabili senza OMI (il resto: python -m app.tasks.recompute_listing_metrics)
+UPDATE properties SET
+    discount_pct = CASE
+        WHEN full_property_value > 0
+        THEN ROUND(((full_property_value - bare_property_value) / full_property_value * 100)::numeric, 1)
+    END,
+    price_per_sqm = CASE
+        WHEN surface_sqm > 0
+        THEN ROUND((bare_property_value / surface_sqm)::numeric, 2)
+    END;
+
+-- ============================================================
+-- INDICI (ordinamento su /properties/search)
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS ix_properties_discount_pct ON properties(discount_pct);
+CREATE INDEX IF NOT EXISTS ix_properties_price_per_sqm ON properties(price_per_sqm);
+CREATE INDEX IF NOT EXISTS ix_properties_deal_score ON properties(deal_score);
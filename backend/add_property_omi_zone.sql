@@ -0,0 +1,12 @@
+-- ============================================================
+-- MIGRAZIONE: Zona OMI degli annunci
+-- Mia Per Sempre - zona localizzata dalle coordinate (perimetri OMI)
+-- ============================================================
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS omi_link_zona VARCHAR(10);
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS omi_zona_codice VARCHAR(10);
+
+-- Valorizzate in scrittura (crud) se l'annuncio ha coordinate e le
+-- geometrie sono state importate (import_omi_data.py --zone-geometry)
+
+CREATE INDEX IF NOT EXISTS ix_properties_omi_link_zona ON properties(omi_link_zona);
@@ -0,0 +1,45 @@
+-- ============================================================
+-- MIGRAZIONE: Ricerca full-text su titolo e descrizione
+-- Mia Per Sempre - properties.search_vector
+-- ============================================================
+
+-- Colonna tsvector (titolo peso A, descrizione peso B)
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+-- Funzione trigger: mantiene search_vector ad ogni scrittura
+CREATE OR REPLACE FUNCTION properties_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('italian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('italian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS properties_search_vector_trigger ON properties;
+CREATE TRIGGER properties_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON properties
+    FOR EACH ROW EXECUTE FUNCTION properties_search_vector_update();
+
+-- Popola le righe esistenti
+UPDATE properties SET
+    search_vector =
+        setweight(to_tsvector('italian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('italian', coalesce(description, '')), 'B');
+
+-- ============================================================
+-- INDICI
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS ix_properties_search_vector
+    ON properties USING GIN (search_vector);
+
+-- ============================================================
+-- QUERY UTILI
+-- ============================================================
+
+-- Ricerca con ranking
+-- SELECT id, title, ts_rank(search_vector, websearch_to_tsquery('italian', 'attico terrazzo')) AS rank
+-- FROM properties
+-- WHERE search_vector @@ websearch_to_tsquery('italian', 'attico terrazzo')
+-- ORDER BY rank DESC;
@@ -19,6 +19,7 @@ from pathlib import Path
 import logging
 
 from app.api.deps import get_db, get_current_user
+from app.core.cache import invalidate_listing
 from app.models.user import User
 from app.models.property import Property
 from app.models.property_image import PropertyImage
@@ -157,6 +158,7 @@ async def upload_images(
     
     # Commit finale
     db.commit()
+    invalidate_listing(property_id)
     
     # Calcola risparmio totale
     total_saving_kb = total_original_size - total_new_size
@@ -278,6 +280,7 @@ async def delete_image(
             img.is_cover = 0
     
     db.commit()
+    invalidate_listing(property_id)
     
     logger.info(f"Eliminata immagine {image_id} da immobile {property_id}")
     
@@ -362,6 +365,7 @@ async def reorder_images(
             image.is_cover = 1 if idx == 0 else 0
     
     db.commit()
+    invalidate_listing(property_id)
     
     return {
         'success': True,
@@ -417,6 +421,7 @@ async def set_cover_image(
     image.display_order = 0  # Porta in prima posizione
     
     db.commit()
+    invalidate_listing(property_id)
     
     return {
         'success': True,
@@ -1,25 +1,56 @@
 # backend/app/api/endpoints/properties.py
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_active_user
+from app.core.cache import (
+    LISTINGS_TAG,
+    RenderedResponse,
+    cached_json_response,
+    invalidate_listing,
+    listing_cache,
+    make_cache_key,
+    property_tag
+)
 from app.models.user import User
 from app.models.property import PropertyStatus
+from app.models.property_valuation import PropertyValuation
 from app.crud import property as crud_property
+from app.services.deal_distribution import deal_score_rank
+from app.services.risk_simulation import DEFAULT_SIMULATIONS, MAX_SIMULATIONS
+from app.services.valuation_service import get_valuation_service
 from app.schemas.property import (
+    DealScoreRank,
     Property,
     PropertyCreate,
     PropertyUpdate,
-    PropertyList
+    PropertyList,
+    PropertySort,
+    PropertyStats
 )
 
 router = APIRouter()
 
+_property_list_adapter = TypeAdapter(List[PropertyList])
+
+
+def _render_list(properties) -> RenderedResponse:
+    """Serialize a listing page, tagged for invalidation"""
+    return RenderedResponse(
+        body=_property_list_adapter.dump_json(
+            [PropertyList.model_validate(p) for p in properties]
+        ),
+        tags={LISTINGS_TAG} | {property_tag(p.id) for p in properties}
+    )
+
 
 @router.get("/", response_model=List[PropertyList])
 def list_properties(
+    request: Request,
+    background_tasks: BackgroundTasks,
     skip: int = 0,
     limit: int = Query(default=100, le=100),
     city: Optional[str] = None,
@@ -28,16 +59,26 @@ def list_properties(
 ):
     """
     Get list of properties
-    Public endpoint - returns published properties by default
+    Public endpoint - returns published properties by default (cached)
     """
-    properties = crud_property.get_properties(
-        db,
-        skip=skip,
-        limit=limit,
-        status=status,
-        city=city
+    key = make_cache_key("list", {
+        "skip": skip, "limit": limit, "city": city, "status": status
+    })
+    
+    return cached_json_response(
+        request,
+        background_tasks,
+        listing_cache,
+        key,
+        lambda session: _render_list(crud_property.get_properties(
+            session,
+            skip=skip,
+            limit=limit,
+            status=status,
+            city=city
+        )),
+        db
     )
-    return properties
 
 
 @router.get("/my", response_model=List[Property])
@@ -60,8 +101,31 @@ def get_my_properties(
     return properties
 
 
+@router.get("/stats", response_model=PropertyStats)
+def get_my_property_stats(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Dashboard totals for the current user
+    Read from maintained counters, no table scan
+    """
+    by_status = crud_property.count_properties_by_status(db, owner_id=current_user.id)
+    
+    return PropertyStats(
+        total=sum(
+            count for status, count in by_status.items()
+            if status != PropertyStatus.DELETED
+        ),
+        by_status=by_status,
+        published_total=crud_property.count_properties(db, status=PropertyStatus.PUBLISHED)
+    )
+
+
 @router.get("/search", response_model=List[PropertyList])
 def search_properties(
+    request: Request,
+    background_tasks: BackgroundTasks,
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
     min_sqm: Optional[float] = Query(None, ge=0),
@@ -70,38 +134,117 @@ def search_properties(
     city: Optional[str] = None,
     province: Optional[str] = None,
     property_type: Optional[str] = None,
+    q: Optional[str] = Query(
+        None,
+        min_length=2,
+        max_length=200,
+        description="Parole da cercare in titolo e descrizione"
+    ),
+    min_discount: Optional[float] = Query(None, description="Sconto minimo % sulla piena proprietà"),
+    max_price_sqm: Optional[float] = Query(None, ge=0, description="€/mq massimo (nuda proprietà)"),
+    min_deal_score: Optional[float] = Query(None, description="Scarto minimo % sotto la stima OMI"),
+    sort: Optional[PropertySort] = Query(
+        None,
+        description="Ordinamento (default: rilevanza con q, altrimenti recenti)"
+    ),
     skip: int = 0,
     limit: int = Query(default=100, le=100),
     db: Session = Depends(get_db)
 ):
     """
     Advanced search for properties
-    Public endpoint
+    Public endpoint (cached). With q, results are ordered by text relevance
     """
-    properties = crud_property.search_properties(
-        db,
-        min_price=min_price,
-        max_price=max_price,
-        min_sqm=min_sqm,
-        max_sqm=max_sqm,
-        min_rooms=min_rooms,
-        city=city,
-        province=province,
-        property_type=property_type,
-        skip=skip,
-        limit=limit
+    filters = {
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_sqm": min_sqm,
+        "max_sqm": max_sqm,
+        "min_rooms": min_rooms,
+        "city": city,
+        "province": province,
+        "property_type": property_type,
+        "q": q,
+        "min_discount": min_discount,
+        "max_price_sqm": max_price_sqm,
+        "min_deal_score": min_deal_score,
+        "sort": sort.value if sort else None,
+    }
+    key = make_cache_key("search", {**filters, "skip": skip, "limit": limit})
+    
+    return cached_json_response(
+        request,
+        background_tasks,
+        listing_cache,
+        key,
+        lambda session: _render_list(crud_property.search_properties(
+            session,
+            **filters,
+            skip=skip,
+            limit=limit
+        )),
+        db
+    )
+
+
+def _render_property(db: Session, property_id: int) -> Optional[RenderedResponse]:
+    property = crud_property.get_property(db, property_id=property_id)
+    if not property:
+        return None
+    data = Property.model_validate(property)
+    rank = deal_score_rank(db, property)
+    if rank:
+        data.deal_score_rank = DealScoreRank(**rank)
+    return RenderedResponse(
+        body=data.model_dump_json().encode(),
+        tags={property_tag(property.id)}
     )
-    return properties
 
 
 @router.get("/{property_id}", response_model=Property)
 def get_property(
     property_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Get property by ID
-    Public endpoint - increments view counter
+    Public endpoint - increments view counter (body cached, counter is not).
+    Includes the deal score percentile within the listing's OMI zone.
+    """
+    response = cached_json_response(
+        request,
+        background_tasks,
+        listing_cache,
+        make_cache_key("detail", {"id": property_id}),
+        lambda session: _render_property(session, property_id),
+        db
+    )
+    
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Property not found"
+        )
+    
+    # Increment views
+    crud_property.increment_views_by_id(db, property_id)
+    
+    return response
+
+
+@router.get("/{property_id}/simulation")
+def simulate_property_returns(
+    property_id: int,
+    simulazioni: int = Query(default=DEFAULT_SIMULATIONS, ge=1000, le=MAX_SIMULATIONS),
+    seed: Optional[int] = Query(default=None, ge=0, le=2**32 - 1),
+    sesso: Optional[str] = Query(default=None, pattern="^[MF]$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Monte Carlo distribution of returns for buying the listing's bare ownership
+    Public endpoint - percentiles only; pass the returned seed to reproduce
     """
     property = crud_property.get_property(db, property_id=property_id)
     
@@ -111,10 +254,61 @@ def get_property(
             detail="Property not found"
         )
     
-    # Increment views
-    crud_property.increment_views(db, property)
+    # Full value: seller's figure, else the OMI reference for the surface
+    full_value = property.full_property_value
+    if not full_value and property.omi_price_sqm:
+        full_value = property.omi_price_sqm * property.surface_sqm
+    if not full_value:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Full property value not available for this property"
+        )
     
-    return property
+    simulation = get_valuation_service().simulate_investment(
+        comune=property.city,
+        purchase_price=property.bare_property_value,
+        full_property_value=full_value,
+        usufructuary_age=property.usufructuary_age,
+        sex=sesso,
+        zona_codice=property.omi_zona_codice,
+        simulations=simulazioni,
+        seed=seed
+    )
+    if simulation is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Life tables not available"
+        )
+    
+    return {"property_id": property_id, **simulation}
+
+
+@router.get("/{property_id}/valuation")
+def get_property_valuation(
+    property_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Stored valuation of the listing (engine estimate, not the seller's figures)
+    Public endpoint - refreshed incrementally by app.tasks.refresh_property_valuations;
+    aggiornata is false while a dependency change is pending
+    """
+    valuation = db.get(PropertyValuation, property_id)
+    
+    if not valuation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Valuation not available for this property"
+        )
+    
+    return {
+        "property_id": property_id,
+        "aggiornata": not valuation.stale and valuation.input_hash is not None,
+        "calcolata_il": valuation.computed_at,
+        "semestre": valuation.semestre,
+        "tasso_legale": valuation.legal_rate,
+        "valutazione": valuation.result
+    }
 
 
 @router.post("/", response_model=Property, status_code=status.HTTP_201_CREATED)
@@ -132,6 +326,7 @@ def create_property(
         property_in=property_in,
         owner_id=current_user.id
     )
+    invalidate_listing(property.id)
     return property
 
 
@@ -162,6 +357,7 @@ def update_property(
         )
     
     property = crud_property.update_property(db, property, property_in)
+    invalidate_listing(property.id)
     return property
 
 
@@ -191,6 +387,7 @@ def delete_property(
         )
     
     crud_property.delete_property(db, property)
+    invalidate_listing(property_id)
     return None
 
 
@@ -220,4 +417,5 @@ def publish_property(
         )
     
     property = crud_property.publish_property(db, property)
+    invalidate_listing(property.id)
     return property
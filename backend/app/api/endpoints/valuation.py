@@ -5,18 +5,25 @@ Mia Per Sempre - Marketplace Nuda Proprietà
 
 Endpoint:
 - POST /api/v1/valuation/calculate - Calcola valutazione completa
+- GET /api/v1/valuation/report/{valutazione_id} - Report testuale di una valutazione in cache
+- POST /api/v1/valuation/sensitivity - Griglia what-if su età, stato, superficie, prezzo
 - GET /api/v1/valuation/coefficients - Visualizza coefficienti usufrutto
 - GET /api/v1/valuation/zones/{comune} - Lista zone OMI per comune
+- GET /api/v1/valuation/trend - Serie storica quotazioni OMI di una zona
+- GET /api/v1/valuation/comuni - Autocompletamento comuni OMI
+- GET /api/v1/valuation/actuarial - Griglia età × tasso del valore attuariale
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, Field, field_validator
+from fastapi import APIRouter, HTTPException, Path, Query, Response
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional, Dict, Any, List
 from enum import Enum
 import logging
 
 # Import dal servizio esistente
-from app.services.valuation_service import ValuationService, PropertyData
+from app.services.actuarial import DEFAULT_DISCOUNT_RATE, actuarial_grid
+from app.services.valuation_cache import MISS, fingerprint_cache_key, input_fingerprint, valuation_cache
+from app.services.valuation_service import ValuationService, PropertyData, get_valuation_service
 
 # Logger
 logger = logging.getLogger(__name__)
@@ -25,6 +32,35 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+# Formato semestre OMI (es. 2024/2)
+SEMESTRE_PATTERN = r"^\d{4}/[12]$"
+
+# Codice ISTAT del comune (6 cifre, es. 068028)
+ISTAT_PATTERN = r"^\d{6}$"
+
+# Sesso usufruttuario per le tavole di mortalità
+SESSO_PATTERN = "^[MF]$"
+
+# Tipo di usufrutto e durata massima del temporaneo (anni)
+TIPO_USUFRUTTO_PATTERN = "^(vitalizio|temporaneo)$"
+MAX_DURATA_USUFRUTTO = 100
+
+# Tassi di sconto della griglia attuariale (default e massimo numero di colonne)
+DEFAULT_TASSI = [0.02, 0.025, 0.03, 0.04, 0.05]
+MAX_TASSI = 20
+
+# Id di una valutazione in cache (impronta SHA-256 degli input)
+VALUTAZIONE_ID_PATTERN = r"^[0-9a-f]{64}$"
+
+# Parti opzionali della risposta di /calculate (?include=report)
+INCLUDE_REPORT = "report"
+INCLUDE_PATTERN = rf"^{INCLUDE_REPORT}$"
+
+# Griglia what-if: punti per asse e celle totali
+MAX_PUNTI_ASSE = 50
+MAX_CELLE = 10000
+
+
 # ============================================================
 # ENUMS PER REQUEST
 # ============================================================
@@ -105,6 +141,26 @@ class ValutazioneRequest(BaseModel):
         description="Codice zona OMI specifico (es. B1, C2)"
     )
     
+    comune_istat: Optional[str] = Field(
+        default=None,
+        description="Codice ISTAT del comune (da /comuni); se presente prevale sul nome",
+        pattern=ISTAT_PATTERN
+    )
+    
+    latitudine: Optional[float] = Field(
+        default=None,
+        ge=-90,
+        le=90,
+        description="Latitudine immobile: senza zona_codice la zona OMI è localizzata dai perimetri"
+    )
+    
+    longitudine: Optional[float] = Field(
+        default=None,
+        ge=-180,
+        le=180,
+        description="Longitudine immobile"
+    )
+    
     # === SUPERFICI ===
     superficie: float = Field(
         ...,
@@ -138,6 +194,13 @@ class ValutazioneRequest(BaseModel):
         description="Superficie cantina in mq"
     )
     
+    locali: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=20,
+        description="Numero locali (per la ricerca di annunci comparabili)"
+    )
+    
     # === PERTINENZE ===
     has_box: bool = Field(default=False, description="Presenza box auto")
     num_garages: int = Field(default=0, ge=0, description="Numero garage")
@@ -214,7 +277,29 @@ class ValutazioneRequest(BaseModel):
     
     tipo_usufrutto: str = Field(
         default="vitalizio",
-        description="Tipo usufrutto: vitalizio o temporaneo"
+        description="Tipo usufrutto: vitalizio o temporaneo",
+        pattern=TIPO_USUFRUTTO_PATTERN
+    )
+    
+    durata_usufrutto: Optional[float] = Field(
+        default=None,
+        gt=0,
+        le=MAX_DURATA_USUFRUTTO,
+        description="Durata in anni dell'usufrutto temporaneo (obbligatoria se temporaneo)",
+        examples=[10, 20]
+    )
+    
+    sesso_usufruttuario: Optional[str] = Field(
+        default=None,
+        description="Sesso usufruttuario per le tavole di mortalità: M o F (default media)",
+        pattern=SESSO_PATTERN
+    )
+    
+    tasso_sconto: float = Field(
+        default=DEFAULT_DISCOUNT_RATE,
+        ge=0,
+        le=0.2,
+        description="Tasso di sconto annuo del valore attuariale (0.03 = 3%)"
     )
     
     # === PREZZO RICHIESTO (opzionale) ===
@@ -225,6 +310,13 @@ class ValutazioneRequest(BaseModel):
         examples=[115000, 185000, 350000]
     )
     
+    # === SEMESTRE OMI (opzionale) ===
+    semestre: Optional[str] = Field(
+        default=None,
+        description="Semestre OMI di riferimento (es. 2024/2); default semestre corrente",
+        pattern=SEMESTRE_PATTERN
+    )
+    
     # === VALIDATORS ===
     @field_validator('comune', mode='before')
     @classmethod
@@ -239,7 +331,27 @@ class ValutazioneRequest(BaseModel):
         if isinstance(v, str):
             return v.strip().upper()
         return v
-
+    
+    @field_validator('sesso_usufruttuario', mode='before')
+    @classmethod
+    def normalize_sesso(cls, v):
+        if isinstance(v, str):
+            return v.strip().upper()[:1] or None
+        return v
+    
+    @field_validator('tipo_usufrutto', mode='before')
+    @classmethod
+    def normalize_tipo_usufrutto(cls, v):
+        if isinstance(v, str):
+            return v.strip().lower()
+        return v
+    
+    @model_validator(mode='after')
+    def check_durata_usufrutto(self):
+        if self.tipo_usufrutto == "temporaneo" and self.durata_usufrutto is None:
+            raise ValueError("durata_usufrutto obbligatoria per l'usufrutto temporaneo")
+        return self
+    
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -272,12 +384,155 @@ class ValutazioneRequest(BaseModel):
 class ValutazioneResponse(BaseModel):
     """Response completa della valutazione"""
     success: bool = True
+    valutazione_id: Optional[str] = None  # Per GET /report/{valutazione_id}
     valutazione: Dict[str, Any]
-    report: Optional[str] = None
+    report: Optional[str] = None  # Solo con ?include=report
     
     model_config = {"from_attributes": True}
 
 
+# ============================================================
+# SENSITIVITY SCHEMA
+# ============================================================
+
+class IntervalloAsse(BaseModel):
+    """Asse della griglia: valori da min a max inclusi, con passo"""
+    min: float = Field(..., ge=0)
+    max: float = Field(..., ge=0)
+    passo: float = Field(..., gt=0)
+    
+    @model_validator(mode='after')
+    def check_punti(self):
+        if self.max < self.min:
+            raise ValueError("max deve essere maggiore o uguale a min")
+        if len(self.valori()) > MAX_PUNTI_ASSE:
+            raise ValueError(f"Al massimo {MAX_PUNTI_ASSE} punti per asse")
+        return self
+    
+    def valori(self) -> List[float]:
+        count = int((self.max - self.min) / self.passo + 1e-9) + 1
+        return [round(self.min + i * self.passo, 6) for i in range(count)]
+
+
+class SensitivityRequest(BaseModel):
+    """
+    Valutazione base più gli assi da variare; gli assi non indicati
+    restano al valore della richiesta base.
+    """
+    base: ValutazioneRequest
+    eta: Optional[IntervalloAsse] = Field(default=None, description="Età usufruttuario (es. 70-90 passo 1)")
+    stati_conservazione: Optional[List[StatoConservazione]] = Field(
+        default=None, max_length=len(StatoConservazione), description="Stati di conservazione da confrontare"
+    )
+    superficie: Optional[IntervalloAsse] = Field(default=None, description="Superficie principale in mq")
+    prezzo_richiesto: Optional[IntervalloAsse] = Field(default=None, description="Prezzo richiesto in €")
+    
+    @field_validator('eta')
+    @classmethod
+    def check_eta(cls, v):
+        if v is not None and (v.max > 100 or any(age != int(age) for age in v.valori())):
+            raise ValueError("Età intere tra 0 e 100")
+        return v
+    
+    @field_validator('superficie')
+    @classmethod
+    def check_superficie(cls, v):
+        if v is not None and (v.min <= 0 or v.max > 2000):
+            raise ValueError("Superficie tra 0 e 2000 mq")
+        return v
+    
+    @model_validator(mode='after')
+    def check_celle(self):
+        celle = 1
+        for asse in (self.eta, self.superficie, self.prezzo_richiesto):
+            celle *= len(asse.valori()) if asse else 1
+        celle *= len(self.stati_conservazione or [None])
+        if celle > MAX_CELLE:
+            raise ValueError(f"Griglia di {celle} celle: massimo {MAX_CELLE}")
+        return self
+
+
+# ============================================================
+# RISOLUZIONE COMUNE
+# ============================================================
+
+def resolve_comune(service: ValuationService, comune: str, comune_istat: Optional[str] = None):
+    """
+    Nome ufficiale e codice ISTAT del comune digitato, tramite l'indice
+    dei comuni (accenti, apostrofi e preposizioni non contano).
+    
+    Returns:
+        (nome, istat); se l'indice non è disponibile (nome, comune_istat)
+    
+    Raises:
+        HTTPException 404 con i comuni più simili se non risolvibile
+    """
+    index = service.get_comuni_index()
+    if index is None:
+        return comune, comune_istat
+    
+    if comune_istat:
+        found = index.get(comune_istat)
+        if found is not None:
+            return found.nome, found.istat
+        match = None
+    else:
+        match = index.resolve(comune)
+    if match is not None:
+        return match.comune.nome, match.comune.istat
+    
+    raise HTTPException(
+        status_code=404,
+        detail={
+            "success": False,
+            "error": f"Comune '{comune_istat or comune}' non trovato nel database OMI",
+            "suggestions": [m.comune.nome for m in index.suggest(comune, limit=5)]
+        }
+    )
+
+
+def build_property_data(request: ValutazioneRequest, comune: str, comune_istat: Optional[str]) -> PropertyData:
+    """PropertyData dal request (comune già risolto con resolve_comune)"""
+    return PropertyData(
+        comune=comune,
+        comune_istat=comune_istat,
+        provincia=request.provincia,
+        fascia=request.fascia,
+        zona_codice=request.zona_codice,
+        latitude=request.latitudine,
+        longitude=request.longitudine,
+        surface_sqm=request.superficie,
+        rooms=request.locali,
+        balcony_surface=request.superficie_balconi,
+        terrace_surface=request.superficie_terrazzi,
+        garden_surface=request.superficie_giardino,
+        cellar_surface=request.superficie_cantina,
+        has_box=request.has_box,
+        num_garages=request.num_garages,
+        num_parking=request.num_parking,
+        floor=request.piano,
+        has_elevator=request.has_ascensore,
+        is_attic=request.is_attico,
+        is_last_floor=request.is_ultimo_piano,
+        has_garden=request.has_giardino,
+        condition=request.stato_conservazione.value,
+        brightness=request.luminosita.value,
+        view=request.vista.value,
+        building_year=request.anno_costruzione,
+        renovation_year=request.anno_ristrutturazione,
+        building_condition=request.stato_edificio.value,
+        heating_type=request.tipo_riscaldamento.value,
+        energy_class=request.classe_energetica,
+        usufructuary_age=request.eta_usufruttuario,
+        usufruct_type=request.tipo_usufrutto,
+        usufruct_years=request.durata_usufrutto,
+        usufructuary_sex=request.sesso_usufruttuario,
+        discount_rate=request.tasso_sconto,
+        requested_price=request.prezzo_richiesto,
+        semestre=request.semestre
+    )
+
+
 # ============================================================
 # ENDPOINT PRINCIPALE: CALCOLO VALUTAZIONE
 # ============================================================
@@ -294,7 +549,14 @@ class ValutazioneResponse(BaseModel):
     1. **Valore Piena Proprietà**: Stima OMI base
     2. **Stima Mia Per Sempre**: Con coefficienti di merito
     3. **Valore Fiscale**: Per successioni/donazioni
-    4. **Deal Score**: Valutazione affare (se prezzo_richiesto fornito)
+    4. **Valore Attuariale**: Da tavole di mortalità e tasso di sconto
+    5. **Deal Score**: Valutazione affare (se prezzo_richiesto fornito)
+    
+    Richieste identiche (stesso semestre OMI e tasso legale) sono servite
+    dalla cache: header `X-Cache` HIT, HIT-SHARED o MISS.
+    
+    Il report testuale è incluso solo con `?include=report`; altrimenti si
+    ottiene dopo con GET /report/{valutazione_id}.
     
     ## Esempio Minimo
     
@@ -307,70 +569,63 @@ class ValutazioneResponse(BaseModel):
     ```
     """
 )
-async def calculate_valuation(request: ValutazioneRequest) -> ValutazioneResponse:
+async def calculate_valuation(
+    request: ValutazioneRequest,
+    response: Response,
+    include: Optional[str] = Query(
+        default=None,
+        pattern=INCLUDE_PATTERN,
+        description="report: aggiunge il report testuale alla risposta"
+    )
+) -> ValutazioneResponse:
     """Calcola la valutazione completa di un immobile in nuda proprietà."""
     try:
         # Inizializza il servizio
-        service = ValuationService()
+        service = get_valuation_service()
+        comune, comune_istat = resolve_comune(service, request.comune, request.comune_istat)
         
-        # Crea PropertyData dal request
-        property_data = PropertyData(
-            comune=request.comune,
-            provincia=request.provincia,
-            fascia=request.fascia,
-            zona_codice=request.zona_codice,
-            surface_sqm=request.superficie,
-            balcony_surface=request.superficie_balconi,
-            terrace_surface=request.superficie_terrazzi,
-            garden_surface=request.superficie_giardino,
-            cellar_surface=request.superficie_cantina,
-            has_box=request.has_box,
-            num_garages=request.num_garages,
-            num_parking=request.num_parking,
-            floor=request.piano,
-            has_elevator=request.has_ascensore,
-            is_attic=request.is_attico,
-            is_last_floor=request.is_ultimo_piano,
-            has_garden=request.has_giardino,
-            condition=request.stato_conservazione.value,
-            brightness=request.luminosita.value,
-            view=request.vista.value,
-            building_year=request.anno_costruzione,
-            renovation_year=request.anno_ristrutturazione,
-            building_condition=request.stato_edificio.value,
-            heating_type=request.tipo_riscaldamento.value,
-            energy_class=request.classe_energetica,
-            usufructuary_age=request.eta_usufruttuario,
-            usufruct_type=request.tipo_usufrutto,
-            requested_price=request.prezzo_richiesto
-        )
-        
-        # Esegui calcolo
-        valuation = service.calculate_complete_valuation(property_data)
+        property_data = build_property_data(request, comune, comune_istat)
         
-        # Controlla errori
-        if 'error' in valuation:
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "success": False,
-                    "error": valuation['error'],
-                    "suggestions": [
-                        "Verifica il nome del comune",
-                        "Prova con una fascia diversa (B, C, D)",
-                        f"Comune inserito: {request.comune}"
-                    ]
-                }
-            )
+        # Stessi input, stesso semestre OMI e tasso legale: risultato in cache
+        valutazione_id = input_fingerprint(property_data, *service.get_reference_data())
+        cache_key = fingerprint_cache_key(valutazione_id)
+        cached, cache_status = valuation_cache.get(cache_key)
+        response.headers["X-Cache"] = cache_status
         
-        # Genera report testuale
-        report = service.format_valuation_report(valuation)
+        if cached is None:
+            # Esegui calcolo
+            valuation = service.calculate_complete_valuation(property_data)
+            
+            # Controlla errori
+            if 'error' in valuation:
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "success": False,
+                        "error": valuation['error'],
+                        "suggestions": [
+                            "Verifica il nome del comune",
+                            "Prova con una fascia diversa (B, C, D)",
+                            f"Comune inserito: {request.comune}"
+                        ]
+                    },
+                    headers={"X-Cache": MISS}
+                )
+            
+            cached = {'valutazione': valuation}
+            valuation_cache.set(cache_key, cached)
+            
+            logger.info(f"Valutazione calcolata: {request.comune}, {request.superficie}mq, età {request.eta_usufruttuario}")
         
-        logger.info(f"Valutazione calcolata: {request.comune}, {request.superficie}mq, età {request.eta_usufruttuario}")
+        # Report testuale solo su richiesta
+        report = None
+        if include == INCLUDE_REPORT:
+            report = cached_report(service, cache_key, cached)
         
         return ValutazioneResponse(
             success=True,
-            valutazione=valuation,
+            valutazione_id=valutazione_id,
+            valutazione=cached['valutazione'],
             report=report
         )
         
@@ -388,6 +643,98 @@ async def calculate_valuation(request: ValutazioneRequest) -> ValutazioneRespons
         )
 
 
+def cached_report(service: ValuationService, cache_key: str, cached: Dict[str, Any]) -> str:
+    """Report della valutazione in cache, generato alla prima richiesta e salvato con essa"""
+    report = cached.get('report')
+    if report is None:
+        report = service.format_valuation_report(cached['valutazione'])
+        valuation_cache.set(cache_key, {**cached, 'report': report})
+    return report
+
+
+@router.get(
+    "/report/{valutazione_id}",
+    summary="Report testuale di una valutazione",
+    description="""
+    Report leggibile della valutazione restituita da /calculate
+    (campo `valutazione_id`), senza ricalcolarla. Disponibile finché la
+    valutazione è in cache; dopo la scadenza risponde 404.
+    """
+)
+async def get_valuation_report(
+    response: Response,
+    valutazione_id: str = Path(..., pattern=VALUTAZIONE_ID_PATTERN)
+):
+    """Report testuale di una valutazione in cache."""
+    cache_key = fingerprint_cache_key(valutazione_id)
+    cached, cache_status = valuation_cache.get(cache_key)
+    
+    if cached is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "success": False,
+                "error": "Valutazione non trovata o scaduta",
+                "suggestions": ["Ricalcola con POST /api/v1/valuation/calculate"]
+            },
+            headers={"X-Cache": MISS}
+        )
+    response.headers["X-Cache"] = cache_status
+    
+    return {
+        "success": True,
+        "valutazione_id": valutazione_id,
+        "report": cached_report(get_valuation_service(), cache_key, cached)
+    }
+
+
+# ============================================================
+# ENDPOINT: GRIGLIA WHAT-IF
+# ============================================================
+
+@router.post(
+    "/sensitivity",
+    summary="Griglia what-if della valutazione",
+    description="""
+    Valutazione per ogni combinazione di età, stato di conservazione, superficie
+    e prezzo richiesto, in una sola chiamata (una richiesta invece di una per
+    ogni movimento degli slider). Quotazione OMI, tasso legale e coefficienti
+    che non variano lungo un asse sono calcolati una volta sola.
+    """
+)
+async def calculate_sensitivity(request: SensitivityRequest):
+    """Griglia di valutazioni attorno alla richiesta base."""
+    try:
+        service = get_valuation_service()
+        base = request.base
+        comune, comune_istat = resolve_comune(service, base.comune, base.comune_istat)
+        
+        grid = service.calculate_sensitivity(
+            build_property_data(base, comune, comune_istat),
+            ages=[int(age) for age in request.eta.valori()] if request.eta else None,
+            conditions=[stato.value for stato in request.stati_conservazione or []] or None,
+            surfaces=request.superficie.valori() if request.superficie else None,
+            prices=request.prezzo_richiesto.valori() if request.prezzo_richiesto else None
+        )
+        
+        if 'error' in grid:
+            raise HTTPException(
+                status_code=404,
+                detail={"success": False, "error": grid['error']}
+            )
+        
+        return {"success": True, "celle_totali": len(grid['celle']), **grid}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Errore griglia what-if: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"success": False, "error": f"Errore interno: {str(e)}"}
+        )
+
+
 # ============================================================
 # ENDPOINT: COEFFICIENTI USUFRUTTO
 # ============================================================
@@ -438,29 +785,17 @@ async def get_coefficients():
 async def get_zones_by_comune(comune: str):
     """Restituisce le zone OMI per un comune specifico."""
     try:
-        service = ValuationService()
+        service = get_valuation_service()
         
-        # Query per ottenere zone del comune
-        from sqlalchemy import text
-        with service.engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT DISTINCT 
-                    zona_codice,
-                    link_zona,
-                    fascia
-                FROM omi_quotations
-                WHERE UPPER(comune_descrizione) = UPPER(:comune)
-                AND zona_codice IS NOT NULL
-                ORDER BY fascia, zona_codice
-            """), {"comune": comune.upper()})
-            
-            zones = []
-            for row in result:
-                zones.append({
-                    "codice": row[0],
-                    "descrizione": row[1],
-                    "fascia": row[2]
-                })
+        # Zone del comune (snapshot OMI se corrente, altrimenti database)
+        zones = [
+            {
+                "codice": zone["codice"],
+                "descrizione": zone["link_zona"],
+                "fascia": zone["fascia"]
+            }
+            for zone in service.get_omi_zones(comune.upper())
+        ]
         
         if not zones:
             raise HTTPException(
@@ -509,7 +844,7 @@ async def get_quick_quote(
 ):
     """Quotazione rapida senza calcolo completo."""
     try:
-        service = ValuationService()
+        service = get_valuation_service()
         quote = service.get_omi_quotation(
             comune=comune.upper(),
             fascia=fascia.upper(),
@@ -547,6 +882,141 @@ async def get_quick_quote(
         )
 
 
+# ============================================================
+# ENDPOINT: SERIE STORICA OMI
+# ============================================================
+
+@router.get(
+    "/trend",
+    summary="Serie storica quotazioni OMI",
+    description="Quotazioni OMI di una zona semestre per semestre, con variazione percentuale."
+)
+async def get_omi_trend(
+    comune: str = Query(..., description="Nome del comune"),
+    zona: Optional[str] = Query(None, description="Codice zona OMI (default prima zona della fascia)"),
+    fascia: str = Query("B", description="Fascia: B, C, D"),
+    tipologia: int = Query(20, description="Codice tipologia OMI (20 = abitazioni civili)"),
+    stato: str = Query("NORMALE", description="Stato: OTTIMO, NORMALE, SCADENTE"),
+    da_semestre: Optional[str] = Query(None, pattern=SEMESTRE_PATTERN, description="Primo semestre (es. 2020/1)"),
+    a_semestre: Optional[str] = Query(None, pattern=SEMESTRE_PATTERN, description="Ultimo semestre (es. 2025/1)")
+):
+    """Serie storica delle quotazioni di una zona."""
+    try:
+        service = get_valuation_service()
+        trend = service.get_omi_trend(
+            comune=comune.upper(),
+            zona_codice=zona.upper() if zona else None,
+            fascia=fascia.upper(),
+            cod_tipologia=tipologia,
+            stato=stato.upper(),
+            from_semestre=da_semestre,
+            to_semestre=a_semestre
+        )
+        
+        if not trend:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "success": False,
+                    "error": f"Nessuno storico OMI per {comune.upper()}",
+                    "suggestions": [
+                        "Verifica il nome del comune e il codice zona",
+                        "Amplia l'intervallo di semestri"
+                    ]
+                }
+            )
+        
+        return {
+            "success": True,
+            "comune": comune.upper(),
+            "zona_codice": trend[0]["zona_codice"],
+            "semestri": len(trend),
+            "trend": trend
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Errore serie storica OMI: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"error": f"Errore: {str(e)}"}
+        )
+
+
+# ============================================================
+# ENDPOINT: AUTOCOMPLETAMENTO COMUNI
+# ============================================================
+
+@router.get(
+    "/comuni",
+    summary="Autocompletamento comuni OMI",
+    description="Comuni OMI che iniziano con il testo digitato o gli somigliano (accenti e apostrofi opzionali)."
+)
+async def suggest_comuni(
+    q: str = Query(..., min_length=2, max_length=100, description="Testo digitato (es. reggio emi)"),
+    limit: int = Query(10, ge=1, le=50, description="Numero massimo di suggerimenti")
+):
+    """Suggerimenti di comuni per l'autocompletamento."""
+    index = get_valuation_service().get_comuni_index()
+    if index is None:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Dizionario comuni non disponibile"}
+        )
+    
+    suggestions = index.suggest(q, limit=limit)
+    return {
+        "success": True,
+        "query": q,
+        "count": len(suggestions),
+        "comuni": [match.to_dict() for match in suggestions]
+    }
+
+
+# ============================================================
+# ENDPOINT: GRIGLIA VALORE ATTUARIALE
+# ============================================================
+
+@router.get(
+    "/actuarial",
+    summary="Griglia età × tasso del valore attuariale",
+    description="""
+    Percentuale di nuda proprietà (valore attuale atteso dalle tavole di mortalità)
+    per ogni età tra eta_min ed eta_max e ogni tasso di sconto richiesto, in una
+    sola chiamata: righe = età, colonne = tassi.
+    """
+)
+async def get_actuarial_grid(
+    eta_min: int = Query(50, ge=0, le=110, description="Prima età della griglia"),
+    eta_max: int = Query(95, ge=0, le=110, description="Ultima età della griglia"),
+    tassi: List[float] = Query(DEFAULT_TASSI, description="Tassi di sconto (ripetibile: tassi=0.02&tassi=0.03)"),
+    sesso: Optional[str] = Query(None, pattern=SESSO_PATTERN, description="M o F (default media delle tavole)"),
+    rivalutazione: float = Query(0.0, ge=-0.1, le=0.1, description="Rivalutazione annua dell'immobile")
+):
+    """Valore attuariale di nuda proprietà su tutta la griglia età × tasso."""
+    if eta_min > eta_max:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "eta_min deve essere minore o uguale a eta_max"}
+        )
+    if not tassi or len(tassi) > MAX_TASSI or any(not 0 <= tasso <= 0.2 for tasso in tassi):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"Da 1 a {MAX_TASSI} tassi di sconto tra 0 e 0.2"}
+        )
+    
+    table = get_valuation_service().get_life_table()
+    if table is None:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Tavole di mortalità non disponibili"}
+        )
+    
+    grid = actuarial_grid(table, list(range(eta_min, eta_max + 1)), tassi, sesso, rivalutazione)
+    return {"success": True, **grid}
+
+
 # ============================================================
 # ENDPOINT: CALCOLO COEFFICIENTE PER ETÀ
 # ============================================================
@@ -564,7 +1034,7 @@ async def get_coefficient_by_age(eta: int):
             detail={"error": "Età deve essere tra 0 e 100"}
         )
     
-    service = ValuationService()
+    service = get_valuation_service()
     coeff, pct_usuf, pct_nuda = service.get_usufruct_coefficient(eta)
     
     return {
@@ -0,0 +1,252 @@
+# backend/app/core/cache.py
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set
+
+from fastapi import BackgroundTasks, Request, Response
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """Cached value with freshness window and invalidation tags"""
+    value: Any
+    fresh_until: float
+    stale_until: float
+    tags: Set[str] = field(default_factory=set)
+    etag: Optional[str] = None
+    revalidating: bool = False
+    
+    @property
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.fresh_until
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with TTL, stale-while-revalidate window
+    and tag-based invalidation. Thread-safe (sync endpoints run in a pool).
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 30, stale_ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Fresh or stale entry, None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry.stale_until:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        tags: Iterable[str] = (),
+        etag: Optional[str] = None,
+        ttl: Optional[float] = None
+    ) -> CacheEntry:
+        """Store value under key (replaces any previous entry)"""
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        entry = CacheEntry(
+            value=value,
+            fresh_until=now + ttl,
+            stale_until=now + ttl + self.stale_ttl,
+            tags=set(tags),
+            etag=etag
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return entry
+    
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """Drop every entry carrying one of the tags; returns entries removed"""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# ============================================================
+# HTTP RESPONSE CACHE (endpoint pubblici)
+# ============================================================
+
+@dataclass
+class RenderedResponse:
+    """Serialized JSON body plus the tags that invalidate it"""
+    body: bytes
+    tags: Set[str] = field(default_factory=set)
+
+
+def make_cache_key(namespace: str, params: Mapping[str, Any]) -> str:
+    """
+    Normalized key: drops unset params, sorts names, lowercases strings,
+    so '?city=Pescara&skip=0' and '?skip=0&city=pescara ' share one entry.
+    """
+    parts = []
+    for name in sorted(params):
+        value = params[name]
+        if value is None or value == "":
+            continue
+        if hasattr(value, "value"):  # Enum
+            value = value.value
+        if isinstance(value, str):
+            value = value.strip().lower()
+        parts.append(f"{name}={value}")
+    return f"{namespace}?{'&'.join(parts)}"
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header covers etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or any(
+        c == etag or c.removeprefix("W/") == etag for c in candidates
+    )
+
+
+def cached_json_response(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    cache: TTLCache,
+    key: str,
+    render: Callable[[Session], Optional[RenderedResponse]],
+    db: Session
+) -> Optional[Response]:
+    """
+    Serve a JSON body from cache (with ETag/304), rendering it on miss.
+    A stale entry is served immediately while a background task
+    re-renders it with its own DB session (stale-while-revalidate).
+    Returns None when render() finds nothing (caller raises 404).
+    """
+    entry = cache.get(key)
+    status = "HIT"
+    
+    if entry is None:
+        status = "MISS"
+        rendered = render(db)
+        if rendered is None:
+            return None
+        entry = cache.set(key, rendered.body, tags=rendered.tags, etag=compute_etag(rendered.body))
+    elif not entry.is_fresh:
+        status = "STALE"
+        if not entry.revalidating:
+            entry.revalidating = True
+            background_tasks.add_task(_revalidate, cache, key, render)
+    
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": (
+            f"public, max-age={int(cache.ttl)}, "
+            f"stale-while-revalidate={int(cache.stale_ttl)}"
+        ),
+        "X-Cache": status,
+    }
+    
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=entry.value, media_type="application/json", headers=headers)
+
+
+def _revalidate(
+    cache: TTLCache,
+    key: str,
+    render: Callable[[Session], Optional[RenderedResponse]]
+) -> None:
+    """Background refresh of a stale entry"""
+    db = SessionLocal()
+    try:
+        rendered = render(db)
+        if rendered is None:
+            cache.delete(key)
+            return
+        cache.set(key, rendered.body, tags=rendered.tags, etag=compute_etag(rendered.body))
+    except Exception as e:
+        logger.error(f"Errore revalidazione cache {key}: {e}")
+        entry = cache.get(key)
+        if entry is not None:
+            entry.revalidating = False
+    finally:
+        db.close()
+
+
+# Cache for public listing endpoints (/properties/, /search, /{id})
+listing_cache = TTLCache(
+    max_entries=settings.LISTING_CACHE_MAX_ENTRIES,
+    ttl=settings.LISTING_CACHE_TTL,
+    stale_ttl=settings.LISTING_CACHE_STALE_TTL
+)
+
+LISTINGS_TAG = "listings"
+
+
+def property_tag(property_id: int) -> str:
+    return f"property:{property_id}"
+
+
+def invalidate_listing(property_id: Optional[int] = None) -> None:
+    """Drop cached list/search pages and, if given, one property's detail"""
+    tags = [LISTINGS_TAG]
+    if property_id is not None:
+        tags.append(property_tag(property_id))
+    listing_cache.invalidate_tags(*tags)
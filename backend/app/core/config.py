@@ -37,6 +37,19 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 20971520  # 20MB in bytes - Added
     UPLOAD_DIR: str = "../uploads"  # Added
     
+    # Performance
+    SQL_QUERY_WARNING_THRESHOLD: int = 20  # Log requests above this many queries
+    
+    # Response cache (public listing endpoints)
+    LISTING_CACHE_TTL: int = 30  # seconds fresh
+    LISTING_CACHE_STALE_TTL: int = 120  # seconds served stale while revalidating
+    LISTING_CACHE_MAX_ENTRIES: int = 2048
+    
+    # Valuation result cache (in-process, optional shared Redis tier)
+    VALUATION_CACHE_TTL: int = 600  # seconds (bounds staleness of comparables)
+    VALUATION_CACHE_MAX_ENTRIES: int = 4096
+    VALUATION_CACHE_REDIS_URL: Optional[str] = None  # e.g. redis://localhost:6379/1
+    
     model_config = {
         "env_file": ".env",
         "case_sensitive": True,
@@ -0,0 +1,317 @@
+# backend/app/core/pipeline.py
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Items buffered between two stages: bounds memory to roughly
+# (stages x QUEUE_SIZE) chunks and makes fast producers wait (backpressure)
+QUEUE_SIZE = 4
+
+# Poll interval while blocked on a queue, so a failing stage stops the others
+POLL_SECONDS = 0.1
+
+# Raw bytes per block handed to a parse worker (see iter_file_blocks)
+BLOCK_BYTES = 2 * 2**20
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline: func(item) -> item for the next stage.
+    
+    The last stage is the sink, its return value is discarded. workers > 1
+    runs func on several threads (output order is then not preserved).
+    processes=True runs func in a pool of `workers` processes, for CPU-bound
+    Python work: func, items and results must be picklable.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    processes: bool = False
+
+
+@dataclass
+class StageStats:
+    """Per-stage counters: busy = time inside func, blocked = waiting on a full queue"""
+    items: int = 0
+    busy: float = 0.0
+    blocked: float = 0.0
+
+
+@dataclass
+class PipelineResult:
+    seconds: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    
+    @property
+    def bottleneck(self) -> Optional[str]:
+        """Stage with the most busy time (what bounds throughput)"""
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda name: self.stages[name].busy)
+
+
+class PipelineError(RuntimeError):
+    """A stage raised: wraps the original exception with the stage name"""
+    
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class _Run:
+    """Shared state of a running pipeline"""
+    
+    def __init__(self, stages: Sequence[Stage], queue_size: int):
+        self.stop = threading.Event()
+        self.error: Optional[PipelineError] = None
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.lock = threading.Lock()
+        self.remaining = [stage.workers for stage in stages]
+    
+    def fail(self, stage: str, error: BaseException) -> None:
+        with self.lock:
+            if self.error is None:
+                self.error = PipelineError(stage, error)
+        self.stop.set()
+    
+    def put(self, q: "queue.Queue", item: Any) -> Optional[float]:
+        """Blocking put: seconds spent waiting, None if the pipeline is stopping"""
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                return time.perf_counter() - start
+            except queue.Full:
+                continue
+        return None
+    
+    def get(self, q: "queue.Queue") -> Any:
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+
+def default_workers() -> int:
+    """Parallel workers for CPU-bound stages: one core is left to the other stages"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def iter_file_blocks(
+    handle: BinaryIO,
+    block_bytes: int = BLOCK_BYTES,
+    header_lines: int = 1,
+    on_block: Optional[Callable[[int], None]] = None
+) -> Iterator[bytes]:
+    """
+    Split a line-oriented file into blocks of whole lines, each prefixed
+    with the first header_lines lines, so every block parses on its own.
+    
+    Cutting raw bytes is far cheaper than parsing, so a single reader can
+    feed several parse workers. Assumes no newlines inside quoted fields.
+    
+    Args:
+        on_block: Called with the bytes consumed after each block (progress)
+    """
+    header = b''.join(handle.readline() for _ in range(header_lines))
+    if on_block:
+        on_block(len(header))
+    while True:
+        block = handle.read(block_bytes)
+        if not block:
+            return
+        if not block.endswith(b'\n'):
+            block += handle.readline()
+        if on_block:
+            on_block(len(block))
+        yield header + block
+
+
+def _source_worker(run: _Run, source: Iterable, name: str, stats: StageStats) -> None:
+    out = run.queues[0]
+    try:
+        iterator = iter(source)
+        while not run.stop.is_set():
+            start = time.perf_counter()
+            item = next(iterator, _DONE)
+            stats.busy += time.perf_counter() - start
+            if item is _DONE:
+                break
+            stats.items += 1
+            blocked = run.put(out, item)
+            if blocked is None:
+                return
+            stats.blocked += blocked
+    except BaseException as e:
+        run.fail(name, e)
+        return
+    run.put(out, _DONE)
+
+
+def _stage_worker(run: _Run, index: int, stage: Stage, stats: StageStats, lock: threading.Lock) -> None:
+    inbox = run.queues[index]
+    outbox = run.queues[index + 1] if index + 1 < len(run.queues) else None
+    try:
+        while True:
+            item = run.get(inbox)
+            if item is _DONE:
+                # Let sibling workers of this stage see the end marker too
+                inbox.put(_DONE)
+                break
+            start = time.perf_counter()
+            result = stage.func(item)
+            elapsed = time.perf_counter() - start
+            blocked = 0.0
+            if outbox is not None:
+                blocked = run.put(outbox, result)
+                if blocked is None:
+                    return
+            with lock:
+                stats.busy += elapsed
+                stats.blocked += blocked
+                stats.items += 1
+    except BaseException as e:
+        run.fail(stage.name, e)
+        return
+    
+    # The last worker of the stage forwards the end marker downstream
+    with run.lock:
+        run.remaining[index] -= 1
+        last = run.remaining[index] == 0
+    if last and outbox is not None:
+        run.put(outbox, _DONE)
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: Sequence[Stage],
+    queue_size: int = QUEUE_SIZE,
+    source_name: str = "source"
+) -> PipelineResult:
+    """
+    Run source -> stages[0] -> ... -> stages[-1] as overlapping threads
+    connected by bounded queues.
+    
+    Threads rather than processes: the heavy steps of a bulk ingest (the
+    pandas C parser, vectorized cleaning, psycopg2 COPY) release the GIL,
+    and chunks move between stages without being pickled.
+    
+    Raises:
+        PipelineError: first exception raised by any stage; the other
+            stages are stopped and the source is not consumed further
+    """
+    if not stages:
+        raise ValueError("pipeline needs at least one stage")
+    
+    run = _Run(stages, queue_size)
+    result = PipelineResult(stages={source_name: StageStats()})
+    for stage in stages:
+        result.stages[stage.name] = StageStats()
+    
+    pools = []
+    stages = list(stages)
+    for index, stage in enumerate(stages):
+        if stage.processes:
+            # Each thread of the stage waits on one process of the pool
+            pool = ProcessPoolExecutor(max_workers=stage.workers)
+            pools.append(pool)
+            stages[index] = Stage(stage.name, _in_pool(pool, stage.func), stage.workers)
+    
+    threads: List[threading.Thread] = [threading.Thread(
+        target=_source_worker,
+        args=(run, source, source_name, result.stages[source_name]),
+        name=f"pipeline-{source_name}",
+        daemon=True
+    )]
+    for index, stage in enumerate(stages):
+        stats_lock = threading.Lock()
+        for worker in range(stage.workers):
+            threads.append(threading.Thread(
+                target=_stage_worker,
+                args=(run, index, stage, result.stages[stage.name], stats_lock),
+                name=f"pipeline-{stage.name}-{worker}",
+                daemon=True
+            ))
+    
+    start = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for pool in pools:
+            pool.shutdown(cancel_futures=True)
+    result.seconds = time.perf_counter() - start
+    
+    if run.error is not None:
+        raise run.error
+    return result
+
+
+def _in_pool(pool: ProcessPoolExecutor, func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def submit(item):
+        return pool.submit(func, item).result()
+    return submit
+
+
+def run_sequential(
+    source: Iterable,
+    stages: Sequence[Stage],
+    source_name: str = "source"
+) -> PipelineResult:
+    """Same contract as run_pipeline on the calling thread (baseline, debugging)"""
+    result = PipelineResult(stages={source_name: StageStats()})
+    for stage in stages:
+        result.stages[stage.name] = StageStats()
+    
+    start = time.perf_counter()
+    iterator = iter(source)
+    while True:
+        tick = time.perf_counter()
+        try:
+            item = next(iterator, _DONE)
+        except Exception as e:
+            raise PipelineError(source_name, e) from e
+        result.stages[source_name].busy += time.perf_counter() - tick
+        if item is _DONE:
+            break
+        result.stages[source_name].items += 1
+        
+        for stage in stages:
+            tick = time.perf_counter()
+            try:
+                item = stage.func(item)
+            except Exception as e:
+                raise PipelineError(stage.name, e) from e
+            stats = result.stages[stage.name]
+            stats.busy += time.perf_counter() - tick
+            stats.items += 1
+    
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def log_pipeline(result: PipelineResult, rows: Optional[int] = None) -> None:
+    """Per-stage busy/blocked time; the bottleneck is the stage to optimize"""
+    rate = f", {rows / result.seconds:,.0f} rows/s" if rows and result.seconds > 0 else ""
+    logger.info(f"Pipeline: {result.seconds:.2f}s{rate} (bottleneck: {result.bottleneck})")
+    for name, stats in result.stages.items():
+        logger.info(
+            f"  {name:<30} {stats.items:>6} items  busy {stats.busy:7.2f}s  "
+            f"blocked {stats.blocked:7.2f}s"
+        )
@@ -0,0 +1,60 @@
+# backend/app/core/query_counter.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """Counts SQL statements executed while it is active"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __repr__(self):
+        return f"<QueryCounter {self.count}>"
+
+
+# Active counter for the current request/task (None = not counting)
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar(
+    "sql_query_counter",
+    default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Engine-wide hook: increments the active counter, if any"""
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count SQL queries executed inside the block
+    Usage:
+        with count_queries() as counter:
+            ...
+        print(counter.count)
+    
+    The counter object is shared with threads/tasks spawned inside the
+    block (contextvars are copied by reference), so sync endpoints running
+    in the threadpool are counted too.
+    """
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def current_query_count() -> Optional[int]:
+    """Queries executed so far in the current counting context"""
+    counter = _current_counter.get()
+    return counter.count if counter is not None else None
@@ -0,0 +1,146 @@
+# backend/app/core/tdigest.py
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+DEFAULT_COMPRESSION = 100
+
+# Points buffered before merging them into the centroids
+BUFFER_FACTOR = 5
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning): a streaming quantile sketch of
+    O(compression) centroids, most accurate at the tails. cdf() and
+    quantile() cost O(compression), independent of the number of points.
+    
+    remove() is approximate (one unit of weight is taken from the nearest
+    centroid): digests that see many updates should be rebuilt from the
+    source data now and then.
+    """
+    
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._buffer: List[float] = []
+    
+    @property
+    def count(self) -> float:
+        return sum(self.weights) + len(self._buffer)
+    
+    def add(self, value: float) -> None:
+        value = float(value)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._buffer.append(value)
+        if len(self._buffer) >= BUFFER_FACTOR * self.compression:
+            self.compress()
+    
+    def remove(self, value: float) -> None:
+        """Take one unit of weight from the centroid nearest to value"""
+        self.compress()
+        if not self.means:
+            return
+        i = bisect_left(self.means, value)
+        if i == len(self.means) or (i > 0 and value - self.means[i - 1] <= self.means[i] - value):
+            i -= 1
+        self.weights[i] -= 1
+        if self.weights[i] <= 0:
+            del self.means[i], self.weights[i]
+        if not self.means:
+            self.min = self.max = None
+        elif value <= self.min:
+            self.min = self.means[0]
+        elif value >= self.max:
+            self.max = self.means[-1]
+    
+    def compress(self) -> None:
+        """Merge buffered points into centroids (size bound 4·n·q·(1-q)/δ)"""
+        if not self._buffer:
+            return
+        points = sorted(
+            list(zip(self.means, self.weights)) + [(value, 1.0) for value in self._buffer]
+        )
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+        
+        means, weights = [points[0][0]], [points[0][1]]
+        cumulative = 0.0
+        for mean, weight in points[1:]:
+            merged = weights[-1] + weight
+            q = (cumulative + merged / 2) / total
+            if merged <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                means[-1] += (mean - means[-1]) * weight / merged
+                weights[-1] = merged
+            else:
+                cumulative += weights[-1]
+                means.append(mean)
+                weights.append(weight)
+        self.means, self.weights = means, weights
+    
+    def cdf(self, value: float) -> Optional[float]:
+        """Fraction of the points <= value (ties count half), None if empty"""
+        self.compress()
+        if not self.means:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        
+        total = sum(self.weights)
+        # Cumulative weight at each centroid mean (half of its own weight)
+        below, centers = 0.0, []
+        for weight in self.weights:
+            centers.append(below + weight / 2)
+            below += weight
+        
+        means = [self.min] + self.means + [self.max]
+        positions = [0.0] + centers + [total]
+        i = bisect_right(means, value) - 1
+        fraction = (value - means[i]) / (means[i + 1] - means[i])
+        return (positions[i] + fraction * (positions[i + 1] - positions[i])) / total
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0..1), None if empty"""
+        self.compress()
+        if not self.means:
+            return None
+        total = sum(self.weights)
+        target = min(max(q, 0.0), 1.0) * total
+        
+        means = [self.min] + self.means + [self.max]
+        below, positions = 0.0, [0.0]
+        for weight in self.weights:
+            positions.append(below + weight / 2)
+            below += weight
+        positions.append(total)
+        
+        i = max(bisect_left(positions, target) - 1, 0)
+        span = positions[i + 1] - positions[i]
+        if span <= 0:
+            return means[i + 1]
+        return means[i] + (target - positions[i]) / span * (means[i + 1] - means[i])
+    
+    def to_dict(self) -> Dict:
+        self.compress()
+        return {
+            "compression": self.compression,
+            "min": self.min,
+            "max": self.max,
+            "means": [round(mean, 6) for mean in self.means],
+            "weights": self.weights,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "TDigest":
+        digest = cls(compression=(data or {}).get("compression", DEFAULT_COMPRESSION))
+        if data:
+            digest.means = list(data.get("means", []))
+            digest.weights = list(data.get("weights", []))
+            digest.min, digest.max = data.get("min"), data.get("max")
+        return digest
@@ -1,15 +1,40 @@
 # backend/app/crud/property.py
 
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import asc, desc, and_, case, func, nullslast
 from app.models.property import Property, PropertyStatus
+from app.models.property_counter import PropertyCounter, ALL_OWNERS
 from app.schemas.property import PropertyCreate, PropertyUpdate
+from app.services.listing_metrics import (
+    METRIC_INPUT_FIELDS, ZONE_INPUT_FIELDS, refresh_listing_metrics, refresh_listing_zone
+)
+from app.services.listing_valuation import VALUATION_INPUT_FIELDS, mark_valuation_stale
+from app.services.search_index import rank_matches
+
+
+# Loader strategies: every endpoint declares what it serializes, so that
+# relationships are fetched in one extra query instead of one per row.
+LIST_LOAD_OPTIONS = (selectinload(Property.cover_image),)
+DETAIL_LOAD_OPTIONS = (selectinload(Property.images),)
+
+# Sort keys for search (backed by indexed derived columns)
+SORT_KEYS = {
+    "recent": (desc(Property.is_featured), desc(Property.created_at)),
+    "discount": (nullslast(desc(Property.discount_pct)),),
+    "deal_score": (nullslast(desc(Property.deal_score)),),
+    "price_sqm": (nullslast(asc(Property.price_per_sqm)),),
+    "price_asc": (asc(Property.bare_property_value),),
+    "price_desc": (desc(Property.bare_property_value),),
+}
 
 
 def get_property(db: Session, property_id: int) -> Optional[Property]:
-    """Get property by ID"""
-    return db.query(Property).filter(Property.id == property_id).first()
+    """Get property by ID (with images)"""
+    return db.query(Property)\
+        .options(*DETAIL_LOAD_OPTIONS)\
+        .filter(Property.id == property_id)\
+        .first()
 
 
 def get_properties(
@@ -21,7 +46,7 @@ def get_properties(
     owner_id: Optional[int] = None
 ) -> List[Property]:
     """Get list of properties with filters"""
-    query = db.query(Property)
+    query = db.query(Property).options(*LIST_LOAD_OPTIONS)
     
     # Apply filters
     if status:
@@ -48,6 +73,7 @@ def get_user_properties(
 ) -> List[Property]:
     """Get all properties for a specific user"""
     return db.query(Property)\
+        .options(*DETAIL_LOAD_OPTIONS)\
         .filter(Property.owner_id == user_id)\
         .order_by(desc(Property.created_at))\
         .offset(skip)\
@@ -66,6 +92,8 @@ def create_property(
         owner_id=owner_id,
         status=PropertyStatus.DRAFT
     )
+    refresh_listing_metrics(db_property)
+    refresh_listing_zone(db_property)
     
     db.add(db_property)
     db.commit()
@@ -85,6 +113,16 @@ def update_property(
     for field, value in update_data.items():
         setattr(property, field, value)
     
+    if METRIC_INPUT_FIELDS & update_data.keys():
+        refresh_listing_metrics(
+            property,
+            refresh_omi='city' in update_data or property.omi_price_sqm is None
+        )
+    if ZONE_INPUT_FIELDS & update_data.keys():
+        refresh_listing_zone(property)
+    if VALUATION_INPUT_FIELDS & update_data.keys():
+        mark_valuation_stale(db, property.id)
+    
     db.commit()
     db.refresh(property)
     
@@ -108,7 +146,17 @@ def publish_property(db: Session, property: Property) -> Property:
 
 def increment_views(db: Session, property: Property) -> None:
     """Increment property views counter"""
-    property.views_count += 1
+    increment_views_by_id(db, property.id)
+
+
+def increment_views_by_id(db: Session, property_id: int) -> None:
+    """Increment views counter with an atomic UPDATE (no row load)"""
+    db.query(Property)\
+        .filter(Property.id == property_id)\
+        .update(
+            {Property.views_count: Property.views_count + 1},
+            synchronize_session=False
+        )
     db.commit()
 
 
@@ -128,11 +176,20 @@ def search_properties(
     city: Optional[str] = None,
     province: Optional[str] = None,
     property_type: Optional[str] = None,
+    q: Optional[str] = None,
+    min_discount: Optional[float] = None,
+    max_price_sqm: Optional[float] = None,
+    min_deal_score: Optional[float] = None,
+    sort: Optional[str] = None,
     skip: int = 0,
     limit: int = 100
 ) -> List[Property]:
-    """Advanced search for properties"""
-    query = db.query(Property).filter(
+    """
+    Advanced search for properties
+    With q: full-text match on title/description, ordered by rank
+    unless an explicit sort key (see SORT_KEYS) is given
+    """
+    query = db.query(Property).options(*LIST_LOAD_OPTIONS).filter(
         Property.status == PropertyStatus.PUBLISHED
     )
     
@@ -162,11 +219,40 @@ def search_properties(
     if property_type:
         query = query.filter(Property.property_type == property_type)
     
+    # Derived metrics
+    if min_discount is not None:
+        query = query.filter(Property.discount_pct >= min_discount)
+    if max_price_sqm is not None:
+        query = query.filter(Property.price_per_sqm <= max_price_sqm)
+    if min_deal_score is not None:
+        query = query.filter(Property.deal_score >= min_deal_score)
+    
+    # Full-text
+    rank = None
+    if q:
+        if db.get_bind().dialect.name == "postgresql":
+            tsquery = func.plainto_tsquery('italian', q)
+            query = query.filter(Property.search_vector.op('@@')(tsquery))
+            rank = func.ts_rank(Property.search_vector, tsquery)
+        else:
+            # In-process inverted index (test environments)
+            ranked_ids = [doc_id for doc_id, _ in rank_matches(db, q)]
+            if not ranked_ids:
+                return []
+            query = query.filter(Property.id.in_(ranked_ids))
+            rank = case(
+                {doc_id: -position for position, doc_id in enumerate(ranked_ids)},
+                value=Property.id
+            )
+    
     # Order
-    query = query.order_by(
-        desc(Property.is_featured),
-        desc(Property.created_at)
-    )
+    if sort:
+        order = list(SORT_KEYS[sort]) + [desc(Property.id)]
+    else:
+        order = list(SORT_KEYS["recent"])
+        if rank is not None:
+            order.insert(0, desc(rank))
+    query = query.order_by(*order)
     
     return query.offset(skip).limit(limit).all()
 
@@ -174,14 +260,53 @@ def search_properties(
 def count_properties(
     db: Session,
     status: Optional[PropertyStatus] = None,
-    owner_id: Optional[int] = None
+    owner_id: Optional[int] = None,
+    exact: bool = False
 ) -> int:
-    """Count properties with filters"""
-    query = db.query(Property)
+    """
+    Count properties with filters
+    Served from the maintained property_counters rows (O(1));
+    exact=True runs a real COUNT on the properties table
+    """
+    if exact:
+        query = db.query(func.count(Property.id))
+        if status:
+            query = query.filter(Property.status == status)
+        if owner_id:
+            query = query.filter(Property.owner_id == owner_id)
+        return query.scalar()
     
+    query = db.query(func.coalesce(func.sum(PropertyCounter.count), 0))\
+        .filter(PropertyCounter.owner_id == (owner_id or ALL_OWNERS))
     if status:
-        query = query.filter(Property.status == status)
-    if owner_id:
-        query = query.filter(Property.owner_id == owner_id)
+        query = query.filter(PropertyCounter.status == status)
+    return query.scalar()
+
+
+def count_properties_by_status(
+    db: Session,
+    owner_id: Optional[int] = None
+) -> Dict[PropertyStatus, int]:
+    """Counts per status from the maintained counters (single small query)"""
+    rows = db.query(PropertyCounter.status, PropertyCounter.count)\
+        .filter(PropertyCounter.owner_id == (owner_id or ALL_OWNERS))\
+        .all()
+    return {status: count for status, count in rows if count}
+
+
+def rebuild_property_counters(db: Session) -> None:
+    """Recompute all counters from the properties table (backfill/repair)"""
+    db.query(PropertyCounter).delete()
     
-    return query.count()
+    rows = db.query(Property.owner_id, Property.status, func.count(Property.id))\
+        .group_by(Property.owner_id, Property.status)\
+        .all()
+    
+    totals: Dict[PropertyStatus, int] = {}
+    for owner_id, status, count in rows:
+        db.add(PropertyCounter(owner_id=owner_id, status=status, count=count))
+        totals[status] = totals.get(status, 0) + count
+    for status, count in totals.items():
+        db.add(PropertyCounter(owner_id=ALL_OWNERS, status=status, count=count))
+    
+    db.commit()
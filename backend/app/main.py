@@ -1,10 +1,15 @@
 # backend/app/main.py
 
-from fastapi import FastAPI
+import logging
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.query_counter import count_queries
 from app.api.endpoints import auth, users, properties, valuation, images  # ← Aggiunto images
 
+logger = logging.getLogger(__name__)
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
@@ -21,6 +26,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def sql_query_counter(request: Request, call_next):
+    """Expose per-request SQL query count (X-Query-Count header)"""
+    with count_queries() as counter:
+        response = await call_next(request)
+    
+    response.headers["X-Query-Count"] = str(counter.count)
+    if counter.count > settings.SQL_QUERY_WARNING_THRESHOLD:
+        logger.warning(
+            f"{request.method} {request.url.path}: {counter.count} query SQL "
+            f"(soglia {settings.SQL_QUERY_WARNING_THRESHOLD})"
+        )
+    return response
+
+
 # Include routers
 app.include_router(
     auth.router, 
@@ -11,6 +11,9 @@ from app.models.property import (
     PaymentPreference
 )
 from app.models.property_image import PropertyImage  # ← NUOVO
+from app.models.property_counter import PropertyCounter
+from app.models.property_valuation import PropertyValuation
+from app.models.zone_deal_digest import ZoneDealDigest
 
 __all__ = [
     "Base",
@@ -24,4 +27,7 @@ __all__ = [
     "UsufructType",
     "PaymentPreference",
     "PropertyImage",  # ← NUOVO
+    "PropertyCounter",
+    "PropertyValuation",
+    "ZoneDealDigest",
 ]
@@ -1,7 +1,8 @@
 # backend/app/models/property.py
 
-from sqlalchemy import Column, Integer, String, Boolean, Enum, Float, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Enum, Float, ForeignKey, Text, Index, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred, column_property
 from app.core.database import Base
 from app.models.base import BaseModel
 import enum
@@ -65,19 +66,30 @@ class Property(Base, BaseModel):
     Property model - represents real estate listings
     """
     __tablename__ = "properties"
+    __table_args__ = (
+        Index("ix_properties_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     # Owner
-    owner_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    # active_history: old value is loaded on change (property_counters listeners)
+    owner_id = column_property(
+        Column(Integer, ForeignKey('users.id'), nullable=False, index=True),
+        active_history=True
+    )
     
     # Basic Info
     title = Column(String(200), nullable=False)
     description = Column(Text)
     property_type = Column(Enum(PropertyType), nullable=False)
-    status = Column(Enum(PropertyStatus), default=PropertyStatus.DRAFT, nullable=False, index=True)
+    status = column_property(
+        Column(Enum(PropertyStatus), default=PropertyStatus.DRAFT, nullable=False, index=True),
+        active_history=True
+    )
     
     # Location
     address = Column(String(255))
-    city = Column(String(100), nullable=False, index=True)
+    # active_history: old value is loaded on change (zone_deal_digests listeners)
+    city = column_property(Column(String(100), nullable=False, index=True), active_history=True)
     province = Column(String(50), nullable=False)
     region = Column(String(50), nullable=False)
     zip_code = Column(String(10))
@@ -85,6 +97,10 @@ class Property(Base, BaseModel):
     longitude = Column(Float)
     show_exact_location = Column(Boolean, default=False)
     
+    # OMI zone containing the coordinates (see services/zone_locator.py)
+    omi_link_zona = column_property(Column(String(10), index=True), active_history=True)
+    omi_zona_codice = Column(String(10))
+    
     # Property Details
     surface_sqm = Column(Float, nullable=False)  # Commercial surface
     rooms = Column(Integer)
@@ -115,6 +131,15 @@ class Property(Base, BaseModel):
     full_property_value = Column(Float)  # Full property value (€)
     bare_property_value = Column(Float, nullable=False)  # Nuda proprietà value (€)
     
+    # Derived metrics (maintained on write, see services/listing_metrics.py)
+    discount_pct = Column(Float, index=True)  # Bare vs full value discount (%)
+    price_per_sqm = Column(Float, index=True)  # Bare value per sqm (€/mq)
+    omi_price_sqm = Column(Float)  # OMI reference for the city (€/mq)
+    deal_score = column_property(  # Discount vs OMI-based estimate (%)
+        Column(Float, index=True),
+        active_history=True
+    )
+    
     # Payment Preferences
     payment_preference = Column(Enum(PaymentPreference), default=PaymentPreference.FULL)
     payment_preference_notes = Column(Text)
@@ -124,6 +149,10 @@ class Property(Base, BaseModel):
     views_count = Column(Integer, default=0)
     contacts_count = Column(Integer, default=0)
     
+    # Full-text search (title 'A' + description 'B', italian stemming).
+    # Maintained by a database trigger, never written by the ORM.
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite")))
+    
     # Relationships
     owner = relationship("User", back_populates="properties")
     
@@ -135,6 +164,14 @@ class Property(Base, BaseModel):
         order_by="PropertyImage.display_order"
     )
     
+    # Solo immagine di copertina (per le liste, evita di caricare la gallery)
+    cover_image = relationship(
+        "PropertyImage",
+        primaryjoin="and_(Property.id == PropertyImage.property_id, PropertyImage.is_cover == 1)",
+        uselist=False,
+        viewonly=True
+    )
+    
     # documents = relationship("PropertyDocument", back_populates="property", cascade="all, delete-orphan")
     
     def __repr__(self):
@@ -148,13 +185,36 @@ class Property(Base, BaseModel):
     
     @property
     def discount_percentage(self) -> float:
-        """Calculate discount percentage from full property value"""
+        """Discount percentage from full property value (stored, or computed)"""
+        if self.discount_pct is not None:
+            return self.discount_pct
         if self.full_property_value and self.bare_property_value:
             discount = (self.full_property_value - self.bare_property_value) / self.full_property_value
             return round(discount * 100, 1)
         return 0.0
 
 
+# Trigger che mantiene search_vector su insert/update (solo PostgreSQL)
+event.listen(
+    Property.__table__,
+    "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION properties_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('italian', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('italian', coalesce(NEW.description, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        
+        CREATE TRIGGER properties_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF title, description ON properties
+            FOR EACH ROW EXECUTE FUNCTION properties_search_vector_update();
+    """).execute_if(dialect="postgresql")
+)
+
+
 # Export
 __all__ = [
     "Property",
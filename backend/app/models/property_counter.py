@@ -0,0 +1,94 @@
+# app/models/property_counter.py
+"""
+Contatori annunci per stato e proprietario
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Mantenuti dagli event listener su Property nella stessa transazione della
+scrittura, così i totali della dashboard si leggono in O(1) invece di
+eseguire COUNT(*) sulla tabella annunci.
+"""
+
+from sqlalchemy import Column, Integer, Enum, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.database import Base
+from app.models.property import Property, PropertyStatus
+
+# owner_id usato per i totali globali (tutti i proprietari)
+ALL_OWNERS = 0
+
+
+class PropertyCounter(Base):
+    """Numero di annunci per (proprietario, stato)"""
+    __tablename__ = "property_counters"
+
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    status = Column(Enum(PropertyStatus), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<PropertyCounter owner={self.owner_id} {self.status}: {self.count}>"
+
+
+# ============================================================
+# EVENT LISTENERS - Aggiornamento contatori
+# ============================================================
+
+def _bump(connection, owner_id, status, delta: int) -> None:
+    """Aggiunge delta ai contatori del proprietario e globali (upsert)"""
+    if status is None or owner_id is None:
+        return
+
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        insert = None
+
+    table = PropertyCounter.__table__
+    for key in (owner_id, ALL_OWNERS):
+        if insert is not None:
+            stmt = insert(table).values(owner_id=key, status=status, count=delta)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.owner_id, table.c.status],
+                set_={"count": table.c.count + delta}
+            )
+            connection.execute(stmt)
+            continue
+
+        result = connection.execute(
+            table.update()
+            .where(table.c.owner_id == key, table.c.status == status)
+            .values(count=table.c.count + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(owner_id=key, status=status, count=delta))
+
+
+@event.listens_for(Property, "after_insert")
+def _count_inserted(mapper, connection, target):
+    _bump(connection, target.owner_id, target.status, +1)
+
+
+@event.listens_for(Property, "after_update")
+def _count_updated(mapper, connection, target):
+    state = inspect(target)
+    status_history = state.attrs.status.history
+    owner_history = state.attrs.owner_id.history
+    if not status_history.has_changes() and not owner_history.has_changes():
+        return
+
+    old_status = status_history.deleted[0] if status_history.deleted else target.status
+    old_owner = owner_history.deleted[0] if owner_history.deleted else target.owner_id
+    _bump(connection, old_owner, old_status, -1)
+    _bump(connection, target.owner_id, target.status, +1)
+
+
+@event.listens_for(Property, "after_delete")
+def _count_deleted(mapper, connection, target):
+    _bump(connection, target.owner_id, target.status, -1)
+
+
+__all__ = ["PropertyCounter", "ALL_OWNERS"]
@@ -58,6 +58,11 @@ class PropertyImage(Base, BaseModel):
     def __repr__(self):
         return f"<PropertyImage(id={self.id}, property_id={self.property_id}, order={self.display_order})>"
     
+    @property
+    def urls(self) -> dict:
+        """URLs delle versioni (usato dagli schemi di risposta)"""
+        return self.get_urls()
+    
     def get_urls(self) -> dict:
         """Genera URLs per le versioni dell'immagine"""
         return {
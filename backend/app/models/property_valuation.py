@@ -0,0 +1,58 @@
+# app/models/property_valuation.py
+"""
+Valutazioni salvate degli annunci
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Una riga per annuncio con l'ultima valutazione del motore e l'impronta
+degli input che l'hanno prodotta. Il ricalcolo è incrementale (vedi
+app/services/listing_valuation.py): solo le righe con dipendenze
+cambiate vengono rivalutate.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
+
+from app.core.database import Base
+
+
+class PropertyValuation(Base):
+    """Valutazione corrente di un annuncio"""
+    __tablename__ = "property_valuations"
+    __table_args__ = (
+        Index("ix_property_valuations_zone", "comune_istat", "zona_codice"),
+    )
+
+    property_id = Column(
+        Integer,
+        ForeignKey('properties.id', ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False
+    )
+
+    # Impronta degli input; NULL = ricalcolo forzato (quotazioni OMI cambiate)
+    input_hash = Column(String(64))
+    stale = Column(Boolean, default=False, nullable=False, index=True)  # Campi annuncio modificati
+
+    # Dipendenze
+    comune = Column(String(100), nullable=False)  # Nome OMI ufficiale (o maiuscolo se non risolto)
+    comune_istat = Column(String(6))  # None = comune non risolto dall'indice
+    zona_codice = Column(String(10))  # Zona OMI usata (None = nessuna quotazione)
+    semestre = Column(String(10))
+    legal_rate = Column(Float, nullable=False)
+
+    # Risultato
+    full_value = Column(Float)  # Stima piena proprietà (€)
+    bare_value = Column(Float)  # Nuda proprietà fiscale (€)
+    bare_value_actuarial = Column(Float)  # Nuda proprietà attuariale (€)
+    deal_discount_pct = Column(Float)  # Prezzo richiesto vs stima (%)
+    result = Column(JSON)
+    error = Column(Text)
+
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PropertyValuation property={self.property_id} {self.bare_value}>"
+
+
+__all__ = ["PropertyValuation"]
@@ -0,0 +1,133 @@
+# app/models/zone_deal_digest.py
+"""
+Distribuzione del deal score per zona OMI
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Un t-digest (app/core/tdigest.py) per zona con i deal score degli annunci
+pubblicati: il percentile di un annuncio nella sua zona si legge con una
+lettura per chiave primaria, senza scorrere gli annunci della zona.
+
+Mantenuti dagli event listener su Property nella stessa transazione della
+scrittura (pubblicazione, modifica di prezzo/zona, eliminazione), come i
+contatori. I ricalcoli massivi (UPDATE in batch, senza listener)
+ricostruiscono i digest dei comuni toccati (services/deal_distribution.py).
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import JSON, Column, DateTime, Integer, String, event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.database import Base
+from app.core.tdigest import TDigest
+from app.models.property import Property, PropertyStatus
+
+
+class ZoneDealDigest(Base):
+    """Deal score degli annunci pubblicati di una zona (t-digest)"""
+    __tablename__ = "zone_deal_digests"
+    
+    zone_key = Column(String(120), primary_key=True)  # link_zona OMI, o comune:<NOME>
+    comune = Column(String(100), nullable=False, index=True)  # Maiuscolo
+    count = Column(Integer, default=0, nullable=False)
+    digest = Column(JSON, nullable=False)  # TDigest.to_dict()
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<ZoneDealDigest {self.zone_key}: {self.count}>"
+
+
+def zone_key(link_zona: Optional[str], city: Optional[str]) -> str:
+    """Zona OMI dell'annuncio; senza perimetri importati, il comune"""
+    return link_zona or f"comune:{(city or '').strip().upper()}"
+
+
+# ============================================================
+# EVENT LISTENERS - Aggiornamento digest
+# ============================================================
+
+def _membership(status, deal_score, link_zona, city) -> Optional[Tuple[str, str, float]]:
+    """(zona, comune, deal score) se l'annuncio entra nella distribuzione"""
+    if status != PropertyStatus.PUBLISHED or deal_score is None or not city:
+        return None
+    return zone_key(link_zona, city), city.strip().upper(), float(deal_score)
+
+
+def save_digest(connection, key: str, comune: str, digest: TDigest) -> None:
+    """Scrive il digest della zona (upsert)"""
+    table = ZoneDealDigest.__table__
+    values = {
+        "comune": comune,
+        "count": int(round(digest.count)),
+        "digest": digest.to_dict(),
+        "updated_at": datetime.utcnow(),
+    }
+    
+    dialect = connection.dialect.name
+    insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+    if insert is not None:
+        stmt = insert(table).values(zone_key=key, **values)
+        connection.execute(stmt.on_conflict_do_update(index_elements=[table.c.zone_key], set_=values))
+        return
+    
+    result = connection.execute(table.update().where(table.c.zone_key == key).values(**values))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(zone_key=key, **values))
+
+
+def _update_digest(connection, key: str, comune: str, add=None, remove=None) -> None:
+    """Legge (con lock), modifica e riscrive il digest di una zona"""
+    table = ZoneDealDigest.__table__
+    row = connection.execute(
+        select(table.c.digest).where(table.c.zone_key == key).with_for_update()
+    ).first()
+    digest = TDigest.from_dict(row.digest if row else None)
+    if remove is not None:
+        digest.remove(remove)
+    if add is not None:
+        digest.add(add)
+    save_digest(connection, key, comune, digest)
+
+
+def _move(connection, old, new) -> None:
+    if old == new:
+        return
+    if old and new and old[0] == new[0]:
+        _update_digest(connection, new[0], new[1], add=new[2], remove=old[2])
+        return
+    if old:
+        _update_digest(connection, old[0], old[1], remove=old[2])
+    if new:
+        _update_digest(connection, new[0], new[1], add=new[2])
+
+
+def _previous(state, name: str, current):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else current
+
+
+@event.listens_for(Property, "after_insert")
+def _digest_inserted(mapper, connection, target):
+    _move(connection, None, _membership(target.status, target.deal_score, target.omi_link_zona, target.city))
+
+
+@event.listens_for(Property, "after_update")
+def _digest_updated(mapper, connection, target):
+    state = inspect(target)
+    old = _membership(
+        _previous(state, "status", target.status),
+        _previous(state, "deal_score", target.deal_score),
+        _previous(state, "omi_link_zona", target.omi_link_zona),
+        _previous(state, "city", target.city)
+    )
+    new = _membership(target.status, target.deal_score, target.omi_link_zona, target.city)
+    _move(connection, old, new)
+
+
+@event.listens_for(Property, "after_delete")
+def _digest_deleted(mapper, connection, target):
+    _move(connection, _membership(target.status, target.deal_score, target.omi_link_zona, target.city), None)
+
+
+__all__ = ["ZoneDealDigest", "zone_key", "save_digest"]
@@ -14,7 +14,10 @@ from app.schemas.property import (
     PropertyCreate,
     PropertyUpdate,
     Property,
-    PropertyList
+    PropertyList,
+    PropertyImageSummary,
+    PropertySort,
+    PropertyStats
 )
 
 __all__ = [
@@ -31,5 +34,8 @@ __all__ = [
     "PropertyCreate",
     "PropertyUpdate",
     "Property",
-    "PropertyList"
+    "PropertyList",
+    "PropertyImageSummary",
+    "PropertySort",
+    "PropertyStats"
 ]
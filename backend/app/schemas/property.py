@@ -1,8 +1,9 @@
 # backend/app/schemas/property.py
 
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+from enum import Enum
 from app.models.property import (
     PropertyType,
     PropertyStatus,
@@ -12,6 +13,16 @@ from app.models.property import (
 )
 
 
+class PropertySort(str, Enum):
+    """Sort keys for property search"""
+    RECENT = "recent"
+    DISCOUNT = "discount"
+    DEAL_SCORE = "deal_score"
+    PRICE_SQM = "price_sqm"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+
+
 # Base Property Schema
 class PropertyBase(BaseModel):
     """Base property schema with common fields"""
@@ -25,6 +36,8 @@ class PropertyBase(BaseModel):
     province: str
     region: str
     zip_code: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     show_exact_location: bool = False
     
     # Property Details
@@ -131,6 +144,8 @@ class PropertyUpdate(BaseModel):
     province: Optional[str] = None
     region: Optional[str] = None
     zip_code: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     show_exact_location: Optional[bool] = None
     
     # Property Details
@@ -201,6 +216,25 @@ class PropertyUpdate(BaseModel):
         return v
 
 
+# Schema for Property Image (embedded in property responses)
+class PropertyImageSummary(BaseModel):
+    """Image reference embedded in property responses"""
+    id: int
+    display_order: int = 0
+    is_cover: bool = False
+    urls: Dict[str, str]
+    
+    model_config = {"from_attributes": True}
+
+
+class DealScoreRank(BaseModel):
+    """Deal score percentile among published listings of the same OMI zone"""
+    percentile: float  # 0-100, higher = better deal than the zone
+    zone_listings: int
+    zone_median: float
+    zone: str
+
+
 # Schema for Property in DB (what we return)
 class Property(PropertyBase):
     """Complete property schema (from database)"""
@@ -208,15 +242,25 @@ class Property(PropertyBase):
     owner_id: int
     status: PropertyStatus
     
-    # Location coords
-    latitude: Optional[float] = None
-    longitude: Optional[float] = None
+    # OMI zone (from coordinates)
+    omi_link_zona: Optional[str] = None
+    omi_zona_codice: Optional[str] = None
     
     # Stats
     is_featured: bool = False
     views_count: int = 0
     contacts_count: int = 0
     
+    # Derived metrics
+    discount_pct: Optional[float] = None
+    price_per_sqm: Optional[float] = None
+    omi_price_sqm: Optional[float] = None
+    deal_score: Optional[float] = None
+    deal_score_rank: Optional[DealScoreRank] = None  # Detail endpoint only
+    
+    # Images (ordered by display_order)
+    images: List[PropertyImageSummary] = []
+    
     # Timestamps
     created_at: datetime
     updated_at: datetime
@@ -241,15 +285,30 @@ class PropertyList(BaseModel):
     is_featured: bool
     views_count: int
     created_at: datetime
+    discount_pct: Optional[float] = None
+    price_per_sqm: Optional[float] = None
+    deal_score: Optional[float] = None
+    cover_image: Optional[PropertyImageSummary] = None
     
     model_config = {"from_attributes": True}
 
 
+# Schema for dashboard counters
+class PropertyStats(BaseModel):
+    """Property totals for the owner dashboard"""
+    total: int  # Owner's properties, excluding deleted
+    by_status: Dict[PropertyStatus, int]
+    published_total: int  # Published properties on the platform
+
+
 # Export schemas
 __all__ = [
     "PropertyBase",
     "PropertyCreate",
     "PropertyUpdate",
     "Property",
-    "PropertyList"
+    "PropertyList",
+    "PropertyImageSummary",
+    "PropertySort",
+    "PropertyStats"
 ]
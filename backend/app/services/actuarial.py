@@ -0,0 +1,235 @@
+# app/services/actuarial.py
+"""
+Valore Attuariale di Nuda Proprietà e Usufrutto
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Il valore fiscale (calculate_fiscal_value) applica la tabella dei
+coefficienti ministeriali al tasso legale. Per chi investe conta il valore
+economico: il nudo proprietario riceve la piena proprietà alla morte
+dell'usufruttuario, quindi
+
+    nuda = V × E[ ((1 + g) / (1 + r)) ^ T ]      usufrutto = V - nuda
+
+con T anni residui di vita (dalle tavole di mortalità per età e sesso),
+r tasso di sconto e g rivalutazione annua dell'immobile (default 0: r è
+un tasso reale). La morte è collocata a metà dell'anno in cui avviene.
+
+Per ogni tavola si calcola una volta la matrice D[x, t] = probabilità che
+chi ha x anni muoia nell'anno t; il fattore di nuda proprietà per tutte le
+età e tutti i tassi richiesti è un solo prodotto matrice D[età] @ sconto[t, tasso].
+"""
+
+import csv
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tavole di mortalità incluse (sovrascrivibile con LIFE_TABLE_FILE)
+DEFAULT_LIFE_TABLE_FILE = os.getenv(
+    'LIFE_TABLE_FILE',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'tavole_mortalita.csv')
+)
+
+# Tasso di sconto reale di default (rendimento atteso da un investimento immobiliare)
+DEFAULT_DISCOUNT_RATE = 0.03
+
+# Sesso dell'usufruttuario: M, F o U (non indicato: media delle due tavole)
+SEXES = ('M', 'F', 'U')
+LIFE_TABLE_COLUMNS = {'M': 'qx_maschi', 'F': 'qx_femmine'}
+
+
+def normalize_sex(sex: Optional[str]) -> str:
+    """M/F (anche maschio/femmina, minuscolo); altrimenti U"""
+    initial = (sex or '').strip()[:1].upper()
+    return initial if initial in ('M', 'F') else 'U'
+
+
+# ============================================================================
+# TAVOLE DI MORTALITÀ
+# ============================================================================
+
+class LifeTable:
+    """Tavola di mortalità per età (0..max_age) e sesso, con le matrici di decesso"""
+    
+    def __init__(self, qx: Dict[str, Sequence[float]]):
+        """
+        Args:
+            qx: {'M': qx, 'F': qx} probabilità di morte entro l'anno per
+                età 0, 1, ...; l'ultima età chiude la tavola (qx = 1)
+        """
+        qx = {sex: np.clip(np.asarray(values, dtype=np.float64), 0.0, 1.0) for sex, values in qx.items()}
+        if len({len(values) for values in qx.values()}) != 1:
+            raise ValueError("Tavole M/F di lunghezza diversa")
+        qx['U'] = (qx['M'] + qx['F']) / 2
+        for values in qx.values():
+            values[-1] = 1.0
+        
+        self.qx = qx
+        self.max_age = len(qx['M']) - 1
+        self.deaths = {sex: self.death_matrix(values) for sex, values in qx.items()}
+        # Anni residui attesi (morte a metà anno)
+        midpoints = np.arange(self.max_age + 1) + 0.5
+        self.life_expectancy = {sex: matrix @ midpoints for sex, matrix in self.deaths.items()}
+    
+    @staticmethod
+    def death_matrix(qx: np.ndarray) -> np.ndarray:
+        """
+        D[x, t] = probabilità che chi ha x anni muoia tra t e t + 1 anni
+        (ogni riga somma a 1)
+        """
+        n = len(qx)
+        survivors = np.concatenate([[1.0], np.cumprod(1 - qx)[:-1]])
+        deaths = survivors * qx
+        ages = np.arange(n)
+        reached = ages[:, None] + ages[None, :]
+        valid = reached < n
+        matrix = np.where(valid, deaths[np.minimum(reached, n - 1)], 0.0)
+        return matrix / survivors[:, None]
+    
+    def age_index(self, ages) -> np.ndarray:
+        """Età intere limitate a 0..max_age"""
+        return np.clip(np.asarray(ages, dtype=np.int64), 0, self.max_age)
+
+
+def load_life_table(path: str) -> LifeTable:
+    """
+    Legge un CSV eta,qx_maschi,qx_femmine (righe '#' di commento ignorate)
+    
+    Raises:
+        ValueError: età non consecutive da 0 o qx fuori da [0, 1]
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith('#')))
+    if not rows:
+        raise ValueError(f"Tavola di mortalità vuota: {path}")
+    
+    ages = [int(row['eta']) for row in rows]
+    if ages != list(range(len(ages))):
+        raise ValueError("Le età devono essere consecutive a partire da 0")
+    qx = {sex: [float(row[column]) for row in rows] for sex, column in LIFE_TABLE_COLUMNS.items()}
+    if any(not 0 <= q <= 1 for values in qx.values() for q in values):
+        raise ValueError("qx deve essere una probabilità tra 0 e 1")
+    return LifeTable(qx)
+
+
+# Tavole caricate per processo: path -> (mtime, tavola)
+_tables: Dict[str, Tuple[int, Optional[LifeTable]]] = {}
+_tables_lock = threading.Lock()
+
+
+def get_life_table(path: Optional[str] = None) -> Optional[LifeTable]:
+    """
+    Tavola del file (default DEFAULT_LIFE_TABLE_FILE), caricata una sola
+    volta per processo; None se il file manca o non è valido.
+    """
+    path = os.path.abspath(path or DEFAULT_LIFE_TABLE_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            table = load_life_table(path)
+        except Exception as e:
+            logger.warning(f"Tavola di mortalità {path} non utilizzabile: {e}")
+            table = None
+        _tables[path] = (mtime, table)
+        return table
+
+
+# ============================================================================
+# VALORE ATTUALE ATTESO
+# ============================================================================
+
+def bare_ownership_factors(
+    table: LifeTable,
+    ages: Iterable[int],
+    rates: Iterable[float],
+    sex: Optional[str] = None,
+    growth: float = 0.0,
+    term: Optional[float] = None
+) -> np.ndarray:
+    """
+    Quota di nuda proprietà E[((1 + g) / (1 + r)) ^ T] per ogni età e tasso
+    
+    Args:
+        term: Durata dell'usufrutto temporaneo in anni: si estingue alla
+            prima tra morte e scadenza, T = min(T, term)
+    
+    Returns:
+        Matrice (età, tassi) di valori tra 0 e 1
+    """
+    rates = np.atleast_1d(np.asarray(rates, dtype=np.float64))
+    if np.any(rates <= -1):
+        raise ValueError("Tasso di sconto deve essere maggiore di -100%")
+    deaths = table.deaths[normalize_sex(sex)][table.age_index(np.atleast_1d(ages))]
+    years = np.arange(table.max_age + 1) + 0.5
+    if term is not None:
+        years = np.minimum(years, term)
+    discount = np.power((1 + growth) / (1 + rates)[None, :], years[:, None])
+    return deaths @ discount
+
+
+def actuarial_valuation(
+    table: LifeTable,
+    full_property_value: float,
+    usufructuary_age: int,
+    sex: Optional[str] = None,
+    discount_rate: float = DEFAULT_DISCOUNT_RATE,
+    growth: float = 0.0,
+    term: Optional[float] = None
+) -> Dict:
+    """
+    Valore economico di nuda proprietà e usufrutto (vitalizio, o
+    temporaneo di `term` anni)
+    
+    Returns:
+        Dict con valore_nuda_proprieta, valore_usufrutto, percentuali,
+        speranza_vita (anni residui), tasso_sconto, durata_anni e sesso usato
+    """
+    sex = normalize_sex(sex)
+    factor = float(bare_ownership_factors(table, [usufructuary_age], [discount_rate], sex, growth, term)[0, 0])
+    valore_nuda = full_property_value * factor
+    return {
+        'valore_nuda_proprieta': valore_nuda,
+        'valore_usufrutto': full_property_value - valore_nuda,
+        'percentuale_nuda': round(factor * 100, 2),
+        'percentuale_usufrutto': round((1 - factor) * 100, 2),
+        'speranza_vita': round(float(table.life_expectancy[sex][table.age_index(usufructuary_age)]), 2),
+        'tasso_sconto': discount_rate,
+        'rivalutazione': growth,
+        'durata_anni': term,
+        'sesso': sex
+    }
+
+
+def actuarial_grid(
+    table: LifeTable,
+    ages: Sequence[int],
+    rates: Sequence[float],
+    sex: Optional[str] = None,
+    growth: float = 0.0
+) -> Dict:
+    """
+    Griglia età × tasso delle percentuali di nuda proprietà (una riga per età,
+    una colonna per tasso) con la speranza di vita di ogni età
+    """
+    sex = normalize_sex(sex)
+    factors = bare_ownership_factors(table, ages, rates, sex, growth)
+    return {
+        'sesso': sex,
+        'rivalutazione': growth,
+        'eta': [int(age) for age in ages],
+        'tassi': [float(rate) for rate in rates],
+        'speranza_vita': np.round(table.life_expectancy[sex][table.age_index(ages)], 2).tolist(),
+        'percentuale_nuda': np.round(factors * 100, 2).tolist()
+    }
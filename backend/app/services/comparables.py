@@ -0,0 +1,278 @@
+# app/services/comparables.py
+"""
+Stima per Comparabili dagli Annunci Pubblicati
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Ogni annuncio pubblicato con coordinate diventa un punto in uno spazio di
+caratteristiche normalizzate: posizione (km), superficie (log), locali,
+classe energetica. Le scale sono scelte perché una unità di distanza
+"valga" lo stesso in ogni dimensione (1 km ~ +25% di superficie ~ 2 locali
+~ 3 classi energetiche).
+
+Per l'immobile da valutare si cercano i k annunci più vicini (KD-tree
+scipy se installato; altrimenti gli annunci sono ordinati per coordinata
+est-ovest e la distanza, vettoriale numpy, è calcolata solo nella striscia
+di ±MAX_DISTANCE km) e se ne combina il prezzo €/mq di piena proprietà,
+pesato per vicinanza. La confidenza (0-1) dipende da quanti comparabili ci sono,
+quanto sono vicini e quanto sono concordi tra loro.
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from app.models.property import EnergyClass, Property, PropertyStatus
+
+# KD-tree opzionale (query O(log n))
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+logger = logging.getLogger(__name__)
+
+# Scale delle dimensioni (differenza che vale "1" di distanza)
+DISTANCE_SCALE_KM = 1.0
+SURFACE_SCALE_LOG = math.log(1.25)
+ROOMS_SCALE = 2.0
+ENERGY_SCALE = 3.0
+
+# km per grado (latitudine; longitudine alla latitudine media italiana)
+KM_PER_DEGREE_LAT = 110.57
+KM_PER_DEGREE_LON = 111.32 * math.cos(math.radians(42.0))
+
+# Classi energetiche dalla migliore alla peggiore
+ENERGY_RANK = {energy.value: rank for rank, energy in enumerate(EnergyClass)}
+DEFAULT_ENERGY_RANK = ENERGY_RANK['e']
+
+# Ricerca e combinazione
+DEFAULT_K = 10
+MIN_COMPARABLES = 3
+MAX_DISTANCE = 5.0  # Comparabili oltre questa distanza normalizzata scartati
+MAX_COMPARABLES_WEIGHT = 0.5  # Peso massimo della stima comparabili vs OMI
+
+# Secondi di validità dell'indice (gli annunci cambiano)
+REFRESH_SECONDS = 600
+
+
+def default_rooms(surface_sqm: float) -> float:
+    """Locali stimati dalla superficie (un locale ogni ~30 mq)"""
+    return max(1.0, round(surface_sqm / 30))
+
+
+def feature_vectors(latitude, longitude, surface_sqm, rooms, energy_rank) -> np.ndarray:
+    """Caratteristiche normalizzate (n, 5) da array o scalari"""
+    return np.column_stack([
+        np.asarray(longitude, dtype=np.float64) * KM_PER_DEGREE_LON / DISTANCE_SCALE_KM,
+        np.asarray(latitude, dtype=np.float64) * KM_PER_DEGREE_LAT / DISTANCE_SCALE_KM,
+        np.log(np.asarray(surface_sqm, dtype=np.float64)) / SURFACE_SCALE_LOG,
+        np.asarray(rooms, dtype=np.float64) / ROOMS_SCALE,
+        np.asarray(energy_rank, dtype=np.float64) / ENERGY_SCALE,
+    ])
+
+
+@dataclass(frozen=True)
+class Comparable:
+    property_id: int
+    distance: float
+    price_sqm: float
+    
+    def to_dict(self, weight: float) -> Dict:
+        return {
+            'id': self.property_id,
+            'distanza': round(self.distance, 3),
+            'prezzo_mq': round(self.price_sqm, 2),
+            'peso': round(weight, 3)
+        }
+
+
+class ComparablesIndex:
+    """Annunci pubblicati indicizzati per caratteristiche (sola lettura)"""
+    
+    def __init__(self, ids, latitude, longitude, surface_sqm, rooms, energy_rank, price_sqm):
+        features = feature_vectors(latitude, longitude, surface_sqm, rooms, energy_rank)
+        # Ordinati per x: la ricerca senza KD-tree scandisce solo una striscia
+        order = np.argsort(features[:, 0], kind='stable')
+        self.features = features[order]
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.price_sqm = np.asarray(price_sqm, dtype=np.float64)[order]
+        self.tree = cKDTree(self.features) if cKDTree is not None and len(self.ids) else None
+        self.built_at = time.monotonic()
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    @classmethod
+    def from_rows(cls, rows: Iterable, legal_rate: float, usufruct_coefficient: Callable) -> 'ComparablesIndex':
+        """
+        Indice dalle righe di load_listings. Il prezzo confrontato è la piena
+        proprietà €/mq: full_property_value se indicato, altrimenti il prezzo
+        di nuda proprietà riportato a piena con il coefficiente fiscale.
+        """
+        columns = {name: [] for name in ('ids', 'latitude', 'longitude', 'surface_sqm',
+                                          'rooms', 'energy_rank', 'price_sqm')}
+        for row in rows:
+            full_value = row.full_property_value
+            if not full_value and row.bare_property_value and row.usufructuary_age is not None:
+                coefficiente = usufruct_coefficient(row.usufructuary_age)[0]
+                full_value = row.bare_property_value / (1 - legal_rate * coefficiente)
+            if not full_value or not row.surface_sqm:
+                continue
+            energy = getattr(row.energy_class, 'value', row.energy_class)
+            columns['ids'].append(row.id)
+            columns['latitude'].append(row.latitude)
+            columns['longitude'].append(row.longitude)
+            columns['surface_sqm'].append(row.surface_sqm)
+            columns['rooms'].append(row.rooms or default_rooms(row.surface_sqm))
+            columns['energy_rank'].append(ENERGY_RANK.get(energy, DEFAULT_ENERGY_RANK))
+            columns['price_sqm'].append(full_value / row.surface_sqm)
+        return cls(**columns)
+    
+    def query(
+        self,
+        latitude: float,
+        longitude: float,
+        surface_sqm: float,
+        rooms: Optional[int] = None,
+        energy_class: Optional[str] = None,
+        k: int = DEFAULT_K,
+        exclude_ids: Iterable[int] = ()
+    ) -> List[Comparable]:
+        """k annunci più simili entro MAX_DISTANCE, dal più vicino"""
+        if not len(self.ids):
+            return []
+        point = feature_vectors(
+            latitude, longitude, surface_sqm,
+            rooms or default_rooms(surface_sqm),
+            ENERGY_RANK.get((energy_class or '').lower(), DEFAULT_ENERGY_RANK)
+        )[0]
+        exclude = set(exclude_ids)
+        wanted = min(k + len(exclude), len(self.ids))
+        
+        if self.tree is not None:
+            distances, positions = self.tree.query(point, k=wanted, distance_upper_bound=MAX_DISTANCE)
+            distances, positions = np.atleast_1d(distances), np.atleast_1d(positions)
+            found = np.isfinite(distances)
+            distances, positions = distances[found], positions[found]
+        else:
+            lo, hi = np.searchsorted(self.features[:, 0], [point[0] - MAX_DISTANCE, point[0] + MAX_DISTANCE])
+            strip = np.sqrt(((self.features[lo:hi] - point) ** 2).sum(axis=1))
+            positions = np.flatnonzero(strip <= MAX_DISTANCE)
+            if len(positions) > wanted:
+                positions = positions[np.argpartition(strip[positions], wanted - 1)[:wanted]]
+            positions = positions[np.argsort(strip[positions], kind='stable')]
+            distances = strip[positions]
+            positions = positions + lo
+        
+        comparables = [
+            Comparable(int(self.ids[i]), float(d), float(self.price_sqm[i]))
+            for d, i in zip(distances, positions)
+            if int(self.ids[i]) not in exclude
+        ]
+        return comparables[:k]
+
+
+def combine_comparables(comparables: List[Comparable], k: int = DEFAULT_K) -> Optional[Dict]:
+    """
+    Prezzo €/mq pesato per vicinanza e confidenza della stima.
+    
+    confidenza = copertura (trovati / k) × vicinanza (exp(-distanza media / 2))
+                 × concordanza (1 - coefficiente di variazione dei prezzi)
+    
+    Returns:
+        Dict con prezzo_mq, confidenza, numero, comparabili; None se meno
+        di MIN_COMPARABLES
+    """
+    if len(comparables) < MIN_COMPARABLES:
+        return None
+    
+    distances = np.array([c.distance for c in comparables])
+    prices = np.array([c.price_sqm for c in comparables])
+    weights = 1.0 / (1.0 + distances)
+    weights /= weights.sum()
+    
+    price_sqm = float((weights * prices).sum())
+    dispersion = float(np.sqrt((weights * (prices - price_sqm) ** 2).sum()) / price_sqm)
+    coverage = min(1.0, len(comparables) / k)
+    proximity = math.exp(-float(distances.mean()) / 2)
+    confidence = coverage * proximity * max(0.0, 1.0 - dispersion)
+    
+    return {
+        'prezzo_mq': round(price_sqm, 2),
+        'confidenza': round(confidence, 3),
+        'dispersione': round(dispersion, 3),
+        'numero': len(comparables),
+        'comparabili': [c.to_dict(w) for c, w in zip(comparables, weights)]
+    }
+
+
+def load_listings(engine: Engine) -> List:
+    """Annunci pubblicati con coordinate e superficie"""
+    table = Property.__table__
+    query = select(
+        table.c.id, table.c.latitude, table.c.longitude, table.c.surface_sqm, table.c.rooms,
+        table.c.energy_class, table.c.full_property_value, table.c.bare_property_value,
+        table.c.usufructuary_age
+    ).where(
+        table.c.status == PropertyStatus.PUBLISHED,
+        table.c.latitude.isnot(None),
+        table.c.longitude.isnot(None),
+        table.c.surface_sqm > 0
+    )
+    with engine.connect() as conn:
+        return conn.execute(query).fetchall()
+
+
+# Indice per processo, ricostruito dopo REFRESH_SECONDS
+_index: Optional[ComparablesIndex] = None
+_failed_at: Optional[float] = None
+_index_lock = threading.Lock()
+
+
+def get_comparables_index(
+    engine: Engine,
+    legal_rate: Callable[[], float],
+    usufruct_coefficient: Callable
+) -> Optional[ComparablesIndex]:
+    """
+    Indice degli annunci pubblicati; None se il database non è raggiungibile
+    (nuovo tentativo dopo REFRESH_SECONDS).
+    
+    Args:
+        legal_rate: Tasso legale (chiamato solo quando l'indice è ricostruito)
+        usufruct_coefficient: Età -> (coefficiente, % usufrutto, % nuda);
+            con il tasso riporta i prezzi di nuda proprietà a piena proprietà
+    """
+    global _index, _failed_at
+    now = time.monotonic()
+    if _index is not None and now - _index.built_at < REFRESH_SECONDS:
+        return _index
+    with _index_lock:
+        if _index is not None and now - _index.built_at < REFRESH_SECONDS:
+            return _index
+        if _failed_at is not None and now - _failed_at < REFRESH_SECONDS:
+            return _index
+        try:
+            start = time.perf_counter()
+            _index = ComparablesIndex.from_rows(load_listings(engine), legal_rate(), usufruct_coefficient)
+            logger.info(f"Indice comparabili: {len(_index)} annunci in {time.perf_counter() - start:.2f}s")
+            _failed_at = None
+        except Exception as e:
+            logger.warning(f"Indice comparabili non disponibile: {e}")
+            _failed_at = now
+        return _index
+
+
+def reset_comparables_index() -> None:
+    """Scarta l'indice (ricostruito alla prossima richiesta)"""
+    global _index, _failed_at
+    with _index_lock:
+        _index = None
+        _failed_at = None
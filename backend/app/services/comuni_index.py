@@ -0,0 +1,283 @@
+# app/services/comuni_index.py
+"""
+Dizionario Comuni OMI con Ricerca Fuzzy
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Risolve il nome di comune digitato dall'utente nel comune OMI (codice
+ISTAT + nome ufficiale), anche con accenti, apostrofi o preposizioni
+mancanti: "Reggio Emilia" -> REGGIO NELL'EMILIA, "Forli" -> FORLI',
+"S. Benedetto del Tronto" -> SAN BENEDETTO DEL TRONTO.
+
+Il dizionario è costruito per processo da omi_zones (~8.000 comuni) e
+ricostruito quando cambia il semestre OMI corrente. Per ogni comune ci sono più chiavi normalizzate (alias) e due
+indici in memoria:
+- chiavi ordinate, per l'autocompletamento per prefisso (bisect)
+- indice inverso di trigrammi, per la similarità (coefficiente di Dice)
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.services.omi_snapshot import CHECK_INTERVAL_SECONDS, current_semester
+
+logger = logging.getLogger(__name__)
+
+# Preposizioni e articoli ignorati negli alias ("REGGIO NELL'EMILIA" ~ "REGGIO EMILIA")
+STOPWORDS = {
+    'DI', 'DA', 'DE', 'DEL', 'DELLO', 'DELLA', 'DELL', 'DEI', 'DEGLI', 'DELLE',
+    'NEL', 'NELLO', 'NELLA', 'NELL', 'NEI', 'NEGLI', 'NELLE', 'IN',
+    'SUL', 'SULLO', 'SULLA', 'SULL', 'SUI', 'SUGLI', 'SULLE', 'SU',
+    'AL', 'ALLO', 'ALLA', 'ALL', 'AI', 'AGLI', 'ALLE', 'A', 'E', 'ED',
+    'IL', 'LO', 'LA', 'L', 'I', 'GLI', 'LE',
+}
+
+# Santi abbreviati: "S. GIOVANNI" ~ "SAN GIOVANNI" ~ "SANTA/SANTO/SANT'..."
+SAINT_PREFIXES = {'SAN', 'SANTA', 'SANTO', 'SANT', 'S'}
+
+# Similarità minima per risolvere un nome senza match esatto, e distacco
+# minimo dal secondo candidato (altrimenti il nome è ambiguo)
+RESOLVE_THRESHOLD = 0.6
+RESOLVE_MARGIN = 0.1
+
+# Secondi prima di ritentare il caricamento dopo un errore
+RETRY_SECONDS = 60
+
+
+def normalize_name(name: str) -> str:
+    """Maiuscolo, senza accenti, apostrofi/trattini/punti -> spazio"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    ascii_name = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(re.sub(r"[^A-Z0-9]+", ' ', ascii_name.upper()).split())
+
+
+def name_keys(name: str) -> Set[str]:
+    """
+    Chiavi di ricerca di un nome: forma normalizzata, forma senza
+    preposizioni, santi abbreviati; per i nomi bilingui ("BOLZANO/BOZEN")
+    anche ogni parte.
+    """
+    keys = set()
+    for part in [name] + (name.split('/') if '/' in name else []):
+        normalized = normalize_name(part)
+        if not normalized:
+            continue
+        keys.add(normalized)
+        
+        tokens = [t for t in normalized.split() if t not in STOPWORDS] or normalized.split()
+        compact = ' '.join(tokens)
+        keys.add(compact)
+        if tokens[0] in SAINT_PREFIXES:
+            keys.add(' '.join(['S'] + tokens[1:]))
+    return keys
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Comune:
+    istat: str
+    nome: str
+    provincia: Optional[str] = None
+    regione: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ComuneMatch:
+    comune: Comune
+    score: float  # 1.0 = match esatto su una chiave normalizzata
+    
+    def to_dict(self) -> Dict:
+        return {
+            'istat': self.comune.istat,
+            'nome': self.comune.nome,
+            'provincia': self.comune.provincia,
+            'regione': self.comune.regione,
+            'score': round(self.score, 3)
+        }
+
+
+class ComuniIndex:
+    """Indice in memoria dei comuni (sola lettura dopo la costruzione)"""
+    
+    def __init__(self, comuni: Iterable[Comune]):
+        self.by_istat: Dict[str, Comune] = {}
+        self.by_key: Dict[str, Set[str]] = defaultdict(set)
+        
+        for comune in comuni:
+            self.by_istat[comune.istat] = comune
+            for key in name_keys(comune.nome):
+                self.by_key[key].add(comune.istat)
+        
+        self.keys: List[str] = sorted(self.by_key)
+        self.key_trigrams: List[Set[str]] = [trigrams(key) for key in self.keys]
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for key_id, grams in enumerate(self.key_trigrams):
+            for gram in grams:
+                self.postings[gram].append(key_id)
+    
+    def __len__(self) -> int:
+        return len(self.by_istat)
+    
+    def get(self, istat: str) -> Optional[Comune]:
+        return self.by_istat.get(istat)
+    
+    def _best_by_comune(self, scored: Dict[int, float]) -> List[ComuneMatch]:
+        """Punteggi per chiave -> miglior punteggio per comune, decrescente"""
+        best: Dict[str, float] = {}
+        for key_id, score in scored.items():
+            for istat in self.by_key[self.keys[key_id]]:
+                if score > best.get(istat, 0.0):
+                    best[istat] = score
+        return sorted(
+            (ComuneMatch(self.by_istat[istat], score) for istat, score in best.items()),
+            key=lambda match: (-match.score, match.comune.nome)
+        )
+    
+    def _fuzzy(self, query_keys: Set[str]) -> Dict[int, float]:
+        """Dice sui trigrammi: 2·|A∩B| / (|A|+|B|), candidati dall'indice inverso"""
+        scored: Dict[int, float] = {}
+        for query_key in query_keys:
+            grams = trigrams(query_key)
+            shared: Dict[int, int] = defaultdict(int)
+            for gram in grams:
+                for key_id in self.postings.get(gram, ()):
+                    shared[key_id] += 1
+            for key_id, count in shared.items():
+                score = 2 * count / (len(grams) + len(self.key_trigrams[key_id]))
+                if score > scored.get(key_id, 0.0):
+                    scored[key_id] = score
+        return scored
+    
+    def suggest(self, query: str, limit: int = 10) -> List[ComuneMatch]:
+        """
+        Autocompletamento: prima i comuni con una chiave che inizia con il
+        testo digitato, poi i più simili per trigrammi.
+        """
+        query_keys = name_keys(query)
+        if not query_keys:
+            return []
+        
+        scored = self._fuzzy(query_keys)
+        for query_key in query_keys:
+            start = bisect.bisect_left(self.keys, query_key)
+            for key_id in range(start, len(self.keys)):
+                if not self.keys[key_id].startswith(query_key):
+                    break
+                # Prefisso: sopra ogni match fuzzy, più corto = più vicino
+                scored[key_id] = max(
+                    scored.get(key_id, 0.0),
+                    1.0 if self.keys[key_id] == query_key else 0.99 - 0.001 * len(self.keys[key_id])
+                )
+        
+        return self._best_by_comune(scored)[:limit]
+    
+    def resolve(self, query: str) -> Optional[ComuneMatch]:
+        """
+        Comune corrispondente al nome: match esatto su una chiave, oppure
+        miglior candidato fuzzy se abbastanza simile e non ambiguo.
+        """
+        query_keys = name_keys(query)
+        exact = set()
+        for query_key in query_keys:
+            exact |= self.by_key.get(query_key, set())
+        if len(exact) == 1:
+            return ComuneMatch(self.by_istat[exact.pop()], 1.0)
+        if len(exact) > 1:
+            # Omonimi (es. SAN TEODORO in Sardegna e in Sicilia): serve l'ISTAT
+            return None
+        
+        candidates = self._best_by_comune(self._fuzzy(query_keys))
+        if not candidates or candidates[0].score < RESOLVE_THRESHOLD:
+            return None
+        if len(candidates) > 1 and candidates[0].score - candidates[1].score < RESOLVE_MARGIN:
+            return None
+        return candidates[0]
+
+
+def load_comuni(engine: Engine) -> List[Comune]:
+    """Comuni distinti di omi_zones"""
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT comune_istat, MIN(comune_descrizione), MIN(provincia), MIN(regione)
+            FROM omi_zones
+            WHERE comune_istat IS NOT NULL
+            GROUP BY comune_istat
+        """)).fetchall()
+    return [Comune(istat=row[0], nome=row[1], provincia=row[2], regione=row[3]) for row in rows]
+
+
+def _semester(engine: Engine) -> Optional[str]:
+    """Semestre corrente (marker in omi_settings), None se non leggibile"""
+    try:
+        return current_semester(engine)
+    except Exception:
+        return None
+
+
+# Indice per processo: costruito al primo uso, ricostruito al cambio di semestre
+_index: Optional[ComuniIndex] = None
+_semestre: Optional[str] = None
+_checked_at = 0.0
+_failed_at: Optional[float] = None
+_index_lock = threading.Lock()
+
+
+def get_comuni_index(engine: Engine) -> Optional[ComuniIndex]:
+    """
+    Indice dei comuni, costruito da omi_zones al primo uso. Il semestre
+    corrente è ricontrollato ogni CHECK_INTERVAL_SECONDS (come per lo
+    snapshot OMI): dopo l'import di un nuovo semestre l'indice è ricostruito,
+    così comuni nuovi o fusi sono risolti senza riavviare i worker.
+    
+    Returns:
+        Indice, None se il database non è raggiungibile (nuovo tentativo
+        dopo RETRY_SECONDS); se la ricostruzione fallisce resta il precedente
+    """
+    global _index, _semestre, _checked_at, _failed_at
+    if _index is not None and time.monotonic() - _checked_at < CHECK_INTERVAL_SECONDS:
+        return _index
+    with _index_lock:
+        now = time.monotonic()
+        if _index is not None and now - _checked_at < CHECK_INTERVAL_SECONDS:
+            return _index
+        if _failed_at is not None and now - _failed_at < RETRY_SECONDS:
+            return _index
+        
+        semestre = _semester(engine)
+        _checked_at = now
+        if _index is not None and semestre == _semestre:
+            return _index
+        try:
+            start = time.perf_counter()
+            index = ComuniIndex(load_comuni(engine))
+            logger.info(
+                f"Indice comuni: {len(index)} comuni in {time.perf_counter() - start:.2f}s (semestre {semestre})"
+            )
+            _index, _semestre, _failed_at = index, semestre, None
+        except Exception as e:
+            logger.warning(f"Indice comuni non disponibile: {e}")
+            _failed_at = now
+        return _index
+
+
+def reset_comuni_index() -> None:
+    """Scarta l'indice (ricostruito al prossimo uso)"""
+    global _index, _semestre, _checked_at, _failed_at
+    with _index_lock:
+        _index = None
+        _semestre = None
+        _checked_at = 0.0
+        _failed_at = None
@@ -0,0 +1,85 @@
+# app/services/deal_distribution.py
+"""
+Posizione del Deal Score nella Zona
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Il deal score (scarto % tra stima e prezzo richiesto, listing_metrics.py)
+dice quanto un prezzo è buono in assoluto; il percentile dice quanto lo è
+rispetto agli altri annunci pubblicati della stessa zona OMI.
+
+Le distribuzioni sono t-digest per zona (models/zone_deal_digest.py),
+aggiornate in scrittura: il percentile costa una lettura per chiave e un
+calcolo su O(compressione) centroidi, indipendente dagli annunci della zona.
+Le rimozioni del t-digest sono approssimate: i ricalcoli massivi delle
+metriche ricostruiscono i digest dei comuni toccati da zero.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from app.core.tdigest import TDigest
+from app.models.property import Property, PropertyStatus
+from app.models.zone_deal_digest import ZoneDealDigest, save_digest, zone_key
+
+# Annunci minimi nella zona perché il percentile sia significativo
+MIN_ZONE_LISTINGS = 5
+
+
+def deal_score_rank(db: Session, property: Property) -> Optional[Dict]:
+    """
+    Percentile del deal score dell'annuncio tra i pubblicati della zona
+    
+    Returns:
+        Dict percentile (0-100, più alto = affare migliore), zone_listings,
+        zone_median, zone; None senza deal score o con pochi annunci in zona
+    """
+    if property.deal_score is None or not property.city:
+        return None
+    key = zone_key(property.omi_link_zona, property.city)
+    row = db.get(ZoneDealDigest, key)
+    if row is None or row.count < MIN_ZONE_LISTINGS:
+        return None
+    
+    digest = TDigest.from_dict(row.digest)
+    return {
+        'percentile': round(digest.cdf(property.deal_score) * 100, 1),
+        'zone_listings': row.count,
+        'zone_median': round(digest.quantile(0.5), 1),
+        'zone': key
+    }
+
+
+def rebuild_deal_digests(db: Session, cities: Optional[Iterable[str]] = None) -> int:
+    """
+    Ricostruisce da zero i digest (dopo UPDATE massivi, che non passano
+    dagli event listener). Non esegue il commit.
+    
+    Args:
+        cities: Limita ai digest di questi comuni (default: tutti)
+    
+    Returns:
+        Numero di zone scritte
+    """
+    rows = db.query(Property.omi_link_zona, Property.city, Property.deal_score)\
+        .filter(Property.status == PropertyStatus.PUBLISHED)\
+        .filter(Property.deal_score.isnot(None))
+    stale = delete(ZoneDealDigest)
+    if cities is not None:
+        cities = {c.strip().upper() for c in cities}
+        rows = rows.filter(func.upper(Property.city).in_(cities))
+        stale = stale.where(ZoneDealDigest.comune.in_(cities))
+    
+    digests: Dict[Tuple[str, str], TDigest] = defaultdict(TDigest)
+    for link_zona, city, deal_score in rows:
+        comune = (city or '').strip().upper()
+        if comune:
+            digests[zone_key(link_zona, city), comune].add(deal_score)
+    
+    db.execute(stale)
+    connection = db.connection()
+    for (key, comune), digest in digests.items():
+        save_digest(connection, key, comune, digest)
+    return len(digests)
@@ -0,0 +1,142 @@
+# app/services/listing_metrics.py
+"""
+Metriche Derivate degli Annunci
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Colonne persistite e indicizzate su `properties`, per ordinare e filtrare
+in SQL:
+- discount_pct: sconto nuda proprietà rispetto alla piena proprietà (%)
+- price_per_sqm: prezzo richiesto nuda proprietà per mq (€/mq)
+- omi_price_sqm: prezzo medio OMI del comune (€/mq, piena proprietà)
+- deal_score: scarto % tra stima nuda proprietà (OMI × superficie ×
+  quota fiscale per età) e prezzo richiesto; positivo = sotto la stima
+
+Aggiornate in scrittura (crud) e dal job di ricalcolo massivo
+(app/tasks/recompute_listing_metrics.py).
+
+In scrittura l'annuncio con coordinate riceve anche la zona OMI che le
+contiene (omi_link_zona, omi_zona_codice), dai perimetri importati.
+"""
+
+from typing import Callable, Dict, Optional
+
+from app.models.property import Property
+from app.services.valuation_service import ValuationService, get_valuation_service
+from app.services.zone_locator import ZoneLocator, get_zone_locator
+
+# Campi che, se modificati, richiedono il ricalcolo
+METRIC_INPUT_FIELDS = {
+    'bare_property_value',
+    'full_property_value',
+    'surface_sqm',
+    'usufructuary_age',
+    'city',
+}
+
+METRIC_COLUMNS = ('discount_pct', 'price_per_sqm', 'omi_price_sqm', 'deal_score')
+
+# Campi che, se modificati, richiedono di rilocalizzare la zona OMI
+ZONE_INPUT_FIELDS = {'latitude', 'longitude'}
+
+
+def estimate_bare_value(
+    omi_price_sqm: float,
+    surface_sqm: float,
+    usufructuary_age: int,
+    legal_rate: float
+) -> float:
+    """Stima nuda proprietà: valore OMI pieno meno usufrutto fiscale"""
+    coefficiente, _, _ = ValuationService.get_usufruct_coefficient(usufructuary_age)
+    full_value = omi_price_sqm * surface_sqm
+    return full_value - full_value * legal_rate * coefficiente
+
+
+def compute_listing_metrics(
+    bare_property_value: Optional[float],
+    full_property_value: Optional[float],
+    surface_sqm: Optional[float],
+    usufructuary_age: Optional[int],
+    omi_price_sqm: Optional[float],
+    legal_rate: float = ValuationService.LEGAL_RATE_2025
+) -> Dict[str, Optional[float]]:
+    """
+    Calcola le metriche derivate (funzione pura, usata anche nel batch)
+    
+    Returns:
+        Dict con discount_pct, price_per_sqm, omi_price_sqm, deal_score
+    """
+    metrics: Dict[str, Optional[float]] = dict.fromkeys(METRIC_COLUMNS)
+    metrics['omi_price_sqm'] = round(omi_price_sqm, 2) if omi_price_sqm else None
+    
+    if full_property_value and bare_property_value:
+        discount = (full_property_value - bare_property_value) / full_property_value
+        metrics['discount_pct'] = round(discount * 100, 1)
+    
+    if bare_property_value and surface_sqm:
+        metrics['price_per_sqm'] = round(bare_property_value / surface_sqm, 2)
+    
+    if omi_price_sqm and surface_sqm and bare_property_value and usufructuary_age is not None:
+        estimate = estimate_bare_value(omi_price_sqm, surface_sqm, usufructuary_age, legal_rate)
+        if estimate > 0:
+            metrics['deal_score'] = round((estimate - bare_property_value) / estimate * 100, 1)
+    
+    return metrics
+
+
+def refresh_listing_metrics(
+    property: Property,
+    refresh_omi: bool = True,
+    omi_reference: Optional[Callable[[str], Optional[float]]] = None,
+    legal_rate: Optional[float] = None
+) -> None:
+    """
+    Aggiorna le colonne derivate di un annuncio (prima del commit)
+    
+    Args:
+        property: Annuncio da aggiornare
+        refresh_omi: Se False riusa omi_price_sqm già salvato
+        omi_reference: Lookup comune -> €/mq (default: servizio valutazione)
+        legal_rate: Tasso legale (default: letto dal database)
+    """
+    service = None
+    if refresh_omi or legal_rate is None:
+        service = get_valuation_service()
+    
+    omi_price_sqm = property.omi_price_sqm
+    if refresh_omi and property.city:
+        lookup = omi_reference or service.get_omi_city_reference
+        omi_price_sqm = lookup(property.city)
+    
+    if legal_rate is None:
+        legal_rate = service.get_legal_rate()
+    
+    metrics = compute_listing_metrics(
+        bare_property_value=property.bare_property_value,
+        full_property_value=property.full_property_value,
+        surface_sqm=property.surface_sqm,
+        usufructuary_age=property.usufructuary_age,
+        omi_price_sqm=omi_price_sqm,
+        legal_rate=legal_rate
+    )
+    for column, value in metrics.items():
+        setattr(property, column, value)
+
+
+def refresh_listing_zone(property: Property, locator: Optional[ZoneLocator] = None) -> None:
+    """
+    Zona OMI dell'annuncio dalle coordinate (prima del commit). Senza
+    coordinate la zona è azzerata; senza geometrie importate resta invariata.
+    
+    Args:
+        locator: Indice dei perimetri (default: file OMI_GEOMETRY_FILE)
+    """
+    if property.latitude is None or property.longitude is None:
+        property.omi_link_zona = property.omi_zona_codice = None
+        return
+    
+    locator = locator or get_zone_locator()
+    if locator is None:
+        return
+    zone = locator.locate(property.latitude, property.longitude)
+    property.omi_link_zona = zone.link_zona if zone else None
+    property.omi_zona_codice = zone.zona_codice if zone else None
@@ -0,0 +1,289 @@
+# app/services/listing_valuation.py
+"""
+Valutazioni Salvate degli Annunci
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+I valori di piena e nuda proprietà di `properties` sono quelli scritti dal
+venditore. La stima del motore di valutazione è salvata a parte in
+`property_valuations`, con l'impronta degli input (input_fingerprint:
+campi dell'annuncio + tasso legale).
+
+Tracker delle dipendenze, per ricalcolare solo le righe interessate:
+- campi dell'annuncio (VALUATION_INPUT_FIELDS): la modifica in crud
+  segna la riga `stale`; se l'impronta non cambia non si ricalcola
+- comune/zona OMI: un import con quotazioni modificate azzera l'impronta
+  delle righe della zona (e di quelle senza zona nel comune), ricalcolo
+  forzato. Il comune è quello risolto dall'indice comuni (codice ISTAT),
+  come per /valuation/calculate
+- tasso legale: salvato sulla riga, quelle con valore diverso dal
+  corrente sono da ricalcolare (anche l'impronta cambia)
+- semestre corrente: non è nell'impronta. Un import --diff invalida solo
+  le zone modificate; alle righe ancora valide viene aggiornato il solo
+  semestre di riferimento (advance_valuation_semester). Dopo un import
+  completo tutte le righe vanno invalidate (invalidate_all_valuations)
+
+Il ricalcolo è fatto dal job app/tasks/refresh_property_valuations.py.
+I comparabili non sono una dipendenza tracciata: una riga li aggiorna
+solo quando viene ricalcolata per altri motivi. L'annuncio valutato è
+escluso dai propri comparabili (PropertyData.property_id).
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Query, Session
+
+from app.models.property import Property, PropertyStatus
+from app.models.property_valuation import PropertyValuation
+from app.services.comuni_index import ComuniIndex
+from app.services.valuation_cache import input_fingerprint
+from app.services.valuation_service import PropertyData, ValuationService
+
+# Campi dell'annuncio che entrano nella valutazione
+VALUATION_INPUT_FIELDS = {
+    'city',
+    'province',
+    'latitude',
+    'longitude',
+    'omi_zona_codice',
+    'surface_sqm',
+    'rooms',
+    'floor',
+    'has_elevator',
+    'has_garden',
+    'has_garage',
+    'has_parking',
+    'building_year',
+    'renovation_year',
+    'energy_class',
+    'heating_type',
+    'usufructuary_age',
+    'usufruct_type',
+    'bare_property_value',
+}
+
+# Piano testuale dell'annuncio -> numero (default PropertyData se ignoto)
+FLOOR_WORDS = {
+    'seminterrato': 0,
+    'terra': 0,
+    'rialzato': 0,
+    'primo': 1,
+    'secondo': 2,
+    'terzo': 3,
+    'quarto': 4,
+    'quinto': 5,
+}
+DEFAULT_FLOOR = PropertyData.floor
+
+
+def parse_floor(floor: Optional[str]) -> int:
+    """Numero di piano da '3', '3° piano', 'piano terra', 'primo', ..."""
+    if not floor:
+        return DEFAULT_FLOOR
+    text = floor.strip().lower()
+    digits = re.search(r'\d+', text)
+    if digits:
+        return int(digits.group())
+    for word, number in FLOOR_WORDS.items():
+        if word in text:
+            return number
+    return DEFAULT_FLOOR
+
+
+def resolve_listing_comune(index: Optional[ComuniIndex], city: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Nome ufficiale e codice ISTAT del comune dell'annuncio ("Reggio Emilia"
+    -> REGGIO NELL'EMILIA)
+    
+    Returns:
+        (nome, istat); (nome maiuscolo, None) se l'indice non è disponibile
+        o il nome non è risolvibile
+    """
+    comune = (city or '').strip().upper()
+    match = index.resolve(comune) if index is not None and comune else None
+    if match is None:
+        return comune, None
+    return match.comune.nome, match.comune.istat
+
+
+def listing_property_data(property: Property, comuni: Optional[ComuniIndex] = None) -> PropertyData:
+    """Input del motore di valutazione dai campi dell'annuncio (comune risolto con comuni)"""
+    floor = (property.floor or '').lower()
+    comune, comune_istat = resolve_listing_comune(comuni, property.city)
+    return PropertyData(
+        property_id=property.id,
+        comune=comune,
+        comune_istat=comune_istat,
+        provincia=property.province,
+        zona_codice=property.omi_zona_codice,
+        latitude=property.latitude,
+        longitude=property.longitude,
+        surface_sqm=property.surface_sqm,
+        rooms=property.rooms,
+        has_box=bool(property.has_garage),
+        num_garages=1 if property.has_garage else 0,
+        num_parking=1 if property.has_parking else 0,
+        floor=parse_floor(property.floor),
+        has_elevator=bool(property.has_elevator),
+        is_attic='attico' in floor,
+        has_garden=bool(property.has_garden),
+        building_year=property.building_year,
+        renovation_year=property.renovation_year,
+        heating_type=property.heating_type or PropertyData.heating_type,
+        energy_class=property.energy_class.value.upper() if property.energy_class else None,
+        usufructuary_age=property.usufructuary_age,
+        usufruct_type=property.usufruct_type.value if property.usufruct_type else PropertyData.usufruct_type,
+        requested_price=property.bare_property_value
+    )
+
+
+# ============================================================
+# TRACKER DIPENDENZE
+# ============================================================
+
+def mark_valuation_stale(db: Session, property_id: int) -> None:
+    """Campi dell'annuncio modificati: da verificare al prossimo refresh"""
+    db.execute(
+        update(PropertyValuation)
+        .where(PropertyValuation.property_id == property_id)
+        .values(stale=True)
+    )
+
+
+def invalidate_zone_valuations(
+    db: Session,
+    zone: Dict[str, Set[Optional[str]]],
+    comuni: Iterable[str] = ()
+) -> int:
+    """
+    Quotazioni OMI modificate: ricalcolo forzato delle valutazioni
+    
+    Args:
+        zone: Codice ISTAT del comune -> zone modificate (con zona None
+            sono invalidate tutte le valutazioni del comune)
+        comuni: Nomi dei comuni modificati, per le righe senza codice
+            ISTAT (comune non risolto dall'indice)
+    
+    Returns:
+        Righe invalidate
+    """
+    invalidated = 0
+    names = {c.strip().upper() for c in comuni}
+    if names:
+        result = db.execute(
+            update(PropertyValuation)
+            .where(PropertyValuation.comune_istat.is_(None), PropertyValuation.comune.in_(names))
+            .values(input_hash=None)
+        )
+        invalidated += result.rowcount
+    
+    for comune_istat, codes in zone.items():
+        condition = PropertyValuation.comune_istat == comune_istat
+        if codes and None not in codes:
+            # Anche le righe senza quotazione: una zona nuova può risolverle
+            condition = condition & or_(
+                PropertyValuation.zona_codice.in_(codes),
+                PropertyValuation.zona_codice.is_(None)
+            )
+        result = db.execute(
+            update(PropertyValuation).where(condition).values(input_hash=None)
+        )
+        invalidated += result.rowcount
+    return invalidated
+
+
+def invalidate_all_valuations(db: Session) -> int:
+    """
+    Import OMI completo (senza report delle modifiche): ricalcolo forzato
+    di tutte le valutazioni
+    
+    Returns:
+        Righe invalidate
+    """
+    return db.execute(update(PropertyValuation).values(input_hash=None)).rowcount
+
+
+def advance_valuation_semester(db: Session, semestre: Optional[str]) -> int:
+    """
+    Valutazioni ancora valide (zona non modificata dall'import): aggiorna
+    il semestre di riferimento senza ricalcolarle
+    
+    Returns:
+        Righe aggiornate
+    """
+    return db.execute(
+        update(PropertyValuation)
+        .where(
+            PropertyValuation.input_hash.isnot(None),
+            PropertyValuation.stale.is_(False),
+            PropertyValuation.semestre.is_distinct_from(semestre)
+        )
+        .values(semestre=semestre)
+    ).rowcount
+
+
+def pending_valuations(db: Session, legal_rate: float) -> Query:
+    """
+    Annunci (non eliminati) con valutazione mancante o dipendenze cambiate
+    
+    Returns:
+        Query di (Property, PropertyValuation o None)
+    """
+    return db.query(Property, PropertyValuation)\
+        .outerjoin(PropertyValuation, PropertyValuation.property_id == Property.id)\
+        .filter(Property.status != PropertyStatus.DELETED)\
+        .filter(or_(
+            PropertyValuation.property_id.is_(None),
+            PropertyValuation.stale.is_(True),
+            PropertyValuation.input_hash.is_(None),
+            PropertyValuation.legal_rate != legal_rate
+        ))\
+        .order_by(Property.id)
+
+
+def refresh_listing_valuation(
+    db: Session,
+    service: ValuationService,
+    property: Property,
+    valuation: Optional[PropertyValuation],
+    semestre: Optional[str],
+    legal_rate: float
+) -> bool:
+    """
+    Ricalcola la valutazione dell'annuncio se l'impronta è cambiata
+    
+    Returns:
+        True se ricalcolata, False se l'impronta salvata era ancora valida
+    """
+    property_data = listing_property_data(property, service.get_comuni_index())
+    # Senza semestre: i cambi di quotazione arrivano per zona dagli import
+    fingerprint = input_fingerprint(property_data, None, legal_rate)
+    
+    if valuation is None:
+        valuation = PropertyValuation(property_id=property.id)
+        db.add(valuation)
+    elif valuation.input_hash == fingerprint:
+        valuation.stale = False
+        return False
+    
+    result = service.calculate_complete_valuation(property_data)
+    omi = result.get('omi_quotation') or {}
+    stima = result.get('stima_combinata') or result.get('stima_miapersempre') or {}
+    
+    valuation.input_hash = fingerprint
+    valuation.stale = False
+    valuation.comune = property_data.comune
+    valuation.comune_istat = property_data.comune_istat
+    valuation.zona_codice = omi.get('zona_codice')
+    valuation.semestre = semestre
+    valuation.legal_rate = legal_rate
+    valuation.full_value = stima.get('medio')
+    valuation.bare_value = (result.get('valore_fiscale') or {}).get('valore_nuda_proprieta')
+    valuation.bare_value_actuarial = (result.get('valore_attuariale') or {}).get('valore_nuda_proprieta')
+    valuation.deal_discount_pct = (result.get('deal_score') or {}).get('discount_percentage')
+    valuation.result = result
+    valuation.error = result.get('error')
+    valuation.computed_at = datetime.utcnow()
+    return True
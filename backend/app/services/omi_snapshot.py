@@ -0,0 +1,316 @@
+# app/services/omi_snapshot.py
+"""
+Snapshot Colonnare Locale dei Dati OMI
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+L'import OMI (import_omi_data.py) scrive, dopo lo swap, una copia delle
+quotazioni e delle zone del semestre in una directory di file .npy:
+una colonna per file, stringhe a larghezza fissa (niente object array),
+righe ordinate per comune. I worker API li aprono con np.load(mmap_mode='r'):
+nessuna query a Postgres all'avvio, nessuna copia in memoria, pagine
+condivise tra processi dalla page cache del sistema operativo.
+
+Lo snapshot vale solo se il suo semestre coincide con
+omi_settings.semestre_omi_corrente (aggiornato dallo swap): altrimenti
+ValuationService torna alle query su database.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Directory di default (sovrascrivibile con OMI_SNAPSHOT_DIR)
+DEFAULT_SNAPSHOT_DIR = os.getenv(
+    'OMI_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'omi', 'snapshot')
+)
+
+SNAPSHOT_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+
+# Colonne per tabella: stringhe (dtype 'U' a larghezza fissa) e float
+QUOTATION_STRING_COLUMNS = ['comune_istat', 'fascia', 'zona_codice', 'link_zona', 'cod_tipologia', 'stato']
+QUOTATION_FLOAT_COLUMNS = ['prezzo_min', 'prezzo_max', 'locazione_min', 'locazione_max']
+ZONE_STRING_COLUMNS = ['fascia', 'zona_codice', 'link_zona', 'zona_descrizione']
+
+# Array di indice (non una riga per record): comune -> righe, ISTAT -> comune
+INDEX_ARRAYS = ('comuni', 'offsets', 'istat_codes', 'istat_groups')
+
+# Ogni quanto ricontrollare il semestre corrente sul database
+CHECK_INTERVAL_SECONDS = 60
+
+
+def _normalize_comune(comune) -> str:
+    return str(comune or '').strip().upper()
+
+
+def _string_array(series) -> np.ndarray:
+    """Colonna stringa -> array 'U' (mancanti -> '')"""
+    values = series.astype(object).where(series.notna(), '')
+    return np.asarray(values.astype(str).tolist(), dtype=str)
+
+
+def _column_file(directory: str, generation: str, name: str, column: str) -> str:
+    return os.path.join(directory, f"{name}.{column}.{generation}.npy")
+
+
+def _write_table(directory: str, generation: str, name: str, df, string_columns, float_columns) -> Dict:
+    """Scrive una tabella ordinata per comune; ritorna la sua voce di manifest"""
+    df = df.assign(_comune=df['comune_descrizione'].map(_normalize_comune))
+    df = df.sort_values(['_comune', 'fascia', 'zona_codice'], kind='stable', na_position='last')
+    
+    keys, offsets = np.unique(df['_comune'].to_numpy(dtype=str), return_index=True)
+    arrays = {
+        'comuni': keys,
+        'offsets': np.append(offsets, len(df)).astype(np.int64),
+    }
+    for column in string_columns:
+        arrays[column] = _string_array(df[column])
+    if 'comune_istat' in arrays:
+        # Codice ISTAT -> gruppo del comune (gli omonimi condividono il gruppo)
+        codes, first = np.unique(arrays['comune_istat'], return_index=True)
+        known = codes != ''
+        arrays['istat_codes'] = codes[known]
+        arrays['istat_groups'] = np.searchsorted(
+            keys, df['_comune'].to_numpy(dtype=str)[first[known]]
+        ).astype(np.int64)
+    for column in float_columns:
+        arrays[column] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    for column, array in arrays.items():
+        with open(_column_file(directory, generation, name, column), 'wb') as f:
+            np.save(f, array, allow_pickle=False)
+    
+    return {'rows': len(df), 'columns': list(arrays)}
+
+
+def write_snapshot(directory: str, semestre: str, quotations, zones) -> Dict:
+    """
+    Scrive lo snapshot (quotazioni e zone normalizzate) in directory.
+    
+    I file di colonna hanno il nome della generazione e il manifest, che
+    punta alla generazione, è sostituito per ultimo con un rename atomico:
+    chi apre lo snapshot vede la versione precedente o quella nuova, mai un
+    misto. I file delle generazioni precedenti vengono poi cancellati (i
+    worker che li hanno già mappati continuano a leggerli).
+    
+    Returns:
+        Manifest scritto
+    """
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.now()
+    generation = now.strftime('%Y%m%d%H%M%S%f')
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'semestre': semestre,
+        'generation': generation,
+        'created_at': now.isoformat(timespec='seconds'),
+        'tables': {
+            'quotations': _write_table(
+                directory, generation, 'quotations', quotations,
+                QUOTATION_STRING_COLUMNS, QUOTATION_FLOAT_COLUMNS
+            ),
+            'zones': _write_table(directory, generation, 'zones', zones, ZONE_STRING_COLUMNS, []),
+        },
+    }
+    
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+    
+    for filename in os.listdir(directory):
+        if filename.endswith('.npy') and f".{generation}." not in filename:
+            os.remove(os.path.join(directory, filename))
+    return manifest
+
+
+def current_semester(engine: Engine) -> Optional[str]:
+    """Semestre OMI corrente secondo il database (marker aggiornato dallo swap)"""
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT valore FROM omi_settings WHERE chiave = 'semestre_omi_corrente'"
+        )).scalar()
+
+
+class OmiSnapshot:
+    """Snapshot aperto in sola lettura (array memory-mapped)"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"versione snapshot non supportata: {self.manifest.get('version')}")
+        
+        self.semestre: str = self.manifest['semestre']
+        self.quotations = self._open_table('quotations')
+        self.zone_table = self._open_table('zones')
+        
+        self._checked_at = 0.0
+        self._current = False
+        self._lock = threading.Lock()
+    
+    def _open_table(self, name: str) -> Dict[str, np.ndarray]:
+        table = self.manifest['tables'][name]
+        arrays = {
+            column: np.load(
+                _column_file(self.directory, self.manifest['generation'], name, column),
+                mmap_mode='r',
+                allow_pickle=False
+            )
+            for column in table['columns']
+        }
+        rows = table['rows']
+        if int(arrays['offsets'][-1]) != rows or any(
+            len(array) != rows for column, array in arrays.items()
+            if column not in INDEX_ARRAYS
+        ):
+            raise ValueError(f"snapshot incoerente col manifest ({name})")
+        return arrays
+    
+    @staticmethod
+    def _range(table: Dict[str, np.ndarray], comune: str) -> slice:
+        """Righe del comune (contigue: lo snapshot è ordinato per comune)"""
+        key = _normalize_comune(comune)
+        comuni = table['comuni']
+        i = int(np.searchsorted(comuni, key))
+        if i >= len(comuni) or comuni[i] != key:
+            return slice(0, 0)
+        return slice(int(table['offsets'][i]), int(table['offsets'][i + 1]))
+    
+    @staticmethod
+    def _istat_range(table: Dict[str, np.ndarray], comune_istat: str) -> slice:
+        """Righe del gruppo del comune con quel codice ISTAT (da filtrare per codice)"""
+        codes = table['istat_codes']
+        i = int(np.searchsorted(codes, comune_istat))
+        if i >= len(codes) or codes[i] != comune_istat:
+            return slice(0, 0)
+        group = int(table['istat_groups'][i])
+        return slice(int(table['offsets'][group]), int(table['offsets'][group + 1]))
+    
+    def is_current(self, engine: Engine) -> bool:
+        """Semestre dello snapshot == semestre corrente sul DB (controllo in cache)"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < CHECK_INTERVAL_SECONDS:
+                return self._current
+            try:
+                self._current = current_semester(engine) == self.semestre
+            except Exception as e:
+                logger.warning(f"Snapshot OMI: semestre corrente non verificabile ({e})")
+                self._current = False
+            self._checked_at = now
+            return self._current
+    
+    def quotation(
+        self,
+        comune: str,
+        fascia: str = 'B',
+        zona_codice: Optional[str] = None,
+        cod_tipologia: int = 20,
+        stato: str = 'NORMALE',
+        comune_istat: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Stessa semantica di ValuationService.get_omi_quotation (prima zona
+        per fascia); con comune_istat la ricerca è per codice, non per nome
+        """
+        if comune_istat:
+            rows = self._istat_range(self.quotations, comune_istat)
+        else:
+            rows = self._range(self.quotations, comune)
+        q = {column: array[rows] for column, array in self.quotations.items()
+             if column not in INDEX_ARRAYS}
+        mask = (
+            (q['cod_tipologia'] == str(cod_tipologia))
+            & (q['stato'] == stato)
+            & ~np.isnan(q['prezzo_min'])
+        )
+        if comune_istat:
+            mask &= q['comune_istat'] == comune_istat
+        if zona_codice:
+            mask &= q['zona_codice'] == zona_codice
+        else:
+            mask &= q['fascia'] == fascia
+        
+        matches = np.flatnonzero(mask)
+        if len(matches) == 0:
+            return None
+        i = matches[0]
+        prezzo_min, prezzo_max = float(q['prezzo_min'][i]), float(q['prezzo_max'][i])
+        return {
+            'prezzo_min': prezzo_min,
+            'prezzo_max': prezzo_max,
+            'prezzo_medio': (prezzo_min + prezzo_max) / 2,
+            'zona_codice': str(q['zona_codice'][i]) or None,
+            'link_zona': str(q['link_zona'][i]) or None
+        }
+    
+    def city_reference(self, comune: str, cod_tipologia: int = 20, stato: str = 'NORMALE') -> Optional[float]:
+        """Stessa semantica di ValuationService.get_omi_city_reference"""
+        rows = self._range(self.quotations, comune)
+        q = self.quotations
+        mask = (
+            (q['cod_tipologia'][rows] == str(cod_tipologia))
+            & (q['stato'][rows] == stato)
+            & ~np.isnan(q['prezzo_min'][rows])
+        )
+        if not mask.any():
+            return None
+        medio = (q['prezzo_min'][rows][mask] + q['prezzo_max'][rows][mask]) / 2
+        # AVG in SQL ignora i NULL
+        return float(np.nanmean(medio)) if not np.isnan(medio).all() else None
+    
+    def zones(self, comune: str) -> List[Dict]:
+        """Zone del comune ordinate per fascia e codice"""
+        rows = self._range(self.zone_table, comune)
+        z = self.zone_table
+        return [
+            {
+                'codice': str(z['zona_codice'][i]),
+                'fascia': str(z['fascia'][i]),
+                'link_zona': str(z['link_zona'][i]),
+                'descrizione': str(z['zona_descrizione'][i]) or None
+            }
+            for i in range(rows.start, rows.stop)
+        ]
+
+
+# Snapshot aperti per directory, riaperti se il manifest cambia
+_snapshots: Dict[str, tuple] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(directory: Optional[str] = None) -> Optional[OmiSnapshot]:
+    """
+    Snapshot della directory (default DEFAULT_SNAPSHOT_DIR), aperto una sola
+    volta per processo; None se assente o illeggibile.
+    """
+    directory = os.path.abspath(directory or DEFAULT_SNAPSHOT_DIR)
+    try:
+        mtime = os.stat(os.path.join(directory, MANIFEST_FILE)).st_mtime_ns
+    except OSError:
+        return None
+    
+    with _snapshots_lock:
+        cached = _snapshots.get(directory)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            snapshot = OmiSnapshot(directory)
+        except Exception as e:
+            logger.warning(f"Snapshot OMI in {directory} non utilizzabile: {e}")
+            snapshot = None
+        _snapshots[directory] = (mtime, snapshot)
+        return snapshot
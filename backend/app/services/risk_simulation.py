@@ -0,0 +1,146 @@
+# app/services/risk_simulation.py
+"""
+Simulazione Monte Carlo del Rendimento di Nuda Proprietà
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Chi compra la nuda proprietà paga oggi il prezzo P e rientra nella piena
+proprietà alla morte dell'usufruttuario, dopo T anni, quando l'immobile
+vale V_T. Il rendimento dipende da due incognite, simulate insieme:
+
+- T: estratto dalle tavole di mortalità (app/services/actuarial.py) per età
+  e sesso, anno di decesso per inversione della distribuzione cumulata più
+  la frazione d'anno uniforme; almeno MIN_HOLDING_YEARS (rientro in possesso)
+- V_T: rivalutazione log-normale con media e volatilità semestrali stimate
+  dallo storico OMI della zona (moto browniano geometrico). Serve solo il
+  valore alla morte, che si estrae in forma chiusa:
+  log V_T = log V_0 + μ·2T + σ·√(2T)·Z, senza generare i percorsi semestre
+  per semestre
+
+Per ogni simulazione: multiplo V_T / P e IRR (V_T / P)^(1/T) - 1 (nessun
+flusso intermedio). Tutto è vettoriale numpy: 100.000 simulazioni in pochi
+millisecondi. Il generatore è inizializzato con un seed, restituito nella
+risposta, quindi ogni risultato è riproducibile.
+"""
+
+import secrets
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from app.services.actuarial import LifeTable, normalize_sex
+
+# Percentili riportati (mai i percorsi grezzi)
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+DEFAULT_SIMULATIONS = 100_000
+MAX_SIMULATIONS = 1_000_000
+
+# Rivalutazione senza storico sufficiente: nessun trend, volatilità prudente
+MIN_HISTORY_RETURNS = 3
+DEFAULT_SEMESTER_DRIFT = 0.0
+DEFAULT_SEMESTER_VOLATILITY = 0.03
+
+# Anni minimi di detenzione (rientro in possesso e vendita)
+MIN_HOLDING_YEARS = 0.5
+
+
+def appreciation_parameters(prices: Sequence[Optional[float]]) -> Dict:
+    """
+    Media e volatilità dei rendimenti logaritmici semestrali
+    
+    Args:
+        prices: Prezzi medi €/mq in ordine di semestre (None ignorati)
+    
+    Returns:
+        Dict media_semestrale, volatilita_semestrale, semestri (rendimenti
+        usati), fonte ('omi' o 'default' se meno di MIN_HISTORY_RETURNS)
+    """
+    values = np.array([p for p in prices if p], dtype=np.float64)
+    returns = np.diff(np.log(values)) if len(values) > 1 else np.array([])
+    if len(returns) < MIN_HISTORY_RETURNS:
+        return {
+            'media_semestrale': DEFAULT_SEMESTER_DRIFT,
+            'volatilita_semestrale': DEFAULT_SEMESTER_VOLATILITY,
+            'semestri': len(returns),
+            'fonte': 'default'
+        }
+    return {
+        'media_semestrale': float(returns.mean()),
+        'volatilita_semestrale': float(max(returns.std(ddof=1), 1e-6)),
+        'semestri': len(returns),
+        'fonte': 'omi'
+    }
+
+
+def sample_lifetimes(
+    table: LifeTable,
+    age: int,
+    sex: Optional[str],
+    size: int,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """Anni residui di vita (continui) per `size` usufruttuari di età `age`"""
+    cdf = np.cumsum(table.deaths[normalize_sex(sex)][table.age_index(age)])
+    years = np.searchsorted(cdf, rng.random(size) * cdf[-1], side='right')
+    return np.maximum(years + rng.random(size), MIN_HOLDING_YEARS)
+
+
+def percentiles(values: np.ndarray, digits: int = 4) -> Dict[str, float]:
+    """Dict p5, p10, ... arrotondato"""
+    return {
+        f"p{p}": round(float(v), digits)
+        for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+    }
+
+
+def simulate_bare_ownership_returns(
+    table: LifeTable,
+    purchase_price: float,
+    full_value: float,
+    usufructuary_age: int,
+    sex: Optional[str] = None,
+    semester_drift: float = DEFAULT_SEMESTER_DRIFT,
+    semester_volatility: float = DEFAULT_SEMESTER_VOLATILITY,
+    simulations: int = DEFAULT_SIMULATIONS,
+    seed: Optional[int] = None
+) -> Dict:
+    """
+    Distribuzione di durata, valore finale, multiplo e IRR
+    
+    Args:
+        purchase_price: Prezzo pagato per la nuda proprietà
+        full_value: Valore attuale di piena proprietà
+        seed: Seed del generatore (None = casuale, restituito nel risultato)
+    
+    Returns:
+        Dict con percentili di anni, valore_finale, multiplo, irr e le
+        probabilità di perdita (multiplo < 1) e di IRR sopra il 5%
+    """
+    if purchase_price <= 0 or full_value <= 0:
+        raise ValueError("Prezzo e valore di piena proprietà devono essere positivi")
+    if not 1 <= simulations <= MAX_SIMULATIONS:
+        raise ValueError(f"Simulazioni tra 1 e {MAX_SIMULATIONS}")
+    if seed is None:
+        seed = secrets.randbits(32)
+    rng = np.random.default_rng(seed)
+    
+    years = sample_lifetimes(table, usufructuary_age, sex, simulations, rng)
+    semesters = 2 * years
+    shocks = rng.standard_normal(simulations)
+    log_growth = semester_drift * semesters + semester_volatility * np.sqrt(semesters) * shocks
+    final_value = full_value * np.exp(log_growth)
+    multiple = final_value / purchase_price
+    irr = np.exp(np.log(multiple) / years) - 1
+    
+    return {
+        'simulazioni': simulations,
+        'seed': seed,
+        'sesso': normalize_sex(sex),
+        'anni': percentiles(years, 2),
+        'valore_finale': percentiles(final_value, 0),
+        'multiplo': percentiles(multiple),
+        'irr': percentiles(irr),
+        'multiplo_medio': round(float(multiple.mean()), 4),
+        'prob_perdita': round(float((multiple < 1).mean()), 4),
+        'prob_irr_sopra_5': round(float((irr > 0.05).mean()), 4)
+    }
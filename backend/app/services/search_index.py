@@ -0,0 +1,193 @@
+# app/services/search_index.py
+"""
+Indice Full-Text In-Process per titolo e descrizione annunci
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+In produzione la ricerca usa la colonna tsvector `properties.search_vector`
+(configurazione 'italian', indice GIN). Questo modulo offre lo stesso
+modello di ranking in memoria per ambienti senza PostgreSQL (test, SQLite):
+- tokenizzazione + stopword + stemming leggero italiano
+- pesi come setweight: titolo 'A' (1.0), descrizione 'B' (0.4)
+- semantica AND tra i termini (come plainto_tsquery)
+"""
+
+import re
+import threading
+import unicodedata
+import weakref
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.property import Property
+
+# Pesi ts_rank di default per le classi A e B
+TITLE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+
+ITALIAN_STOPWORDS = frozenset("""
+a ad al alla alle allo agli ai all anche che chi ci con col come da dal dalla
+dalle dallo dagli dai del della delle dello degli dei di e ed gli ha hanno ho
+i il in io la le lo loro ma mi ne nel nella nelle nello negli nei o per piu
+quale quali quello questa queste questo qui si sono su sua sue suo suoi sul
+sulla sulle sullo sugli sui tra fra un una uno
+""".split())
+
+# Suffissi in ordine di lunghezza decrescente (stemmer leggero, stile Snowball)
+_SUFFIXES = (
+    "amento", "amenti", "imento", "imenti", "azione", "azioni", "mente",
+    "abile", "abili", "ibile", "ibili", "iste", "isti", "ista", "ismo",
+    "ita", "oso", "osa", "osi", "ose",
+    "a", "e", "i", "o",
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    )
+
+
+def stem(word: str) -> str:
+    """Stemming leggero: rimuove il suffisso più lungo lasciando >= 3 caratteri"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Testo -> lessemi normalizzati (minuscolo, senza accenti/stopword)"""
+    if not text:
+        return []
+    lexemes = []
+    for token in _TOKEN_RE.findall(_strip_accents(text.lower())):
+        if token in ITALIAN_STOPWORDS or token.isdigit():
+            continue
+        lexemes.append(stem(token))
+    return lexemes
+
+
+class InvertedIndex:
+    """Indice invertito lessema -> {id documento: peso accumulato}"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._documents: Dict[int, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: int, title: Optional[str], description: Optional[str]) -> None:
+        """Indicizza (o reindicizza) un documento"""
+        weights: Dict[str, float] = defaultdict(float)
+        for lexeme in tokenize(title):
+            weights[lexeme] += TITLE_WEIGHT
+        for lexeme in tokenize(description):
+            weights[lexeme] += DESCRIPTION_WEIGHT
+
+        with self._lock:
+            self._remove(doc_id)
+            self._documents[doc_id] = dict(weights)
+            for lexeme, weight in weights.items():
+                self._postings[lexeme][doc_id] = weight
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """
+        Documenti che contengono tutti i termini, ordinati per rank
+
+        Returns:
+            Lista (id, rank) con rank decrescente
+        """
+        lexemes = set(tokenize(query))
+        if not lexemes:
+            return []
+
+        with self._lock:
+            postings = sorted(
+                (self._postings.get(lexeme, {}) for lexeme in lexemes),
+                key=len
+            )
+            if not postings[0]:
+                return []
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting.keys()
+
+            ranked = [
+                (doc_id, sum(posting[doc_id] for posting in postings))
+                for doc_id in candidates
+            ]
+
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _remove(self, doc_id: int) -> None:
+        for lexeme in self._documents.pop(doc_id, {}):
+            posting = self._postings.get(lexeme)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[lexeme]
+
+
+# ============================================================
+# INDICE PER ENGINE (mantenuto sulle scritture ORM)
+# ============================================================
+
+_indexes: "weakref.WeakKeyDictionary[Engine, InvertedIndex]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(db: Session) -> InvertedIndex:
+    """
+    Indice del database della sessione. Costruito al primo uso con una
+    sola query, poi aggiornato dagli event listener su insert/update/delete.
+    """
+    engine = db.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is not None:
+            return index
+        index = InvertedIndex()
+        rows = db.query(Property.id, Property.title, Property.description).all()
+        for doc_id, title, description in rows:
+            index.add(doc_id, title, description)
+        _indexes[engine] = index
+        return index
+
+
+def _index_for(connection) -> Optional[InvertedIndex]:
+    return _indexes.get(connection.engine)
+
+
+@event.listens_for(Property, "after_insert")
+@event.listens_for(Property, "after_update")
+def _index_property(mapper, connection, target):
+    index = _index_for(connection)
+    if index is not None:
+        index.add(target.id, target.title, target.description)
+
+
+@event.listens_for(Property, "after_delete")
+def _unindex_property(mapper, connection, target):
+    index = _index_for(connection)
+    if index is not None:
+        index.remove(target.id)
+
+
+def rank_matches(db: Session, query: str) -> List[Tuple[int, float]]:
+    """Shortcut: (id, rank) dei documenti che soddisfano la query"""
+    return get_search_index(db).search(query)
+
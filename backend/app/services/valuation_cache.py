@@ -0,0 +1,183 @@
+# app/services/valuation_cache.py
+"""
+Cache dei Risultati di Valutazione
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+Richieste di valutazione identiche sono frequenti (lo stesso annuncio
+visto più volte, retry del client). La chiave è l'hash SHA-256 della
+forma canonica di PropertyData (chiavi ordinate, numeri come float
+arrotondati, stringhe senza spazi ai bordi) più i dati di riferimento che
+cambiano il risultato: semestre OMI corrente e tasso legale. Un nuovo
+import OMI o un nuovo tasso cambiano la chiave, senza invalidazioni.
+
+Due livelli:
+- in processo: TTLCache LRU limitata (app/core/cache.py)
+- condiviso (opzionale): Redis se VALUATION_CACHE_REDIS_URL è impostato
+  e il pacchetto redis è installato; un errore del livello condiviso non
+  blocca la valutazione (riprova dopo SHARED_RETRY_SECONDS)
+
+Il TTL limita anche quanto a lungo una valutazione ignora annunci
+comparabili nuovi (l'indice si aggiorna ogni 10 minuti).
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Livello condiviso opzionale
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Da incrementare quando cambia l'algoritmo (invalida le chiavi precedenti
+# e le impronte delle valutazioni salvate)
+CACHE_VERSION = 1
+KEY_PREFIX = "valuation"
+
+# Cifre decimali dei numeri nella forma canonica (1e-6 mq, €, gradi)
+CANONICAL_DIGITS = 6
+
+SHARED_RETRY_SECONDS = 60
+
+# Stato per l'header X-Cache
+HIT = "HIT"
+HIT_SHARED = "HIT-SHARED"
+MISS = "MISS"
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), CANONICAL_DIGITS)
+    if isinstance(value, str):
+        return value.strip()
+    return str(value)
+
+
+def input_fingerprint(property_data, semestre: Optional[str], legal_rate: float) -> str:
+    """
+    Hash SHA-256 (hex) della forma canonica degli input: usato come chiave
+    di cache e come impronta delle valutazioni salvate sugli annunci
+    
+    Args:
+        property_data: PropertyData (comune già risolto)
+        semestre: Semestre OMI corrente (None per le valutazioni salvate
+            degli annunci, invalidate per zona dagli import)
+        legal_rate: Tasso legale corrente
+    """
+    canonical = {
+        name: _canonical_value(value)
+        for name, value in dataclasses.asdict(property_data).items()
+    }
+    canonical['_semestre_corrente'] = semestre
+    canonical['_tasso_legale'] = _canonical_value(legal_rate)
+    canonical['_versione'] = CACHE_VERSION
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fingerprint_cache_key(fingerprint: str) -> str:
+    """Chiave in cache di una valutazione dalla sua impronta (id pubblico)"""
+    return f"{KEY_PREFIX}:v{CACHE_VERSION}:{fingerprint}"
+
+
+def valuation_cache_key(property_data, semestre: Optional[str], legal_rate: float) -> str:
+    """Chiave della valutazione in cache (vedi input_fingerprint)"""
+    return fingerprint_cache_key(input_fingerprint(property_data, semestre, legal_rate))
+
+
+class ValuationCache:
+    """Cache a due livelli dei risultati (dict serializzabili JSON)"""
+    
+    def __init__(self, local: TTLCache, shared=None, ttl: Optional[float] = None):
+        """
+        Args:
+            local: Cache in processo
+            shared: Client con get(key) e setex(key, ttl, value), es. Redis
+            ttl: Secondi di validità nel livello condiviso (default local.ttl)
+        """
+        self.local = local
+        self.shared = shared
+        self.ttl = int(ttl if ttl is not None else local.ttl)
+        self._shared_failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def _shared_available(self) -> bool:
+        if self.shared is None:
+            return False
+        with self._lock:
+            if self._shared_failed_at is None:
+                return True
+            if time.monotonic() - self._shared_failed_at >= SHARED_RETRY_SECONDS:
+                self._shared_failed_at = None
+                return True
+            return False
+    
+    def _shared_failed(self, e: Exception) -> None:
+        logger.warning(f"Cache valutazioni condivisa non disponibile: {e}")
+        with self._lock:
+            self._shared_failed_at = time.monotonic()
+    
+    def get(self, key: str) -> Tuple[Optional[Dict], str]:
+        """
+        Returns:
+            (risultato, HIT/HIT-SHARED) o (None, MISS). Il risultato è
+            condiviso tra richieste: va trattato in sola lettura.
+        """
+        entry = self.local.get(key)
+        if entry is not None and entry.is_fresh:
+            return entry.value, HIT
+        
+        if self._shared_available():
+            try:
+                raw = self.shared.get(key)
+            except Exception as e:
+                self._shared_failed(e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                return value, HIT_SHARED
+        return None, MISS
+    
+    def set(self, key: str, value: Dict) -> None:
+        self.local.set(key, value)
+        if self._shared_available():
+            try:
+                self.shared.setex(key, self.ttl, json.dumps(value, ensure_ascii=False))
+            except Exception as e:
+                self._shared_failed(e)
+    
+    def clear(self) -> None:
+        """Svuota il livello in processo (il condiviso scade da sé)"""
+        self.local.clear()
+
+
+def _shared_client():
+    """Client Redis dal settings, None se non configurato o non installato"""
+    if not settings.VALUATION_CACHE_REDIS_URL:
+        return None
+    if redis is None:
+        logger.warning("VALUATION_CACHE_REDIS_URL impostato ma il pacchetto redis non è installato")
+        return None
+    return redis.Redis.from_url(settings.VALUATION_CACHE_REDIS_URL, socket_timeout=0.2)
+
+
+valuation_cache = ValuationCache(
+    local=TTLCache(
+        max_entries=settings.VALUATION_CACHE_MAX_ENTRIES,
+        ttl=settings.VALUATION_CACHE_TTL
+    ),
+    shared=_shared_client()
+)
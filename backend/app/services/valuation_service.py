@@ -10,11 +10,24 @@ Implementa i 4 valori principali:
 """
 
 import os
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime
 from sqlalchemy import create_engine, text
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from app.services.actuarial import (
+    DEFAULT_DISCOUNT_RATE, LifeTable, actuarial_valuation, bare_ownership_factors, get_life_table
+)
+from app.services.comparables import (
+    DEFAULT_K, MAX_COMPARABLES_WEIGHT, ComparablesIndex, combine_comparables, get_comparables_index
+)
+from app.services.comuni_index import ComuniIndex, get_comuni_index, normalize_name
+from app.services.omi_snapshot import OmiSnapshot, get_snapshot
+from app.services.risk_simulation import DEFAULT_SIMULATIONS, appreciation_parameters, simulate_bare_ownership_returns
+from app.services.zone_locator import ZoneMatch, ZoneLocator, get_zone_locator
 
 # Import moduli locali (quando saranno in app/services/)
 # from .surface_calculator import SurfaceCalculator
@@ -29,9 +42,12 @@ class PropertyData:
     provincia: Optional[str] = None
     fascia: str = 'B'  # B=centrale, C=semicentrale, D=periferica
     zona_codice: Optional[str] = None
+    latitude: Optional[float] = None  # Se zona_codice manca, la zona è
+    longitude: Optional[float] = None  # localizzata dai perimetri OMI
     
     # Superficie
     surface_sqm: float = 100
+    rooms: Optional[int] = None
     balcony_surface: Optional[float] = None
     terrace_surface: Optional[float] = None
     garden_surface: Optional[float] = None
@@ -66,9 +82,22 @@ class PropertyData:
     # Usufrutto
     usufructuary_age: int = 75
     usufruct_type: str = "vitalizio"  # vitalizio, temporaneo
+    usufruct_years: Optional[float] = None  # Durata dell'usufrutto temporaneo (anni)
+    usufructuary_sex: Optional[str] = None  # M, F (None = media delle tavole)
+    discount_rate: float = DEFAULT_DISCOUNT_RATE  # Tasso per il valore attuariale
     
     # Prezzo richiesto (opzionale)
     requested_price: Optional[float] = None
+    
+    # Semestre OMI di riferimento (None = semestre corrente)
+    semestre: Optional[str] = None
+    
+    # Codice ISTAT del comune (risolto dall'indice comuni): se presente le
+    # quotazioni sono cercate per codice invece che per nome
+    comune_istat: Optional[str] = None
+    
+    # Annuncio valutato (escluso dai propri comparabili)
+    property_id: Optional[int] = None
 
 
 class ValuationService:
@@ -99,12 +128,27 @@ class ValuationService:
     # Tasso legale corrente (sarà letto da DB)
     LEGAL_RATE_2025 = 0.025  # 2.5%
     
-    def __init__(self, database_url: Optional[str] = None):
+    # Tipi di usufrutto
+    VITALIZIO = "vitalizio"
+    TEMPORANEO = "temporaneo"
+    
+    # Quotazioni: semestre corrente e storico per semestre
+    OMI_TABLE = "omi_quotations"
+    OMI_HISTORY_TABLE = "omi_quotation_history"
+    
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        snapshot_dir: Optional[str] = None,
+        geometry_file: Optional[str] = None
+    ):
         """
         Inizializza servizio valutazione
         
         Args:
             database_url: Connessione database (se None usa env)
+            snapshot_dir: Snapshot OMI locale (se None usa OMI_SNAPSHOT_DIR)
+            geometry_file: Perimetri zone OMI (se None usa OMI_GEOMETRY_FILE)
         """
         if database_url is None:
             database_url = os.getenv(
@@ -113,6 +157,8 @@ class ValuationService:
             )
         
         self.engine = create_engine(database_url, echo=False)
+        self.snapshot_dir = snapshot_dir
+        self.geometry_file = geometry_file
         
         # Import moduli (se in locale)
         try:
@@ -125,20 +171,60 @@ class ValuationService:
             self.surface_calc = None
             self.coeff_calc = None
     
-    def get_usufruct_coefficient(self, age: int) -> Tuple[int, int, int]:
+    @classmethod
+    def get_usufruct_coefficient(cls, age: int) -> Tuple[int, int, int]:
         """
         Ottiene coefficiente usufrutto per età
         
         Returns:
             (coefficiente, % usufrutto, % nuda proprietà)
         """
-        for (min_age, max_age), values in self.USUFRUCT_COEFFICIENTS.items():
+        for (min_age, max_age), values in cls.USUFRUCT_COEFFICIENTS.items():
             if min_age <= age <= max_age:
                 return values
         
         # Fallback per età fuori range
         return (4, 10, 90)
     
+    @classmethod
+    def usufruct_coefficients(cls, ages) -> np.ndarray:
+        """Coefficienti usufrutto vitalizio per un array di età (vettoriale)"""
+        upper_bounds = np.array([max_age for _, max_age in cls.USUFRUCT_COEFFICIENTS])
+        coefficients = np.array([values[0] for values in cls.USUFRUCT_COEFFICIENTS.values()] + [4])
+        return coefficients[np.searchsorted(upper_bounds, np.asarray(ages), side='left')]
+    
+    @staticmethod
+    def temporary_usufruct_share(years, legal_rate: float, lifetime_share=None) -> np.ndarray:
+        """
+        Quota di usufrutto temporaneo sul valore pieno, in forma chiusa
+        
+        L'usufrutto di n anni vale la rendita V·r attualizzata al tasso
+        legale: V·r·a_n con a_n = (1 - (1 + r)^-n) / r, cioè una quota
+        1 - (1 + r)^-n. Non può superare l'usufrutto vitalizio
+        (lifetime_share, art. 46 TUR). Vettoriale su anni e limiti.
+        """
+        share = 1 - np.power(1 + legal_rate, -np.asarray(years, dtype=np.float64))
+        if lifetime_share is not None:
+            share = np.minimum(share, lifetime_share)
+        return share
+    
+    @classmethod
+    def usufruct_shares(
+        cls,
+        ages,
+        legal_rate: float,
+        usufruct_type: str = VITALIZIO,
+        years=None
+    ) -> np.ndarray:
+        """
+        Quota di usufrutto sul valore pieno per ogni età (vettoriale, per i
+        calcoli in blocco); temporaneo senza durata = vitalizio (limite massimo)
+        """
+        lifetime_share = legal_rate * cls.usufruct_coefficients(ages)
+        if usufruct_type == cls.TEMPORANEO and years is not None:
+            return cls.temporary_usufruct_share(years, legal_rate, lifetime_share)
+        return lifetime_share
+    
     def get_legal_rate(self) -> float:
         """Ottiene tasso legale corrente dal database"""
         try:
@@ -155,53 +241,255 @@ class ValuationService:
         
         return self.LEGAL_RATE_2025
     
+    def get_reference_data(self) -> Tuple[Optional[str], float]:
+        """
+        Semestre OMI corrente e tasso legale in una query: insieme agli
+        input identificano il risultato di una valutazione (chiave di cache)
+        """
+        values = {}
+        try:
+            with self.engine.connect() as conn:
+                values = dict(conn.execute(text("""
+                    SELECT chiave, valore FROM omi_settings
+                    WHERE chiave IN ('semestre_omi_corrente', 'tasso_legale_corrente')
+                """)).fetchall())
+        except Exception:
+            pass
+        
+        rate = values.get('tasso_legale_corrente')
+        return values.get('semestre_omi_corrente'), float(rate) if rate else self.LEGAL_RATE_2025
+    
+    # ------------------------------------------------------------
+    # Query di lookup OMI: usate dai metodi sotto e dal controllo
+    # EXPLAIN dell'import (import_omi_data.check_lookup_plans), che
+    # verifica che passino dall'indice su UPPER(comune_descrizione)
+    # ------------------------------------------------------------
+    
+    @classmethod
+    def omi_quotation_query(
+        cls,
+        comune: str,
+        fascia: str = 'B',
+        zona_codice: Optional[str] = None,
+        cod_tipologia: int = 20,
+        stato: str = 'NORMALE',
+        semestre: Optional[str] = None,
+        comune_istat: Optional[str] = None
+    ) -> Tuple[str, Dict]:
+        """SQL + parametri di get_omi_quotation (prima zona della fascia)"""
+        query = f"""
+            SELECT 
+                prezzo_min,
+                prezzo_max,
+                (prezzo_min + prezzo_max) / 2 as prezzo_medio,
+                zona_codice,
+                link_zona
+            FROM {cls.OMI_HISTORY_TABLE if semestre else cls.OMI_TABLE}
+            WHERE {'comune_istat = :comune_istat' if comune_istat else 'UPPER(comune_descrizione) = UPPER(:comune)'}
+            AND cod_tipologia = :cod_tipologia
+            AND stato = :stato
+            AND prezzo_min IS NOT NULL
+        """
+        params = {
+            'cod_tipologia': str(cod_tipologia),
+            'stato': stato
+        }
+        if comune_istat:
+            params['comune_istat'] = comune_istat
+        else:
+            params['comune'] = comune
+        
+        if semestre:
+            query += " AND semestre = :semestre"
+            params['semestre'] = semestre
+        
+        # Filtro zona se specificata
+        if zona_codice:
+            query += " AND zona_codice = :zona_codice"
+            params['zona_codice'] = zona_codice
+        else:
+            query += " AND fascia = :fascia"
+            params['fascia'] = fascia
+        
+        query += " ORDER BY fascia, zona_codice LIMIT 1"
+        return query, params
+    
+    @classmethod
+    def omi_city_reference_query(
+        cls,
+        comune: str,
+        cod_tipologia: int = 20,
+        stato: str = 'NORMALE',
+        semestre: Optional[str] = None
+    ) -> Tuple[str, Dict]:
+        """SQL + parametri di get_omi_city_reference"""
+        query = f"""
+            SELECT AVG((prezzo_min + prezzo_max) / 2)
+            FROM {cls.OMI_HISTORY_TABLE if semestre else cls.OMI_TABLE}
+            WHERE UPPER(comune_descrizione) = UPPER(:comune)
+            AND cod_tipologia = :cod_tipologia
+            AND stato = :stato
+            AND prezzo_min IS NOT NULL
+        """
+        params = {
+            'comune': comune,
+            'cod_tipologia': str(cod_tipologia),
+            'stato': stato
+        }
+        if semestre:
+            query += " AND semestre = :semestre"
+            params['semestre'] = semestre
+        return query, params
+    
+    @classmethod
+    def omi_zones_query(cls, comune: str) -> Tuple[str, Dict]:
+        """SQL + parametri delle zone di un comune (endpoint /zones/{comune})"""
+        query = f"""
+            SELECT DISTINCT 
+                zona_codice,
+                link_zona,
+                fascia
+            FROM {cls.OMI_TABLE}
+            WHERE UPPER(comune_descrizione) = UPPER(:comune)
+            AND zona_codice IS NOT NULL
+            ORDER BY fascia, zona_codice
+        """
+        return query, {'comune': comune}
+    
+    def get_omi_snapshot(self) -> Optional[OmiSnapshot]:
+        """Snapshot OMI locale se presente e allineato al semestre corrente"""
+        snapshot = get_snapshot(self.snapshot_dir)
+        if snapshot is not None and snapshot.is_current(self.engine):
+            return snapshot
+        return None
+    
+    def get_omi_zones(self, comune: str) -> List[Dict]:
+        """
+        Zone OMI di un comune ordinate per fascia e codice
+        
+        Lette dallo snapshot se allineato al semestre corrente, altrimenti
+        con omi_zones_query sul database.
+        
+        Returns:
+            Lista di dict con codice, link_zona, fascia
+        """
+        snapshot = self.get_omi_snapshot()
+        if snapshot is not None:
+            return [
+                {'codice': zone['codice'], 'link_zona': zone['link_zona'], 'fascia': zone['fascia']}
+                for zone in snapshot.zones(comune)
+            ]
+        
+        query, params = self.omi_zones_query(comune)
+        with self.engine.connect() as conn:
+            result = conn.execute(text(query), params)
+            return [
+                {'codice': row[0], 'link_zona': row[1], 'fascia': row[2]}
+                for row in result
+            ]
+    
+    def get_comuni_index(self) -> Optional[ComuniIndex]:
+        """Dizionario dei comuni OMI per risolvere i nomi digitati (None se non disponibile)"""
+        return get_comuni_index(self.engine)
+    
+    def get_zone_locator(self) -> Optional[ZoneLocator]:
+        """Indice spaziale dei perimetri OMI (None se le geometrie non sono state importate)"""
+        return get_zone_locator(self.geometry_file)
+    
+    def locate_omi_zone(
+        self,
+        latitude: float,
+        longitude: float,
+        comune: Optional[str] = None,
+        comune_istat: Optional[str] = None
+    ) -> Optional[ZoneMatch]:
+        """
+        Zona OMI che contiene le coordinate
+        
+        Args:
+            comune, comune_istat: Se indicati, la zona deve essere di quel
+                comune (coordinate incoerenti con il comune -> None)
+        """
+        locator = self.get_zone_locator()
+        if locator is None:
+            return None
+        match = locator.locate(latitude, longitude)
+        if match is None:
+            return None
+        if comune_istat and match.comune_istat and comune_istat != match.comune_istat:
+            return None
+        if not comune_istat and comune and normalize_name(comune) != normalize_name(match.comune):
+            return None
+        return match
+    
+    def get_life_table(self) -> Optional[LifeTable]:
+        """Tavole di mortalità per il valore attuariale (None se non leggibili)"""
+        return get_life_table()
+    
+    def get_comparables_index(self) -> Optional[ComparablesIndex]:
+        """Annunci pubblicati indicizzati per la stima per comparabili"""
+        return get_comparables_index(self.engine, self.get_legal_rate, self.get_usufruct_coefficient)
+    
+    def estimate_from_comparables(
+        self,
+        property_data: PropertyData,
+        k: int = DEFAULT_K
+    ) -> Optional[Dict]:
+        """
+        Prezzo €/mq di piena proprietà dagli annunci più simili (escluso
+        l'annuncio stesso se property_data.property_id è indicato)
+        
+        Returns:
+            Dict di combine_comparables o None (senza coordinate, indice non
+            disponibile o troppo pochi comparabili)
+        """
+        if property_data.latitude is None or property_data.longitude is None:
+            return None
+        index = self.get_comparables_index()
+        if index is None:
+            return None
+        comparables = index.query(
+            property_data.latitude,
+            property_data.longitude,
+            property_data.surface_sqm,
+            rooms=property_data.rooms,
+            energy_class=property_data.energy_class,
+            k=k,
+            exclude_ids=() if property_data.property_id is None else (property_data.property_id,)
+        )
+        return combine_comparables(comparables, k=k)
+    
     def get_omi_quotation(
         self,
         comune: str,
         fascia: str = 'B',
         zona_codice: Optional[str] = None,
         cod_tipologia: int = 20,  # Abitazioni civili
-        stato: str = 'NORMALE'
+        stato: str = 'NORMALE',
+        semestre: Optional[str] = None,
+        comune_istat: Optional[str] = None
     ) -> Optional[Dict[str, float]]:
         """
         Ottiene quotazione OMI dal database
         
+        Args:
+            semestre: Semestre "as of" (es. '2024/2'), letto dallo storico;
+                None = semestre corrente
+            comune_istat: Codice ISTAT del comune; se presente la query usa
+                il codice invece del nome
+        
         Returns:
             Dict con prezzo_min, prezzo_max, prezzo_medio o None
         """
+        snapshot = None if semestre else self.get_omi_snapshot()
+        if snapshot is not None:
+            return snapshot.quotation(comune, fascia, zona_codice, cod_tipologia, stato, comune_istat)
+        
+        query, params = self.omi_quotation_query(
+            comune, fascia, zona_codice, cod_tipologia, stato, semestre, comune_istat
+        )
         try:
             with self.engine.connect() as conn:
-                # Query base
-                query = """
-                    SELECT 
-                        prezzo_min,
-                        prezzo_max,
-                        (prezzo_min + prezzo_max) / 2 as prezzo_medio,
-                        zona_codice,
-                        link_zona
-                    FROM omi_quotations
-                    WHERE UPPER(comune_descrizione) = UPPER(:comune)
-                    AND cod_tipologia = :cod_tipologia
-                    AND stato = :stato
-                    AND prezzo_min IS NOT NULL
-                """
-                
-                params = {
-                    'comune': comune,
-                    'cod_tipologia': str(cod_tipologia),
-                    'stato': stato
-                }
-                
-                # Filtro zona se specificata
-                if zona_codice:
-                    query += " AND zona_codice = :zona_codice"
-                    params['zona_codice'] = zona_codice
-                else:
-                    query += " AND fascia = :fascia"
-                    params['fascia'] = fascia
-                
-                query += " ORDER BY fascia, zona_codice LIMIT 1"
-                
                 result = conn.execute(text(query), params).fetchone()
                 
                 if result:
@@ -218,10 +506,170 @@ class ValuationService:
         
         return None
     
+    def get_omi_city_reference(
+        self,
+        comune: str,
+        cod_tipologia: int = 20,  # Abitazioni civili
+        stato: str = 'NORMALE',
+        semestre: Optional[str] = None
+    ) -> Optional[float]:
+        """
+        Prezzo medio OMI €/mq di riferimento per l'intero comune
+        (media delle zone), usato per le metriche degli annunci
+        
+        Args:
+            semestre: Semestre "as of" (None = semestre corrente)
+        
+        Returns:
+            €/mq medio o None se comune non presente
+        """
+        snapshot = None if semestre else self.get_omi_snapshot()
+        if snapshot is not None:
+            return snapshot.city_reference(comune, cod_tipologia, stato)
+        
+        query, params = self.omi_city_reference_query(comune, cod_tipologia, stato, semestre)
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execute(text(query), params).scalar()
+                
+                if result is not None:
+                    return float(result)
+        
+        except Exception as e:
+            print(f"Errore query OMI: {e}")
+        
+        return None
+    
+    def get_omi_trend(
+        self,
+        comune: str,
+        zona_codice: Optional[str] = None,
+        fascia: str = 'B',
+        cod_tipologia: int = 20,  # Abitazioni civili
+        stato: str = 'NORMALE',
+        from_semestre: Optional[str] = None,
+        to_semestre: Optional[str] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Serie storica delle quotazioni di una zona, in ordine di semestre
+        
+        Una sola query, un range scan su idx_omi_history_trend
+        (comune, zona, tipologia, stato, semestre). Senza zona_codice
+        usa la prima zona della fascia, come get_omi_quotation.
+        
+        Returns:
+            Lista di dict semestre, zona_codice, fascia, prezzo_min,
+            prezzo_max, prezzo_medio, variazione_pct (vs semestre precedente)
+        """
+        params = {
+            'comune': comune,
+            'cod_tipologia': str(cod_tipologia),
+            'stato': stato,
+            'from_semestre': from_semestre or '0000/0',
+            'to_semestre': to_semestre or '9999/9'
+        }
+        if zona_codice:
+            zona_filter = "zona_codice = :zona_codice"
+            params['zona_codice'] = zona_codice
+        else:
+            zona_filter = f"""zona_codice = (
+                SELECT MIN(zona_codice) FROM {self.OMI_HISTORY_TABLE}
+                WHERE UPPER(comune_descrizione) = UPPER(:comune)
+                AND fascia = :fascia
+                AND cod_tipologia = :cod_tipologia
+                AND stato = :stato
+            )"""
+            params['fascia'] = fascia
+        
+        series = []
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(f"""
+                    SELECT semestre, zona_codice, fascia, prezzo_min, prezzo_max
+                    FROM {self.OMI_HISTORY_TABLE}
+                    WHERE UPPER(comune_descrizione) = UPPER(:comune)
+                    AND {zona_filter}
+                    AND cod_tipologia = :cod_tipologia
+                    AND stato = :stato
+                    AND semestre BETWEEN :from_semestre AND :to_semestre
+                    ORDER BY semestre
+                """), params).fetchall()
+        except Exception as e:
+            print(f"Errore query trend OMI: {e}")
+            return series
+        
+        previous = None
+        for semestre, zona, fascia_zona, prezzo_min, prezzo_max in rows:
+            medio = None
+            if prezzo_min is not None and prezzo_max is not None:
+                medio = (float(prezzo_min) + float(prezzo_max)) / 2
+            variazione = None
+            if medio is not None and previous:
+                variazione = round((medio - previous) / previous * 100, 2)
+            series.append({
+                'semestre': semestre,
+                'zona_codice': zona,
+                'fascia': fascia_zona,
+                'prezzo_min': float(prezzo_min) if prezzo_min is not None else None,
+                'prezzo_max': float(prezzo_max) if prezzo_max is not None else None,
+                'prezzo_medio': medio,
+                'variazione_pct': variazione
+            })
+            previous = medio if medio is not None else previous
+        
+        return series
+    
+    def simulate_investment(
+        self,
+        comune: str,
+        purchase_price: float,
+        full_property_value: float,
+        usufructuary_age: int,
+        sex: Optional[str] = None,
+        zona_codice: Optional[str] = None,
+        fascia: str = 'B',
+        simulations: int = DEFAULT_SIMULATIONS,
+        seed: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Distribuzione Monte Carlo del rendimento di un acquisto di nuda
+        proprietà: durata dell'usufrutto dalle tavole di mortalità,
+        rivalutazione stimata dallo storico OMI della zona
+        
+        Returns:
+            Dict di simulate_bare_ownership_returns con i parametri di
+            rivalutazione usati; None se le tavole non sono disponibili
+        """
+        table = self.get_life_table()
+        if table is None:
+            return None
+        
+        trend = self.get_omi_trend(comune, zona_codice=zona_codice, fascia=fascia)
+        market = appreciation_parameters([point['prezzo_medio'] for point in trend])
+        result = simulate_bare_ownership_returns(
+            table,
+            purchase_price=purchase_price,
+            full_value=full_property_value,
+            usufructuary_age=usufructuary_age,
+            sex=sex,
+            semester_drift=market['media_semestrale'],
+            semester_volatility=market['volatilita_semestrale'],
+            simulations=simulations,
+            seed=seed
+        )
+        market['zona_codice'] = trend[0]['zona_codice'] if trend else zona_codice
+        result['rivalutazione'] = market
+        result['prezzo_acquisto'] = purchase_price
+        result['valore_piena_proprieta'] = full_property_value
+        return result
+    
     def calculate_fiscal_value(
         self,
         full_property_value: float,
-        usufructuary_age: int
+        usufructuary_age: int,
+        legal_rate: Optional[float] = None,
+        usufruct_type: str = VITALIZIO,
+        usufruct_years: Optional[float] = None
     ) -> Dict[str, float]:
         """
         Calcola valore fiscale usufrutto e nuda proprietà
@@ -229,6 +677,9 @@ class ValuationService:
         Args:
             full_property_value: Valore piena proprietà
             usufructuary_age: Età usufruttuario
+            legal_rate: Tasso legale (default: letto dal database)
+            usufruct_type: vitalizio o temporaneo
+            usufruct_years: Durata del temporaneo (None = vitalizio)
             
         Returns:
             Dict con valori fiscali
@@ -239,22 +690,40 @@ class ValuationService:
         )
         
         # Tasso legale
-        tasso_legale = self.get_legal_rate()
+        tasso_legale = legal_rate if legal_rate is not None else self.get_legal_rate()
         
         # Calcolo ministeriale
         annualita = full_property_value * tasso_legale
         valore_usufrutto = annualita * coefficiente
-        valore_nuda_proprieta = full_property_value - valore_usufrutto
         
-        return {
+        result = {
+            'tipo_usufrutto': self.VITALIZIO,
             'tasso_legale': tasso_legale,
             'coefficiente': coefficiente,
             'annualita': annualita,
             'valore_usufrutto': valore_usufrutto,
-            'valore_nuda_proprieta': valore_nuda_proprieta,
             'percentuale_usufrutto': perc_usufrutto,
             'percentuale_nuda': perc_nuda
         }
+        
+        # Temporaneo: rendita per la durata, al massimo il vitalizio
+        if usufruct_type == self.TEMPORANEO and usufruct_years is not None:
+            lifetime_share = tasso_legale * coefficiente
+            share = float(self.temporary_usufruct_share(usufruct_years, tasso_legale, lifetime_share))
+            valore_usufrutto = full_property_value * share
+            result.update({
+                'tipo_usufrutto': self.TEMPORANEO,
+                'durata_anni': usufruct_years,
+                'coefficiente': round(share / tasso_legale, 4) if tasso_legale else coefficiente,
+                'valore_usufrutto': valore_usufrutto,
+                'valore_usufrutto_vitalizio': result['valore_usufrutto'],
+                'limitato_al_vitalizio': share >= lifetime_share,
+                'percentuale_usufrutto': round(share * 100, 2),
+                'percentuale_nuda': round((1 - share) * 100, 2)
+            })
+        
+        result['valore_nuda_proprieta'] = full_property_value - valore_usufrutto
+        return result
     
     def calculate_deal_score(
         self,
@@ -321,6 +790,173 @@ class ValuationService:
                 'discount_percentage': -scarto
             }
     
+    @classmethod
+    def usufruct_term(cls, property_data: PropertyData) -> Optional[float]:
+        """Durata dell'usufrutto in anni (None = vitalizio)"""
+        if property_data.usufruct_type == cls.TEMPORANEO:
+            return property_data.usufruct_years
+        return None
+    
+    def locate_omi_quotation(
+        self,
+        property_data: PropertyData
+    ) -> Tuple[Optional[Dict], Optional[ZoneMatch]]:
+        """
+        Quotazione OMI dell'immobile: zona esplicita, localizzata dalle
+        coordinate o, in mancanza, prima zona della fascia
+        
+        Returns:
+            (quotazione o None, zona localizzata o None)
+        """
+        zona_codice = property_data.zona_codice
+        comune_istat = property_data.comune_istat
+        zone = None
+        if not zona_codice and property_data.latitude is not None and property_data.longitude is not None:
+            zone = self.locate_omi_zone(
+                property_data.latitude,
+                property_data.longitude,
+                comune=property_data.comune,
+                comune_istat=comune_istat
+            )
+            if zone is not None:
+                zona_codice = zone.zona_codice
+                comune_istat = comune_istat or zone.comune_istat or None
+        
+        omi_data = self.get_omi_quotation(
+            comune=property_data.comune,
+            fascia=property_data.fascia,
+            zona_codice=zona_codice,
+            semestre=property_data.semestre,
+            comune_istat=comune_istat
+        )
+        if omi_data and property_data.semestre:
+            omi_data['semestre'] = property_data.semestre
+        return omi_data, zone
+    
+    def calculate_commercial_surface(self, property_data: PropertyData) -> Tuple[Optional[Dict], float]:
+        """
+        Superficie commerciale (con pertinenze se il calcolatore è disponibile)
+        
+        Returns:
+            (dettaglio o None, superficie da usare nel calcolo)
+        """
+        if not self.surface_calc:
+            return None, property_data.surface_sqm
+        surface_data = self.surface_calc.calculate_commercial_surface(
+            main_surface=property_data.surface_sqm,
+            balcony_surface=property_data.balcony_surface,
+            terrace_surface=property_data.terrace_surface,
+            garden_surface=property_data.garden_surface,
+            cellar_surface=property_data.cellar_surface,
+            has_box=property_data.has_box,
+            num_garages=property_data.num_garages,
+            num_parking=property_data.num_parking
+        )
+        return surface_data, surface_data['total_commercial_surface']
+    
+    def calculate_merit_multiplier(self, property_data: PropertyData) -> Tuple[Optional[Dict], float]:
+        """
+        Coefficienti di merito (piano, stato, luminosità, ...)
+        
+        Returns:
+            (coefficienti o None, moltiplicatore; 1.0 senza calcolatore o in errore)
+        """
+        if not self.coeff_calc:
+            return None, 1.0
+        try:
+            # Import enums
+            from coefficients import (
+                PropertyCondition, Brightness, ViewType,
+                BuildingCondition, HeatingType
+            )
+            
+            # Converti stringhe in enums
+            condition_map = {
+                'da_ristrutturare': PropertyCondition.DA_RISTRUTTURARE,
+                'buono': PropertyCondition.BUONO,
+                'ristrutturato': PropertyCondition.RISTRUTTURATO,
+                'finemente_ristrutturato': PropertyCondition.FINEMENTE_RISTRUTTURATO,
+                'nuova_costruzione': PropertyCondition.NUOVA_COSTRUZIONE
+            }
+            
+            brightness_map = {
+                'molto_luminoso': Brightness.MOLTO_LUMINOSO,
+                'luminoso': Brightness.LUMINOSO,
+                'mediamente_luminoso': Brightness.MEDIAMENTE_LUMINOSO,
+                'poco_luminoso': Brightness.POCO_LUMINOSO
+            }
+            
+            view_map = {
+                'esterna_panoramica': ViewType.ESTERNA_PANORAMICA,
+                'esterna': ViewType.ESTERNA,
+                'mista': ViewType.MISTA,
+                'interna': ViewType.INTERNA,
+                'completamente_interna': ViewType.COMPLETAMENTE_INTERNA
+            }
+            
+            building_cond_map = {
+                'ottimo': BuildingCondition.OTTIMO,
+                'normale': BuildingCondition.NORMALE,
+                'scadente': BuildingCondition.SCADENTE
+            }
+            
+            heating_map = {
+                'autonomo': HeatingType.AUTONOMO,
+                'centralizzato_contabilizzato': HeatingType.CENTRALIZZATO_CONTABILIZZATO,
+                'centralizzato': HeatingType.CENTRALIZZATO,
+                'assente': HeatingType.ASSENTE
+            }
+            
+            coefficients = self.coeff_calc.calculate_total_coefficient(
+                floor=property_data.floor,
+                has_elevator=property_data.has_elevator,
+                is_attic=property_data.is_attic,
+                is_last_floor=property_data.is_last_floor,
+                has_garden=property_data.has_garden,
+                condition=condition_map.get(property_data.condition),
+                brightness=brightness_map.get(property_data.brightness),
+                view=view_map.get(property_data.view),
+                building_year=property_data.building_year,
+                building_condition=building_cond_map.get(property_data.building_condition),
+                heating=heating_map.get(property_data.heating_type),
+                energy_class=property_data.energy_class
+            )
+            
+            return coefficients, coefficients['multiplier']
+            
+        except Exception as e:
+            print(f"Errore calcolo coefficienti: {e}")
+            return None, 1.0
+    
+    @staticmethod
+    def blend_comparables(
+        valore_omi: float,
+        comparables: Optional[Dict],
+        superficie: float
+    ) -> Tuple[float, Optional[Dict], Optional[Dict]]:
+        """
+        Valore di riferimento: stima OMI combinata con quella per
+        comparabili in proporzione alla confidenza
+        
+        Returns:
+            (valore di riferimento, stima_comparabili, stima_combinata);
+            senza comparabili (valore_omi, None, None)
+        """
+        if not comparables:
+            return valore_omi, None, None
+        valore_comparabili = comparables['prezzo_mq'] * superficie
+        peso = comparables['confidenza'] * MAX_COMPARABLES_WEIGHT
+        valore_riferimento = (1 - peso) * valore_omi + peso * valore_comparabili
+        return (
+            valore_riferimento,
+            {**comparables, 'valore': valore_comparabili},
+            {
+                'medio': valore_riferimento,
+                'peso_comparabili': round(peso, 3),
+                'peso_omi': round(1 - peso, 3)
+            }
+        )
+    
     def calculate_complete_valuation(
         self,
         property_data: PropertyData
@@ -335,45 +971,35 @@ class ValuationService:
             'timestamp': datetime.now().isoformat(),
             'property_summary': {
                 'comune': property_data.comune,
+                'comune_istat': property_data.comune_istat,
                 'superficie': property_data.surface_sqm,
                 'eta_usufruttuario': property_data.usufructuary_age
             }
         }
         
-        # 1. QUOTAZIONE OMI
-        omi_data = self.get_omi_quotation(
-            comune=property_data.comune,
-            fascia=property_data.fascia,
-            zona_codice=property_data.zona_codice
-        )
+        # 1. QUOTAZIONE OMI (zona esplicita, localizzata dalle coordinate
+        # o, in mancanza, prima zona della fascia)
+        omi_data, zone = self.locate_omi_quotation(property_data)
+        if zone is not None:
+            result['zona_omi'] = zone.to_dict()
         
         if not omi_data:
-            result['error'] = f"Nessuna quotazione OMI trovata per {property_data.comune}"
+            periodo = f" (semestre {property_data.semestre})" if property_data.semestre else ""
+            result['error'] = f"Nessuna quotazione OMI trovata per {property_data.comune}{periodo}"
             return result
         
         result['omi_quotation'] = omi_data
         
         # 2. SUPERFICIE COMMERCIALE
-        if self.surface_calc:
-            surface_data = self.surface_calc.calculate_commercial_surface(
-                main_surface=property_data.surface_sqm,
-                balcony_surface=property_data.balcony_surface,
-                terrace_surface=property_data.terrace_surface,
-                garden_surface=property_data.garden_surface,
-                cellar_surface=property_data.cellar_surface,
-                has_box=property_data.has_box,
-                num_garages=property_data.num_garages,
-                num_parking=property_data.num_parking
-            )
+        surface_data, superficie_calcolo = self.calculate_commercial_surface(property_data)
+        if surface_data:
             result['superficie_commerciale'] = surface_data
-            superficie_calcolo = surface_data['total_commercial_surface']
-        else:
-            superficie_calcolo = property_data.surface_sqm
         
         # 3. VALORE PIENA PROPRIETÀ (Base OMI)
         valore_base_min = omi_data['prezzo_min'] * superficie_calcolo
         valore_base_max = omi_data['prezzo_max'] * superficie_calcolo
         valore_base_medio = omi_data['prezzo_medio'] * superficie_calcolo
+        semestre = property_data.semestre or self.get_reference_data()[0]
         
         result['valore_piena_proprieta_base'] = {
             'min': valore_base_min,
@@ -381,78 +1007,13 @@ class ValuationService:
             'medio': valore_base_medio,
             'prezzo_mq': omi_data['prezzo_medio'],
             'superficie_utilizzata': superficie_calcolo,
-            'fonte': 'OMI Semestre 2025/1'
+            'fonte': f"OMI Semestre {semestre}" if semestre else 'OMI'
         }
         
         # 4. COEFFICIENTI DI MERITO
-        if self.coeff_calc:
-            try:
-                # Import enums
-                from coefficients import (
-                    PropertyCondition, Brightness, ViewType,
-                    BuildingCondition, HeatingType
-                )
-                
-                # Converti stringhe in enums
-                condition_map = {
-                    'da_ristrutturare': PropertyCondition.DA_RISTRUTTURARE,
-                    'buono': PropertyCondition.BUONO,
-                    'ristrutturato': PropertyCondition.RISTRUTTURATO,
-                    'finemente_ristrutturato': PropertyCondition.FINEMENTE_RISTRUTTURATO,
-                    'nuova_costruzione': PropertyCondition.NUOVA_COSTRUZIONE
-                }
-                
-                brightness_map = {
-                    'molto_luminoso': Brightness.MOLTO_LUMINOSO,
-                    'luminoso': Brightness.LUMINOSO,
-                    'mediamente_luminoso': Brightness.MEDIAMENTE_LUMINOSO,
-                    'poco_luminoso': Brightness.POCO_LUMINOSO
-                }
-                
-                view_map = {
-                    'esterna_panoramica': ViewType.ESTERNA_PANORAMICA,
-                    'esterna': ViewType.ESTERNA,
-                    'mista': ViewType.MISTA,
-                    'interna': ViewType.INTERNA,
-                    'completamente_interna': ViewType.COMPLETAMENTE_INTERNA
-                }
-                
-                building_cond_map = {
-                    'ottimo': BuildingCondition.OTTIMO,
-                    'normale': BuildingCondition.NORMALE,
-                    'scadente': BuildingCondition.SCADENTE
-                }
-                
-                heating_map = {
-                    'autonomo': HeatingType.AUTONOMO,
-                    'centralizzato_contabilizzato': HeatingType.CENTRALIZZATO_CONTABILIZZATO,
-                    'centralizzato': HeatingType.CENTRALIZZATO,
-                    'assente': HeatingType.ASSENTE
-                }
-                
-                coefficients = self.coeff_calc.calculate_total_coefficient(
-                    floor=property_data.floor,
-                    has_elevator=property_data.has_elevator,
-                    is_attic=property_data.is_attic,
-                    is_last_floor=property_data.is_last_floor,
-                    has_garden=property_data.has_garden,
-                    condition=condition_map.get(property_data.condition),
-                    brightness=brightness_map.get(property_data.brightness),
-                    view=view_map.get(property_data.view),
-                    building_year=property_data.building_year,
-                    building_condition=building_cond_map.get(property_data.building_condition),
-                    heating=heating_map.get(property_data.heating_type),
-                    energy_class=property_data.energy_class
-                )
-                
-                result['coefficienti_merito'] = coefficients
-                moltiplicatore = coefficients['multiplier']
-                
-            except Exception as e:
-                print(f"Errore calcolo coefficienti: {e}")
-                moltiplicatore = 1.0
-        else:
-            moltiplicatore = 1.0
+        coefficients, moltiplicatore = self.calculate_merit_multiplier(property_data)
+        if coefficients:
+            result['coefficienti_merito'] = coefficients
         
         # 5. STIMA "MIA PER SEMPRE" (con coefficienti)
         valore_stimato_min = valore_base_min * moltiplicatore
@@ -467,14 +1028,39 @@ class ValuationService:
             'variazione_percentuale': (moltiplicatore - 1) * 100
         }
         
+        # 5b. COMPARABILI: annunci simili vicini, combinati con la stima OMI
+        # in proporzione alla confidenza
+        valore_riferimento, stima_comparabili, stima_combinata = self.blend_comparables(
+            valore_stimato_medio,
+            self.estimate_from_comparables(property_data),
+            superficie_calcolo
+        )
+        if stima_combinata:
+            result['stima_comparabili'] = stima_comparabili
+            result['stima_combinata'] = stima_combinata
+        
         # 6. VALORE FISCALE (Nuda Proprietà)
         fiscal_data = self.calculate_fiscal_value(
-            full_property_value=valore_stimato_medio,
-            usufructuary_age=property_data.usufructuary_age
+            full_property_value=valore_riferimento,
+            usufructuary_age=property_data.usufructuary_age,
+            usufruct_type=property_data.usufruct_type,
+            usufruct_years=property_data.usufruct_years
         )
         
         result['valore_fiscale'] = fiscal_data
         
+        # 6b. VALORE ATTUARIALE (tavole di mortalità + tasso di sconto)
+        life_table = self.get_life_table()
+        if life_table is not None:
+            result['valore_attuariale'] = actuarial_valuation(
+                life_table,
+                full_property_value=valore_riferimento,
+                usufructuary_age=property_data.usufructuary_age,
+                sex=property_data.usufructuary_sex,
+                discount_rate=property_data.discount_rate,
+                term=self.usufruct_term(property_data)
+            )
+        
         # 7. DEAL SCORE (se prezzo richiesto disponibile)
         if property_data.requested_price:
             result['prezzo_richiesto'] = property_data.requested_price
@@ -488,6 +1074,96 @@ class ValuationService:
         
         return result
     
+    def calculate_sensitivity(
+        self,
+        property_data: PropertyData,
+        ages: Optional[List[int]] = None,
+        conditions: Optional[List[str]] = None,
+        surfaces: Optional[List[float]] = None,
+        prices: Optional[List[float]] = None
+    ) -> Dict[str, any]:
+        """
+        Griglia what-if: la valutazione per ogni combinazione di età,
+        stato di conservazione, superficie e prezzo richiesto (un asse non
+        indicato vale solo il valore di property_data).
+        
+        Il lavoro comune è fatto una volta: quotazione OMI, tasso legale e
+        tavole; superficie commerciale e comparabili una volta per
+        superficie, coefficienti di merito una volta per stato; valori
+        fiscali e attuariali vettoriali su tutte le età.
+        
+        Returns:
+            Dict con assi, omi_quotation e celle (ordine superficie, stato,
+            età, prezzo; prezzo più interno), ciascuna con valore pieno,
+            nuda fiscale e attuariale e deal score se c'è un prezzo
+        """
+        ages = ages or [property_data.usufructuary_age]
+        conditions = conditions or [property_data.condition]
+        surfaces = surfaces or [property_data.surface_sqm]
+        prices = prices or [property_data.requested_price]
+        axes = {
+            'superficie': surfaces,
+            'stato_conservazione': conditions,
+            'eta': ages,
+            'prezzo_richiesto': prices
+        }
+        
+        omi_data, _ = self.locate_omi_quotation(property_data)
+        if not omi_data:
+            return {'error': f"Nessuna quotazione OMI trovata per {property_data.comune}", 'assi': axes}
+        
+        # Per età: coefficienti fiscali e fattori attuariali (vettoriali)
+        legal_rate = self.get_legal_rate()
+        term = self.usufruct_term(property_data)
+        fiscal_share = 1 - self.usufruct_shares(ages, legal_rate, property_data.usufruct_type, term)
+        life_table = self.get_life_table()
+        actuarial_share = None
+        if life_table is not None:
+            actuarial_share = bare_ownership_factors(
+                life_table, ages, [property_data.discount_rate], property_data.usufructuary_sex, term=term
+            )[:, 0]
+        
+        multipliers = {
+            condition: self.calculate_merit_multiplier(replace(property_data, condition=condition))[1]
+            for condition in conditions
+        }
+        
+        cells = []
+        for surface in surfaces:
+            surface_data = replace(property_data, surface_sqm=surface)
+            _, superficie = self.calculate_commercial_surface(surface_data)
+            comparables = self.estimate_from_comparables(surface_data)
+            for condition in conditions:
+                valore_omi = omi_data['prezzo_medio'] * superficie * multipliers[condition]
+                valore_pieno, _, _ = self.blend_comparables(valore_omi, comparables, superficie)
+                nuda_fiscale = valore_pieno * fiscal_share
+                nuda_attuariale = valore_pieno * actuarial_share if actuarial_share is not None else None
+                for i, age in enumerate(ages):
+                    for price in prices:
+                        cell = {
+                            'superficie': surface,
+                            'stato_conservazione': condition,
+                            'eta': age,
+                            'prezzo_richiesto': price,
+                            'valore_piena_proprieta': valore_pieno,
+                            'valore_nuda_fiscale': float(nuda_fiscale[i]),
+                            'valore_nuda_attuariale': (
+                                float(nuda_attuariale[i]) if nuda_attuariale is not None else None
+                            )
+                        }
+                        if price:
+                            deal = self.calculate_deal_score(price, cell['valore_nuda_fiscale'])
+                            cell['deal_score'] = deal['score']
+                            cell['scarto_percentuale'] = deal['discount_percentage']
+                        cells.append(cell)
+        
+        return {
+            'assi': axes,
+            'omi_quotation': omi_data,
+            'tasso_legale': legal_rate,
+            'celle': cells
+        }
+    
     def format_valuation_report(self, valuation: Dict) -> str:
         """
         Formatta valutazione in report leggibile
@@ -541,17 +1217,42 @@ class ValuationService:
         lines.append(f"\n➜ Valore Range: {smp['min']:,.0f} - {smp['max']:,.0f} €")
         lines.append(f"➜ Valore Medio: {smp['medio']:,.0f} €")
         
+        if 'stima_combinata' in valuation:
+            comp = valuation['stima_comparabili']
+            combined = valuation['stima_combinata']
+            lines.append(
+                f"\n  Comparabili: {comp['numero']} annunci, {comp['prezzo_mq']:,.0f} €/mq "
+                f"(confidenza {comp['confidenza']:.0%}, peso {combined['peso_comparabili']:.0%})"
+            )
+            lines.append(f"➜ Valore Combinato OMI + Comparabili: {combined['medio']:,.0f} €")
+        
         # 4. Valore Fiscale
         lines.append(f"\n{'='*80}")
         lines.append("4️⃣  VALORE FISCALE (Riferimento Tasse)")
         lines.append("-" * 80)
         fiscal = valuation['valore_fiscale']
         lines.append(f"Tasso legale: {fiscal['tasso_legale']*100:.2f}%")
-        lines.append(f"Coefficiente età {prop['eta_usufruttuario']}: {fiscal['coefficiente']}")
+        if fiscal.get('tipo_usufrutto') == self.TEMPORANEO:
+            limite = " (limitato al vitalizio)" if fiscal['limitato_al_vitalizio'] else ""
+            lines.append(f"Usufrutto temporaneo: {fiscal['durata_anni']:g} anni{limite}")
+            lines.append(f"Coefficiente rendita: {fiscal['coefficiente']}")
+        else:
+            lines.append(f"Coefficiente età {prop['eta_usufruttuario']}: {fiscal['coefficiente']}")
         lines.append(f"Annualità: {fiscal['annualita']:,.0f} €")
         lines.append(f"\n➜ Valore Usufrutto ({fiscal['percentuale_usufrutto']}%): {fiscal['valore_usufrutto']:,.0f} €")
         lines.append(f"➜ Valore Nuda Proprietà ({fiscal['percentuale_nuda']}%): {fiscal['valore_nuda_proprieta']:,.0f} €")
         
+        if 'valore_attuariale' in valuation:
+            actuarial = valuation['valore_attuariale']
+            lines.append(
+                f"\n  Valore attuariale (speranza di vita {actuarial['speranza_vita']:.1f} anni, "
+                f"tasso {actuarial['tasso_sconto']*100:.2f}%)"
+            )
+            lines.append(
+                f"➜ Nuda Proprietà Attuariale ({actuarial['percentuale_nuda']:.1f}%): "
+                f"{actuarial['valore_nuda_proprieta']:,.0f} €"
+            )
+        
         # 5. Prezzo Richiesto e Deal Score
         if 'prezzo_richiesto' in valuation:
             lines.append(f"\n{'='*80}")
@@ -570,6 +1271,17 @@ class ValuationService:
         return "\n".join(lines)
 
 
+# Singleton per uso globale (un solo engine/pool per processo)
+_service_instance = None
+
+def get_valuation_service() -> ValuationService:
+    """Ritorna istanza singleton del servizio valutazione"""
+    global _service_instance
+    if _service_instance is None:
+        _service_instance = ValuationService()
+    return _service_instance
+
+
 # Example usage standalone
 if __name__ == "__main__":
     print("VALUTAZIONE IMMOBILE - TEST")
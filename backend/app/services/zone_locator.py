@@ -0,0 +1,390 @@
+# app/services/zone_locator.py
+"""
+Localizzazione Zona OMI da Coordinate
+Mia Per Sempre - Marketplace Nuda Proprietà
+
+I perimetri delle zone OMI (export KML/KMZ dell'Agenzia delle Entrate)
+sono convertiti dall'import (import_omi_data.py --zone-geometry) in un file
+.npz di array piatti: vertici, anelli, poligoni, zona di ogni poligono.
+
+Ogni worker lo carica una volta e costruisce un R-tree impacchettato con
+Sort-Tile-Recursive sui bounding box dei poligoni: una ricerca visita pochi
+nodi (profondità 3-4 per ~30.000 poligoni) e il test punto-in-poligono
+(ray casting, buchi compresi) gira solo sui candidati.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File di default (sovrascrivibile con OMI_GEOMETRY_FILE)
+DEFAULT_GEOMETRY_FILE = os.getenv(
+    'OMI_GEOMETRY_FILE',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'omi', 'zone_geometry.npz')
+)
+
+GEOMETRY_VERSION = 1
+
+# Figli per nodo dell'R-tree
+NODE_CAPACITY = 16
+
+# Campi ExtendedData del KML (nomi alternativi tra un export e l'altro)
+KML_FIELDS = {
+    'link_zona': ('LINK_ZONA', 'LINKZONA', 'LINK'),
+    'zona_codice': ('ZONA', 'COD_ZONA', 'CODZONA', 'ZONA_CODICE'),
+    'comune_istat': ('CODCOM', 'COD_ISTAT', 'CODICE_ISTAT', 'COMUNE_ISTAT'),
+}
+
+# Link zona OMI (es. PE00000001)
+LINK_ZONA_PATTERN = re.compile(r"^[A-Z]{2}\d{8}$")
+
+ZONE_COLUMNS = ('link_zona', 'zona_codice', 'fascia', 'comune_istat', 'comune')
+
+
+# ============================================================================
+# LETTURA KML
+# ============================================================================
+
+# Anello: lista di vertici (lon, lat); poligono: [esterno, buco, buco, ...]
+Ring = List[Tuple[float, float]]
+Polygon = List[Ring]
+
+
+@dataclass
+class ZoneShape:
+    """Perimetro di una zona OMI (uno o più poligoni)"""
+    link_zona: str
+    zona_codice: str
+    fascia: str = ''
+    comune_istat: str = ''
+    comune: str = ''
+    polygons: List[Polygon] = field(default_factory=list)
+
+
+def _local(tag: str) -> str:
+    """Tag senza namespace ({http://www.opengis.net/kml/2.2}Placemark -> Placemark)"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_coordinates(value: str) -> Ring:
+    ring = []
+    for vertex in (value or '').split():
+        lon, lat = vertex.split(',')[:2]
+        ring.append((float(lon), float(lat)))
+    return ring
+
+
+def _parse_placemark(placemark) -> Dict:
+    fields = {}
+    polygons = []
+    for element in placemark.iter():
+        tag = _local(element.tag)
+        if tag == 'name' and 'name' not in fields:
+            fields['name'] = (element.text or '').strip()
+        elif tag == 'SimpleData':
+            fields[element.get('name', '').upper()] = (element.text or '').strip()
+        elif tag == 'Data':
+            value = next((c.text for c in element if _local(c.tag) == 'value'), None)
+            fields[element.get('name', '').upper()] = (value or '').strip()
+        elif tag == 'Polygon':
+            polygon = []
+            for boundary in element:
+                if _local(boundary.tag) not in ('outerBoundaryIs', 'innerBoundaryIs'):
+                    continue
+                coordinates = next(
+                    (c for c in boundary.iter() if _local(c.tag) == 'coordinates'), None
+                )
+                ring = _parse_coordinates(coordinates.text if coordinates is not None else '')
+                if len(ring) < 3:
+                    continue
+                if _local(boundary.tag) == 'outerBoundaryIs':
+                    polygon.insert(0, ring)
+                else:
+                    polygon.append(ring)
+            if polygon:
+                polygons.append(polygon)
+    return {'fields': fields, 'polygons': polygons}
+
+
+def _kml_sources(path: str) -> Iterable:
+    """File KML da un file .kml/.kmz o da una directory (ricorsiva)"""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for filename in sorted(files):
+                if filename.lower().endswith(('.kml', '.kmz')):
+                    yield from _kml_sources(os.path.join(root, filename))
+    elif path.lower().endswith('.kmz'):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.lower().endswith('.kml'):
+                    with archive.open(name) as f:
+                        yield f
+    else:
+        with open(path, 'rb') as f:
+            yield f
+
+
+def read_kml_placemarks(path: str) -> List[Dict]:
+    """
+    Placemark con poligoni dei file KML/KMZ in path.
+    
+    Returns:
+        Lista di dict: fields (ExtendedData + name) e polygons
+    """
+    placemarks = []
+    for source in _kml_sources(path):
+        for _, element in ElementTree.iterparse(source):
+            if _local(element.tag) == 'Placemark':
+                placemark = _parse_placemark(element)
+                if placemark['polygons']:
+                    placemarks.append(placemark)
+                element.clear()
+    return placemarks
+
+
+def build_zone_shapes(placemarks: Sequence[Dict], zones: Sequence[Dict]) -> Tuple[List[ZoneShape], int]:
+    """
+    Associa i placemark alle zone di omi_zones: per link_zona o, se
+    manca, per (codice ISTAT, codice zona).
+    
+    Args:
+        zones: Righe di omi_zones (link_zona, zona_codice, fascia,
+            comune_istat, comune)
+    
+    Returns:
+        (zone con perimetro, placemark senza zona corrispondente)
+    """
+    by_link = {zone['link_zona']: zone for zone in zones}
+    by_code = {(zone['comune_istat'], zone['zona_codice']): zone for zone in zones}
+    
+    shapes: Dict[str, ZoneShape] = {}
+    unmatched = 0
+    for placemark in placemarks:
+        fields = placemark['fields']
+        value = {
+            key: next((fields[name] for name in names if fields.get(name)), None)
+            for key, names in KML_FIELDS.items()
+        }
+        name = fields.get('name', '').upper()
+        if not value['link_zona'] and LINK_ZONA_PATTERN.match(name):
+            value['link_zona'] = name
+        
+        zone = by_link.get(value['link_zona']) or by_code.get(
+            (value['comune_istat'], value['zona_codice'] or name)
+        )
+        if zone is None:
+            unmatched += 1
+            continue
+        
+        shape = shapes.get(zone['link_zona'])
+        if shape is None:
+            shape = shapes[zone['link_zona']] = ZoneShape(
+                **{column: zone.get(column) or '' for column in ZONE_COLUMNS}
+            )
+        shape.polygons.extend(placemark['polygons'])
+    return list(shapes.values()), unmatched
+
+
+# ============================================================================
+# FILE GEOMETRIE
+# ============================================================================
+
+def write_zone_geometry(path: str, shapes: Sequence[ZoneShape]) -> Dict:
+    """
+    Scrive i perimetri in un .npz di array piatti (rename atomico: i worker
+    vedono il file precedente o quello nuovo).
+    
+    Returns:
+        Conteggi scritti (zone, poligoni, vertici)
+    """
+    coords, ring_offsets, polygon_rings, polygon_zone = [], [0], [0], []
+    for zone_id, shape in enumerate(shapes):
+        for polygon in shape.polygons:
+            for ring in polygon:
+                coords.extend(ring)
+                ring_offsets.append(len(coords))
+            polygon_rings.append(len(ring_offsets) - 1)
+            polygon_zone.append(zone_id)
+    
+    arrays = {
+        'version': np.array(GEOMETRY_VERSION),
+        'coords': np.asarray(coords, dtype=np.float64).reshape(-1, 2),
+        'ring_offsets': np.asarray(ring_offsets, dtype=np.int64),
+        'polygon_rings': np.asarray(polygon_rings, dtype=np.int64),
+        'polygon_zone': np.asarray(polygon_zone, dtype=np.int64),
+    }
+    for column in ZONE_COLUMNS:
+        arrays[column] = np.asarray([getattr(shape, column) or '' for shape in shapes], dtype=str)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+    return {'zones': len(shapes), 'polygons': len(polygon_zone), 'vertices': len(coords)}
+
+
+# ============================================================================
+# R-TREE (Sort-Tile-Recursive)
+# ============================================================================
+
+def _str_order(boxes: np.ndarray, capacity: int) -> np.ndarray:
+    """
+    Ordine STR: strisce verticali per centro x, ogni striscia ordinata per
+    centro y; gruppi consecutivi di capacity elementi formano i nodi.
+    """
+    nodes = math.ceil(len(boxes) / capacity)
+    slab_size = capacity * math.ceil(math.sqrt(nodes))
+    center_x = boxes[:, 0] + boxes[:, 2]
+    center_y = boxes[:, 1] + boxes[:, 3]
+    by_x = np.argsort(center_x, kind='stable')
+    return np.concatenate([
+        slab[np.argsort(center_y[slab], kind='stable')]
+        for slab in (by_x[i:i + slab_size] for i in range(0, len(by_x), slab_size))
+    ])
+
+
+class STRtree:
+    """R-tree statico sui bounding box (minx, miny, maxx, maxy)"""
+    
+    def __init__(self, boxes: np.ndarray, capacity: int = NODE_CAPACITY):
+        self.capacity = capacity
+        # levels[0] = foglie; ogni livello: box ordinati e indice originale.
+        # Il nodo j di un livello copre le voci [j*capacity, (j+1)*capacity)
+        self.levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        while len(boxes):
+            order = _str_order(boxes, capacity)
+            ordered = boxes[order]
+            self.levels.append((ordered, order))
+            if len(boxes) <= capacity:
+                break
+            starts = np.arange(0, len(ordered), capacity)
+            boxes = np.column_stack([
+                np.minimum.reduceat(ordered[:, 0], starts),
+                np.minimum.reduceat(ordered[:, 1], starts),
+                np.maximum.reduceat(ordered[:, 2], starts),
+                np.maximum.reduceat(ordered[:, 3], starts),
+            ])
+    
+    def query_point(self, x: float, y: float) -> List[int]:
+        """Indici dei box che contengono il punto"""
+        if not self.levels:
+            return []
+        nodes = [0]
+        for ordered, order in reversed(self.levels):
+            found = []
+            for node in nodes:
+                lo = node * self.capacity
+                box = ordered[lo:lo + self.capacity]
+                hit = (box[:, 0] <= x) & (box[:, 2] >= x) & (box[:, 1] <= y) & (box[:, 3] >= y)
+                found.extend(order[lo:lo + self.capacity][hit].tolist())
+            nodes = found
+        return nodes
+
+
+# ============================================================================
+# LOCALIZZAZIONE
+# ============================================================================
+
+def point_in_ring(x: float, y: float, ring: np.ndarray) -> bool:
+    """Ray casting (numero di attraversamenti dispari = dentro)"""
+    xi, yi = ring[:, 0], ring[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    straddles = (yi > y) != (yj > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = (xj - xi) * (y - yi) / (yj - yi) + xi
+    return bool(np.count_nonzero(straddles & (x < crossing_x)) % 2)
+
+
+@dataclass(frozen=True)
+class ZoneMatch:
+    link_zona: str
+    zona_codice: str
+    fascia: str
+    comune_istat: str
+    comune: str
+    
+    def to_dict(self) -> Dict:
+        return {column: getattr(self, column) or None for column in ZONE_COLUMNS}
+
+
+class ZoneLocator:
+    """Perimetri OMI in memoria con indice spaziale"""
+    
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != GEOMETRY_VERSION:
+                raise ValueError(f"versione geometrie non supportata: {int(data['version'])}")
+            self.coords = data['coords']
+            self.ring_offsets = data['ring_offsets']
+            self.polygon_rings = data['polygon_rings']
+            self.polygon_zone = data['polygon_zone']
+            self.zones = {column: data[column] for column in ZONE_COLUMNS}
+        
+        # Bounding box di ogni poligono (anello esterno)
+        outer_start = self.ring_offsets[self.polygon_rings[:-1]]
+        outer_end = self.ring_offsets[self.polygon_rings[:-1] + 1]
+        boxes = np.array([
+            (*self.coords[start:end].min(axis=0), *self.coords[start:end].max(axis=0))
+            for start, end in zip(outer_start, outer_end)
+        ], dtype=np.float64).reshape(-1, 4)
+        self.tree = STRtree(boxes)
+    
+    def __len__(self) -> int:
+        return len(self.zones['link_zona'])
+    
+    def _ring(self, ring: int) -> np.ndarray:
+        return self.coords[self.ring_offsets[ring]:self.ring_offsets[ring + 1]]
+    
+    def _contains(self, polygon: int, x: float, y: float) -> bool:
+        first, last = self.polygon_rings[polygon], self.polygon_rings[polygon + 1]
+        if not point_in_ring(x, y, self._ring(first)):
+            return False
+        return not any(point_in_ring(x, y, self._ring(hole)) for hole in range(first + 1, last))
+    
+    def locate(self, latitude: float, longitude: float) -> Optional[ZoneMatch]:
+        """Zona OMI che contiene il punto (None se fuori da ogni perimetro)"""
+        for polygon in sorted(self.tree.query_point(longitude, latitude)):
+            if self._contains(polygon, longitude, latitude):
+                zone = int(self.polygon_zone[polygon])
+                return ZoneMatch(**{column: str(self.zones[column][zone]) for column in ZONE_COLUMNS})
+        return None
+
+
+# Locator aperti per file, ricaricati se il file cambia
+_locators: Dict[str, tuple] = {}
+_locators_lock = threading.Lock()
+
+
+def get_zone_locator(path: Optional[str] = None) -> Optional[ZoneLocator]:
+    """
+    Locator del file (default DEFAULT_GEOMETRY_FILE), caricato una sola
+    volta per processo; None se il file manca o non è leggibile.
+    """
+    path = os.path.abspath(path or DEFAULT_GEOMETRY_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    
+    with _locators_lock:
+        cached = _locators.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            locator = ZoneLocator(path)
+        except Exception as e:
+            logger.warning(f"Geometrie zone OMI in {path} non utilizzabili: {e}")
+            locator = None
+        _locators[path] = (mtime, locator)
+        return locator
@@ -0,0 +1,134 @@
+# app/tasks/apply_omi_changes.py
+"""
+Propagazione di un import OMI incrementale (import_omi_data.py --diff)
+
+Legge il report omi_quotation_changes del semestre e, solo per i comuni
+con quotazioni nuove/modificate/rimosse, ricalcola le metriche degli
+annunci e invalida le relative pagine in cache. Le valutazioni salvate
+delle zone modificate sono ricalcolate (refresh_property_valuations).
+
+    python -m app.tasks.apply_omi_changes [semestre]
+"""
+
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import LISTINGS_TAG, listing_cache, property_tag
+from app.core.database import SessionLocal
+from app.models.property import Property
+from app.services.listing_valuation import invalidate_zone_valuations
+from app.tasks.recompute_listing_metrics import recompute_listing_metrics
+from app.tasks.refresh_property_valuations import refresh_property_valuations
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OmiChangeReport:
+    """Riepilogo delle modifiche di un semestre"""
+    semestre: str
+    inserted: int = 0
+    changed: int = 0
+    removed: int = 0
+    comuni: Set[str] = field(default_factory=set)
+    zone: Dict[str, Set[Optional[str]]] = field(default_factory=dict)  # comune_istat -> zone
+    
+    @property
+    def total(self) -> int:
+        return self.inserted + self.changed + self.removed
+
+
+def current_semester(db: Session) -> Optional[str]:
+    """Semestre OMI attivo (omi_settings.semestre_omi_corrente)"""
+    return db.execute(text("""
+        SELECT valore FROM omi_settings
+        WHERE chiave = 'semestre_omi_corrente'
+    """)).scalar()
+
+
+def load_change_report(db: Session, semestre: str) -> OmiChangeReport:
+    """Aggrega omi_quotation_changes per tipo di modifica, comune e zona"""
+    report = OmiChangeReport(semestre=semestre)
+    rows = db.execute(text("""
+        SELECT comune_istat, comune_descrizione, zona_codice, change_type, COUNT(*)
+        FROM omi_quotation_changes
+        WHERE semestre = :semestre
+        GROUP BY comune_istat, comune_descrizione, zona_codice, change_type
+    """), {'semestre': semestre})
+    
+    for comune_istat, comune, zona_codice, change_type, count in rows:
+        setattr(report, change_type, getattr(report, change_type) + count)
+        if comune:
+            report.comuni.add(comune.strip().upper())
+        if comune_istat:
+            report.zone.setdefault(comune_istat, set()).add(zona_codice)
+    return report
+
+
+def apply_omi_changes(db: Session, report: OmiChangeReport) -> List[int]:
+    """
+    Ricalcola le metriche degli annunci nei comuni modificati e ne
+    invalida la cache (dettaglio + liste); forza il ricalcolo delle
+    valutazioni salvate delle zone modificate. Gli altri annunci non
+    vengono toccati.
+    
+    Returns:
+        Id degli annunci aggiornati
+    """
+    # Per codice ISTAT: anche gli annunci con il nome del comune scritto
+    # diversamente (risolto dall'indice comuni)
+    invalidate_zone_valuations(db, report.zone, report.comuni)
+    
+    property_ids = [
+        property_id for (property_id,) in db.query(Property.id)
+        .filter(func.upper(Property.city).in_(report.comuni))
+    ] if report.comuni else []
+    if not property_ids:
+        db.commit()
+        return []
+    
+    recompute_listing_metrics(db, cities=report.comuni)
+    listing_cache.invalidate_tags(LISTINGS_TAG, *(property_tag(i) for i in property_ids))
+    return property_ids
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    argv = sys.argv[1:] if argv is None else argv
+    
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        semestre = argv[0] if argv else current_semester(db)
+        report = load_change_report(db, semestre)
+        logger.info(
+            f"📋 Semestre {semestre}: {report.inserted:,} nuove, {report.changed:,} "
+            f"modificate, {report.removed:,} rimosse in {len(report.comuni):,} comuni"
+        )
+        
+        updated = apply_omi_changes(db, report)
+        valuations = refresh_property_valuations(db)
+        logger.info(
+            f"✅ Metriche ricalcolate per {len(updated):,} annunci, "
+            f"{valuations.recomputed:,} valutazioni ricalcolate "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return 0
+    except Exception as e:
+        logger.error(f"❌ Errore propagazione modifiche OMI: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
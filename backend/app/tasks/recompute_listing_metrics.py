@@ -0,0 +1,119 @@
+# app/tasks/recompute_listing_metrics.py
+"""
+Job di ricalcolo massivo delle metriche derivate degli annunci
+(discount_pct, price_per_sqm, omi_price_sqm, deal_score) e delle
+distribuzioni per zona del deal score (zone_deal_digests).
+
+Da eseguire dopo un import OMI o un cambio del tasso legale:
+    python -m app.tasks.recompute_listing_metrics
+"""
+
+import logging
+import sys
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.property import Property
+from app.services.deal_distribution import rebuild_deal_digests
+from app.services.listing_metrics import compute_listing_metrics
+from app.services.valuation_service import get_valuation_service
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def recompute_listing_metrics(
+    db: Session,
+    batch_size: int = BATCH_SIZE,
+    cities: Optional[Iterable[str]] = None
+) -> int:
+    """
+    Ricalcola le metriche degli annunci con UPDATE in batch
+    
+    Il tasso legale è letto una volta e la quotazione OMI una volta
+    per comune, indipendentemente dal numero di annunci.
+    
+    Args:
+        cities: Limita il ricalcolo a questi comuni (default: tutti)
+    
+    Returns:
+        Numero di annunci aggiornati
+    """
+    service = get_valuation_service()
+    legal_rate = service.get_legal_rate()
+    omi_by_city: Dict[str, Optional[float]] = {}
+    
+    rows = db.query(
+        Property.id,
+        Property.bare_property_value,
+        Property.full_property_value,
+        Property.surface_sqm,
+        Property.usufructuary_age,
+        Property.city
+    )
+    if cities is not None:
+        rows = rows.filter(func.upper(Property.city).in_({c.strip().upper() for c in cities}))
+    rows = rows.all()
+    
+    batch = []
+    updated = 0
+    for row in rows:
+        city_key = (row.city or '').strip().upper()
+        if city_key and city_key not in omi_by_city:
+            omi_by_city[city_key] = service.get_omi_city_reference(city_key)
+        
+        metrics = compute_listing_metrics(
+            bare_property_value=row.bare_property_value,
+            full_property_value=row.full_property_value,
+            surface_sqm=row.surface_sqm,
+            usufructuary_age=row.usufructuary_age,
+            omi_price_sqm=omi_by_city.get(city_key),
+            legal_rate=legal_rate
+        )
+        batch.append({'id': row.id, **metrics})
+        
+        if len(batch) >= batch_size:
+            db.execute(update(Property), batch)
+            updated += len(batch)
+            batch = []
+    
+    if batch:
+        db.execute(update(Property), batch)
+        updated += len(batch)
+    
+    # Gli UPDATE in batch non passano dagli event listener dei digest
+    rebuild_deal_digests(db, cities)
+    
+    db.commit()
+    return updated
+
+
+def main() -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        updated = recompute_listing_metrics(db)
+        logger.info(
+            f"✅ Metriche ricalcolate per {updated:,} annunci "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return 0
+    except Exception as e:
+        logger.error(f"❌ Errore ricalcolo metriche: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# app/tasks/refresh_property_valuations.py
+"""
+Ricalcolo incrementale delle valutazioni salvate degli annunci
+(property_valuations, vedi app/services/listing_valuation.py).
+
+Solo gli annunci con valutazione mancante o dipendenze cambiate vengono
+letti; tra questi, quelli con impronta degli input invariata non sono
+ricalcolati. Da eseguire dopo import OMI, cambio del tasso legale o
+periodicamente per le modifiche agli annunci:
+    python -m app.tasks.refresh_property_valuations [--all]
+
+Dopo un import --diff le zone modificate sono già invalidate da
+apply_omi_changes; dopo un import completo --all ricalcola tutto.
+"""
+
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.services.listing_valuation import (
+    advance_valuation_semester, invalidate_all_valuations, pending_valuations, refresh_listing_valuation
+)
+from app.services.valuation_service import ValuationService, get_valuation_service
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+@dataclass
+class ValuationRefreshStats:
+    """Esito di un refresh"""
+    checked: int = 0
+    recomputed: int = 0
+    advanced: int = 0  # righe valide portate al semestre corrente
+    
+    @property
+    def unchanged(self) -> int:
+        return self.checked - self.recomputed
+
+
+def refresh_property_valuations(
+    db: Session,
+    batch_size: int = BATCH_SIZE,
+    service: Optional[ValuationService] = None
+) -> ValuationRefreshStats:
+    """
+    Ricalcola le valutazioni con dipendenze cambiate (commit per batch)
+    
+    Semestre e tasso legale sono letti una volta per tutto il job. Le
+    righe rimaste valide sono portate al semestre corrente.
+    """
+    service = service or get_valuation_service()
+    semestre, legal_rate = service.get_reference_data()
+    stats = ValuationRefreshStats()
+    
+    rows = pending_valuations(db, legal_rate).all()
+    for property, valuation in rows:
+        stats.checked += 1
+        if refresh_listing_valuation(db, service, property, valuation, semestre, legal_rate):
+            stats.recomputed += 1
+        if stats.checked % batch_size == 0:
+            db.commit()
+    
+    stats.advanced = advance_valuation_semester(db, semestre)
+    db.commit()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    argv = sys.argv[1:] if argv is None else argv
+    
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        if '--all' in argv:
+            invalidated = invalidate_all_valuations(db)
+            logger.info(f"♻️  {invalidated:,} valutazioni da ricalcolare (import completo)")
+        stats = refresh_property_valuations(db)
+        logger.info(
+            f"✅ Valutazioni verificate per {stats.checked:,} annunci, "
+            f"{stats.recomputed:,} ricalcolate, {stats.advanced:,} portate al semestre "
+            f"corrente in {time.perf_counter() - start:.1f}s"
+        )
+        return 0
+    except Exception as e:
+        logger.error(f"❌ Errore ricalcolo valutazioni: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmark Import OMI: COPY FROM STDIN vs DataFrame.to_sql(method='multi')
+
+Genera file CSV sintetici con la stessa forma dei file OMI reali
+(~157k quotazioni, ~27k zone) e misura il caricamento con entrambi i
+loader su tabelle temporanee di benchmark (create e poi eliminate).
+
+Con --parse-only misura solo lettura + pulizia del CSV (nessun
+database richiesto), con tempo e picco memoria per reader.
+
+Con --pipeline misura il throughput della pipeline di ingest (lettura
+blocchi -> parse + pulizia + serializzazione COPY) al variare dei worker,
+senza database: 0 worker = tutto in sequenza.
+
+Usage:
+    python benchmark_omi_import.py
+    python benchmark_omi_import.py --rows 50000 --loaders copy
+    python benchmark_omi_import.py --parse-only --readers pandas pyarrow
+    python benchmark_omi_import.py --pipeline --workers 0 1 4
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from functools import partial
+
+from sqlalchemy import create_engine, text
+
+import import_omi_data as omi
+from app.core.pipeline import (
+    Stage, default_workers, iter_file_blocks, log_pipeline, run_pipeline, run_sequential
+)
+
+logger = logging.getLogger(__name__)
+
+VALORI_HEADER = [
+    'Area_territoriale', 'Regione', 'Prov', 'Comune_ISTAT', 'Comune_cat', 'Sez',
+    'Comune_amm', 'Comune_descrizione', 'Fascia', 'Zona', 'LinkZona', 'Cod_Tip',
+    'Descr_Tipologia', 'Stato', 'Stato_prev', 'Compr_min', 'Compr_max',
+    'Sup_NL_compr', 'Loc_min', 'Loc_max', 'Sup_NL_loc',
+]
+
+ZONE_HEADER = [
+    'Area_territoriale', 'Regione', 'Prov', 'Comune_ISTAT', 'Comune_cat', 'Sez',
+    'Comune_amm', 'Comune_descrizione', 'Fascia', 'Zona_Descr', 'Zona', 'LinkZona',
+    'Cod_tip_prev', 'Descr_tip_prev', 'Stato_prev', 'Microzona',
+]
+
+TIPOLOGIE = [
+    ('20', 'Abitazioni civili'),
+    ('21', 'Abitazioni di tipo economico'),
+    ('1', 'Ville e Villini'),
+    ('13', 'Box'),
+    ('5', 'Negozi'),
+    ('6', 'Uffici'),
+]
+
+STATI = ['NORMALE', 'OTTIMO', 'SCADENTE']
+
+
+def _euro(value):
+    """Formato OMI: virgola decimale"""
+    return f"{value:.1f}".replace('.', ',')
+
+
+def write_synthetic_omi_files(directory, quotations=157593, zones=26991, seed=0):
+    """
+    Scrive in directory i file ZONE e VALORI sintetici (stessi nomi dei
+    file reali, così gli import li trovano senza modifiche).
+    
+    Returns:
+        (path zone, path valori)
+    """
+    rng = random.Random(seed)
+    zone_rows = []
+    for z in range(zones):
+        comune = z // 8
+        fascia = 'BCDER'[z % 5]
+        zone_rows.append({
+            'Area_territoriale': 'CENTRO',
+            'Regione': 'ABRUZZO',
+            'Prov': 'PE',
+            'Comune_ISTAT': f"{68000 + comune:06d}",
+            'Comune_cat': f"G{comune:03d}",
+            'Sez': '',
+            'Comune_amm': f"G{comune:03d}",
+            'Comune_descrizione': f"COMUNE {comune}",
+            'Fascia': fascia,
+            'Zona_Descr': f"'ZONA {z} DI TEST'",
+            'Zona': f"{fascia}{z % 8 + 1}",
+            'LinkZona': f"PE{z:08d}",
+            'Cod_tip_prev': '20',
+            'Descr_tip_prev': 'Abitazioni civili',
+            'Stato_prev': 'N',
+            'Microzona': str(z % 3),
+        })
+    
+    zone_path = os.path.join(directory, omi.OMI_ZONE_FILE)
+    with open(zone_path, 'w', encoding='utf-8') as f:
+        f.write("Zone OMI sintetiche per benchmark;\n")
+        f.write(';'.join(ZONE_HEADER) + ';\n')
+        for row in zone_rows:
+            f.write(';'.join(row[c] for c in ZONE_HEADER) + ';\n')
+    
+    valori_path = os.path.join(directory, omi.OMI_VALORI_FILE)
+    with open(valori_path, 'w', encoding='utf-8') as f:
+        f.write("Quotazioni OMI sintetiche per benchmark;\n")
+        f.write(';'.join(VALORI_HEADER) + ';\n')
+        for i in range(quotations):
+            zone = zone_rows[(i // (len(TIPOLOGIE) * len(STATI))) % zones]
+            cod_tip, descr_tip = TIPOLOGIE[(i // len(STATI)) % len(TIPOLOGIE)]
+            stato = STATI[i % len(STATI)]
+            prezzo_min = rng.uniform(500, 4000)
+            loc_min = prezzo_min / 250
+            values = {
+                **zone,
+                'Cod_Tip': cod_tip,
+                'Descr_Tipologia': descr_tip,
+                'Stato': stato,
+                'Compr_min': _euro(prezzo_min),
+                'Compr_max': _euro(prezzo_min * rng.uniform(1.1, 1.6)),
+                'Sup_NL_compr': 'L',
+                'Loc_min': _euro(loc_min),
+                'Loc_max': _euro(loc_min * rng.uniform(1.1, 1.5)),
+                'Sup_NL_loc': 'L',
+            }
+            f.write(';'.join(values[c] for c in VALORI_HEADER) + ';\n')
+    
+    return zone_path, valori_path
+
+
+def run_parse_benchmark(data_dir, readers, rows):
+    """Lettura + pulizia del file VALORI per ogni reader, senza database"""
+    valori_file = os.path.join(data_dir, omi.OMI_VALORI_FILE)
+    results = {}
+    
+    for reader in readers:
+        tracemalloc.start()
+        start = time.perf_counter()
+        parsed = 0
+        with open(valori_file, 'rb') as handle:
+            for chunk in omi.read_omi_csv(
+                handle, list(omi.VALORI_COLUMNS), reader=reader, chunksize=omi.CHUNK_SIZE
+            ):
+                parsed += len(omi.clean_quotations(chunk))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        results[reader] = {'seconds': elapsed, 'rows': parsed, 'peak_bytes': peak}
+        logger.info(
+            f"  {reader:<8} {elapsed:8.2f}s  {parsed / elapsed:>10,.0f} righe/s  "
+            f"picco {peak / 2**20:,.0f} MB"
+        )
+    
+    return results
+
+
+def run_pipeline_benchmark(data_dir, workers_options, rows):
+    """Throughput della pipeline di ingest per numero di worker, senza database"""
+    valori_file = os.path.join(data_dir, omi.OMI_VALORI_FILE)
+    results = {}
+    
+    for workers in workers_options:
+        parsed = []
+        stages = [
+            Stage(
+                "parse + pulizia + CSV",
+                partial(omi.prepare_omi_block, kind='quotazioni'),
+                workers=max(workers, 1),
+                processes=workers > 1
+            ),
+            Stage("sink", lambda prepared: parsed.append(prepared[0])),
+        ]
+        with open(valori_file, 'rb') as handle:
+            blocks = iter_file_blocks(handle, header_lines=omi.OMI_HEADER_LINES)
+            run = run_pipeline if workers else run_sequential
+            result = run(blocks, stages, source_name="lettura blocchi")
+        
+        results[workers] = {'seconds': result.seconds, 'rows': sum(parsed)}
+        logger.info(f"  workers={workers}:")
+        log_pipeline(result, rows=sum(parsed))
+    
+    baseline = results.get(0)
+    if baseline:
+        for workers, result in results.items():
+            if workers and result['seconds']:
+                logger.info(f"  {workers} worker: {baseline['seconds'] / result['seconds']:.1f}x vs sequenziale")
+    
+    return results
+
+
+def run_benchmark(engine, data_dir, loaders, rows, reader='pandas', workers=None):
+    """Import del file sintetico con ogni loader su una tabella di benchmark"""
+    results = {}
+    
+    for loader in loaders:
+        table = f"bench_omi_quotations_{loader}"
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            conn.execute(text(
+                f"CREATE TABLE {table} (LIKE omi_quotations INCLUDING DEFAULTS)"
+            ))
+        
+        omi.STAGE_TIMINGS.clear()
+        start = time.perf_counter()
+        imported, _ = omi.import_quotazioni_omi(
+            engine, data_dir, loader=loader, table=table, reader=reader, workers=workers
+        )
+        elapsed = time.perf_counter() - start
+        
+        results[loader] = {
+            'seconds': elapsed,
+            'rows': imported,
+            'rows_per_second': imported / elapsed if elapsed else 0,
+            'stages': dict(omi.STAGE_TIMINGS),
+        }
+        
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    
+    logger.info("=" * 80)
+    logger.info(f"📊 RISULTATI BENCHMARK ({rows:,} righe sintetiche)")
+    logger.info("=" * 80)
+    for loader, result in results.items():
+        logger.info(
+            f"  {loader:<8} {result['seconds']:8.2f}s  "
+            f"{result['rows_per_second']:>10,.0f} righe/s"
+        )
+        for stage, seconds in result['stages'].items():
+            logger.info(f"      {stage:<40} {seconds:8.2f}s")
+    
+    if 'copy' in results and 'to_sql' in results and results['copy']['seconds']:
+        speedup = results['to_sql']['seconds'] / results['copy']['seconds']
+        logger.info(f"\n🚀 COPY è {speedup:.1f}x più veloce di to_sql")
+    
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loader import OMI")
+    parser.add_argument('--rows', type=int, default=157593, help="Quotazioni sintetiche")
+    parser.add_argument('--loaders', nargs='+', choices=omi.LOADERS, default=list(omi.LOADERS))
+    parser.add_argument('--readers', nargs='+', choices=omi.READERS, default=['pandas'])
+    parser.add_argument('--parse-only', action='store_true', help="Solo lettura + pulizia CSV")
+    parser.add_argument('--pipeline', action='store_true', help="Throughput pipeline per numero di worker")
+    parser.add_argument('--workers', nargs='+', type=int, default=None,
+                        help="Worker di parse (con --pipeline: valori da confrontare)")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as data_dir:
+        logger.info(f"🧪 Generazione file sintetico ({args.rows:,} righe)...")
+        write_synthetic_omi_files(data_dir, quotations=args.rows)
+        
+        if args.parse_only:
+            run_parse_benchmark(data_dir, args.readers, args.rows)
+            return 0
+        
+        if args.pipeline:
+            run_pipeline_benchmark(data_dir, args.workers or [0, 1, default_workers()], args.rows)
+            return 0
+        
+        engine = create_engine(omi.DATABASE_URL, echo=False)
+        workers = args.workers[0] if args.workers else None
+        for reader in args.readers:
+            run_benchmark(engine, data_dir, args.loaders, args.rows, reader=reader, workers=workers)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
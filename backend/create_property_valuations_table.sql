@@ -0,0 +1,37 @@
+-- ============================================================
+-- MIGRAZIONE: Valutazioni salvate degli annunci
+-- Mia Per Sempre - stima del motore di valutazione per ogni annuncio,
+-- ricalcolata solo quando cambiano i suoi input
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS property_valuations (
+    property_id INTEGER PRIMARY KEY
+        REFERENCES properties(id) ON DELETE CASCADE,
+    
+    -- Impronta degli input (annuncio + semestre OMI + tasso legale);
+    -- NULL = ricalcolo forzato (quotazioni OMI della zona modificate)
+    input_hash VARCHAR(64),
+    stale BOOLEAN NOT NULL DEFAULT FALSE,  -- campi dell'annuncio modificati
+    
+    -- Dipendenze (chiavi del tracker)
+    comune VARCHAR(100) NOT NULL,          -- nome OMI ufficiale (maiuscolo se non risolto)
+    comune_istat VARCHAR(6),               -- NULL = comune non risolto
+    zona_codice VARCHAR(10),               -- zona OMI usata (NULL = nessuna quotazione)
+    semestre VARCHAR(10),
+    legal_rate FLOAT NOT NULL,
+    
+    -- Risultato
+    full_value FLOAT,                      -- stima piena proprietà (€)
+    bare_value FLOAT,                      -- nuda proprietà fiscale (€)
+    bare_value_actuarial FLOAT,            -- nuda proprietà attuariale (€)
+    deal_discount_pct FLOAT,               -- prezzo richiesto vs stima (%)
+    result JSON,                           -- valutazione completa
+    error TEXT,
+    
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_property_valuations_zone ON property_valuations(comune_istat, zona_codice);
+CREATE INDEX IF NOT EXISTS ix_property_valuations_stale ON property_valuations(stale) WHERE stale;
+
+-- Primo calcolo: python -m app.tasks.refresh_property_valuations
@@ -0,0 +1,17 @@
+-- ============================================================
+-- MIGRAZIONE: Distribuzione deal score per zona OMI
+-- Mia Per Sempre - percentile dell'annuncio nella zona in O(1)
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS zone_deal_digests (
+    zone_key VARCHAR(120) PRIMARY KEY,     -- link_zona OMI, o comune:<NOME>
+    comune VARCHAR(100) NOT NULL,          -- maiuscolo
+    count INTEGER NOT NULL DEFAULT 0,
+    digest JSON NOT NULL,                  -- t-digest (centroidi, min, max)
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_zone_deal_digests_comune ON zone_deal_digests(comune);
+
+-- Backfill (i successivi aggiornamenti sono applicativi):
+--   python -m app.tasks.recompute_listing_metrics
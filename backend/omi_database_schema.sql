@@ -112,6 +112,90 @@ CREATE INDEX idx_omi_quot_lookup ON omi_quotations(
 );
 CREATE INDEX idx_omi_quot_prezzi ON omi_quotations(prezzo_min, prezzo_max);
 
+-- Lookup valutazione (UPPER(comune) + tipologia + stato + fascia, ordinato per zona).
+-- Gestito anche dall'import (TABLE_INDEXES in import_omi_data.py)
+CREATE INDEX idx_omi_quot_comune_upper ON omi_quotations(
+    UPPER(comune_descrizione),
+    cod_tipologia,
+    stato,
+    fascia,
+    zona_codice
+);
+
+-- Stesso lookup per codice ISTAT (comune risolto dall'indice comuni del servizio)
+CREATE INDEX idx_omi_quot_istat ON omi_quotations(
+    comune_istat,
+    cod_tipologia,
+    stato,
+    fascia,
+    zona_codice
+);
+
+-- ============================================================================
+
+-- Tabella: Report Modifiche Import Incrementale
+-- Scritta da import_omi_data.py --diff (una riga per quotazione nuova,
+-- modificata o rimossa), letta da app/tasks/apply_omi_changes.py per
+-- aggiornare annunci e cache solo dei comuni toccati
+CREATE TABLE IF NOT EXISTS omi_quotation_changes (
+    id SERIAL PRIMARY KEY,
+    semestre VARCHAR(10) NOT NULL,
+    change_type VARCHAR(10) NOT NULL,  -- inserted, changed, removed
+    comune_istat VARCHAR(10),
+    zona_codice VARCHAR(10),
+    cod_tipologia INTEGER,
+    stato VARCHAR(10),
+    comune_descrizione VARCHAR(100),
+    old_prezzo_min DECIMAL(10,2),
+    old_prezzo_max DECIMAL(10,2),
+    new_prezzo_min DECIMAL(10,2),
+    new_prezzo_max DECIMAL(10,2),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_omi_changes_semestre ON omi_quotation_changes(semestre, comune_descrizione);
+
+-- ============================================================================
+
+-- Tabella: Storico Quotazioni per Semestre
+-- omi_quotations contiene solo il semestre corrente; qui una riga per
+-- (semestre, quotazione), scritta dall'import dopo ogni swap/diff.
+-- Usata per i trend di zona e le valutazioni "as of" un semestre.
+CREATE TABLE IF NOT EXISTS omi_quotation_history (
+    id BIGSERIAL PRIMARY KEY,
+    semestre VARCHAR(10) NOT NULL,
+    comune_istat VARCHAR(10),
+    comune_descrizione VARCHAR(100) NOT NULL,
+    provincia VARCHAR(2),
+    fascia VARCHAR(1) NOT NULL,
+    zona_codice VARCHAR(10) NOT NULL,
+    link_zona VARCHAR(20),
+    cod_tipologia INTEGER NOT NULL,
+    stato VARCHAR(10) NOT NULL,
+    prezzo_min DECIMAL(10,2),
+    prezzo_max DECIMAL(10,2),
+    locazione_min DECIMAL(10,2),
+    locazione_max DECIMAL(10,2),
+    
+    CONSTRAINT unique_quotation_history UNIQUE (
+        semestre,
+        comune_istat,
+        zona_codice,
+        cod_tipologia,
+        stato
+    )
+);
+
+-- Trend di una zona = un solo range scan: colonne in uguaglianza prima,
+-- semestre per ultimo; INCLUDE permette index-only scan sui prezzi
+CREATE INDEX idx_omi_history_trend ON omi_quotation_history(
+    UPPER(comune_descrizione),
+    zona_codice,
+    cod_tipologia,
+    stato,
+    semestre
+) INCLUDE (fascia, prezzo_min, prezzo_max);
+
 -- ============================================================================
 
 -- Tabella: Tipologie Immobiliari (Lookup)
@@ -167,6 +251,17 @@ ON CONFLICT (chiave) DO UPDATE SET
     valore = EXCLUDED.valore,
     updated_at = NOW();
 
+-- Primo popolamento dello storico con il semestre già caricato
+INSERT INTO omi_quotation_history (
+    semestre, comune_istat, comune_descrizione, provincia, fascia, zona_codice,
+    link_zona, cod_tipologia, stato, prezzo_min, prezzo_max, locazione_min, locazione_max
+)
+SELECT
+    semestre, comune_istat, comune_descrizione, provincia, fascia, zona_codice,
+    link_zona, cod_tipologia, stato, prezzo_min, prezzo_max, locazione_min, locazione_max
+FROM omi_quotations
+ON CONFLICT DO NOTHING;
+
 -- ============================================================================
 
 -- View: Quotazioni con Join Tipologia
@@ -257,6 +352,8 @@ STRUTTURA DATI:
 - omi_quotations: 157.593 record (quotazioni per zona/tipologia)
 - omi_property_types: ~100 record (tipologie immobiliari)
 - omi_settings: parametri sistema (tasso legale, etc)
+- omi_quotation_history: storico quotazioni per semestre (trend, valutazioni "as of")
+- omi_quotation_changes: report modifiche degli import incrementali
 
 RELAZIONI:
 - omi_quotations.link_zona → omi_zones.link_zona (logica, non FK per performance)
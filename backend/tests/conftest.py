@@ -0,0 +1,157 @@
+"""
+Fixture comuni per i test API (database SQLite in memoria)
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.deps import get_db, get_current_active_user
+from app.api.endpoints import valuation
+from app.core.cache import listing_cache
+from app.core.database import Base
+from app.main import app
+from app.models import User, Property, PropertyImage, PropertyStatus, PropertyType
+from app.services import comuni_index
+from app.services.valuation_cache import valuation_cache
+from app.services.valuation_service import ValuationService
+
+OMI_QUOTATION_COLUMNS = """
+    comune_istat TEXT, comune_descrizione TEXT, fascia TEXT, zona_codice TEXT, link_zona TEXT,
+    cod_tipologia TEXT, stato TEXT, prezzo_min REAL, prezzo_max REAL
+"""
+
+# comune_istat, comune, fascia, zona, link_zona, tipologia, stato, prezzo_min, prezzo_max
+PESCARA_B1 = ('068028', 'PESCARA', 'B', 'B1', 'PE1', '20', 'NORMALE', 1800, 2200)
+
+
+@pytest.fixture(autouse=True)
+def clear_valuation_cache():
+    """Ogni test parte senza valutazioni in cache (chiavi uguali tra database diversi)"""
+    valuation_cache.clear()
+    yield
+    valuation_cache.clear()
+
+
+@pytest.fixture
+def db_session():
+    """Sessione su database SQLite in memoria con tutte le tabelle"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    session = TestingSession()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def insert_rows(conn, table: str, rows) -> None:
+    """Inserisce righe posizionali in una tabella"""
+    for row in rows:
+        placeholders = ", ".join(f":p{i}" for i in range(len(row)))
+        conn.execute(text(f"INSERT INTO {table} VALUES ({placeholders})"),
+                     {f"p{i}": value for i, value in enumerate(row)})
+
+
+@pytest.fixture
+def omi_options():
+    """
+    Contenuto del database OMI di omi_service (ridefinibile nei moduli di test)
+    
+    Chiavi opzionali:
+        quotations: righe di omi_quotations (default: solo PESCARA_B1)
+        zones: righe di omi_zones (comune_istat, comune_descrizione, provincia, regione)
+        history: righe di omi_quotation_history (semestre + colonne di omi_quotations)
+        semestre: semestre corrente in omi_settings (None = tabella assente)
+    """
+    return {}
+
+
+@pytest.fixture
+def omi_service(omi_options, tmp_path, monkeypatch):
+    """ValuationService su SQLite con le tabelle OMI di omi_options, usato dagli endpoint"""
+    service = ValuationService(database_url=f"sqlite:///{tmp_path}/omi.db",
+                               snapshot_dir=str(tmp_path / "no-snapshot"))
+    with service.engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE omi_quotations ({OMI_QUOTATION_COLUMNS})"))
+        insert_rows(conn, 'omi_quotations', omi_options.get('quotations', [PESCARA_B1]))
+        if 'zones' in omi_options:
+            conn.execute(text(
+                "CREATE TABLE omi_zones (comune_istat TEXT, comune_descrizione TEXT, provincia TEXT, regione TEXT)"
+            ))
+            insert_rows(conn, 'omi_zones', omi_options['zones'])
+        if 'history' in omi_options:
+            conn.execute(text(f"CREATE TABLE omi_quotation_history (semestre TEXT, {OMI_QUOTATION_COLUMNS})"))
+            insert_rows(conn, 'omi_quotation_history', omi_options['history'])
+        if omi_options.get('semestre'):
+            conn.execute(text("CREATE TABLE omi_settings (chiave TEXT, valore TEXT)"))
+            insert_rows(conn, 'omi_settings', [('semestre_omi_corrente', omi_options['semestre'])])
+    monkeypatch.setattr(valuation, 'get_valuation_service', lambda: service)
+    # Il dizionario dei comuni è per processo: non deve sopravvivere al database del test
+    comuni_index.reset_comuni_index()
+    yield service
+    comuni_index.reset_comuni_index()
+    service.engine.dispose()
+
+
+@pytest.fixture
+def owner(db_session):
+    """Utente proprietario di test"""
+    user = User(email="owner@example.com", password_hash="x", first_name="Test")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture
+def client(db_session, owner):
+    """TestClient con database di test e utente autenticato"""
+    def override_get_db():
+        yield db_session
+    
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_active_user] = lambda: owner
+    listing_cache.clear()
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        listing_cache.clear()
+
+
+def make_property(db, owner, images: int = 0, **fields) -> Property:
+    """Crea un immobile pubblicato (con immagini opzionali)"""
+    data = {
+        "title": "Appartamento luminoso in centro",
+        "property_type": PropertyType.APPARTAMENTO,
+        "status": PropertyStatus.PUBLISHED,
+        "city": "Pescara",
+        "province": "PE",
+        "region": "Abruzzo",
+        "surface_sqm": 100,
+        "rooms": 4,
+        "usufructuary_age": 78,
+        "full_property_value": 200000,
+        "bare_property_value": 130000,
+    }
+    data.update(fields)
+    prop = Property(owner_id=owner.id, **data)
+    for i in range(images):
+        prop.images.append(PropertyImage(
+            thumbnail_path=f"img_{i}_thumbnail.webp",
+            medium_path=f"img_{i}_medium.webp",
+            large_path=f"img_{i}_large.webp",
+            display_order=i,
+            is_cover=1 if i == 0 else 0
+        ))
+    db.add(prop)
+    db.commit()
+    return prop
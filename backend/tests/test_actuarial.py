@@ -0,0 +1,95 @@
+"""
+Valore attuariale: tavole di mortalità, fattori vettoriali, griglia età × tasso
+"""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.actuarial import (
+    actuarial_valuation, bare_ownership_factors, get_life_table, load_life_table
+)
+from app.services.valuation_service import PropertyData
+
+
+def expected_factor(qx, age, rate):
+    """Somma esplicita anno per anno (riferimento non vettoriale)"""
+    alive, total = 1.0, 0.0
+    for t, q in enumerate(qx[age:]):
+        total += alive * q / (1 + rate) ** (t + 0.5)
+        alive *= 1 - q
+    return total
+
+
+def test_bundled_table_matches_istat_life_expectancy():
+    table = get_life_table()
+    
+    assert table.max_age == 110
+    assert table.life_expectancy['M'][[0, 65]] == pytest.approx([81.1, 19.8], abs=0.05)
+    assert table.life_expectancy['F'][[0, 65]] == pytest.approx([85.2, 22.6], abs=0.05)
+    assert np.allclose(table.deaths['U'].sum(axis=1), 1.0)
+
+
+def test_factors_match_year_by_year_sum():
+    table = get_life_table()
+    ages, rates = [40, 65, 78, 92, 110], [0.0, 0.025, 0.05]
+    
+    factors = bare_ownership_factors(table, ages, rates, 'F')
+    
+    assert factors.shape == (5, 3)
+    for i, age in enumerate(ages):
+        for j, rate in enumerate(rates):
+            assert factors[i, j] == pytest.approx(expected_factor(table.qx['F'], age, rate))
+    assert np.allclose(factors[:, 0], 1.0)
+    # Più anziano -> più nuda; tasso più alto -> meno nuda
+    assert np.all(np.diff(factors[:, 1]) > 0)
+    assert np.all(np.diff(factors, axis=1) < 0)
+
+
+def test_valuation_by_sex(tmp_path):
+    table = get_life_table()
+    male = actuarial_valuation(table, 300000, 78, 'M', 0.03)
+    female = actuarial_valuation(table, 300000, 78, 'femmina', 0.03)
+    
+    assert male['valore_nuda_proprieta'] + male['valore_usufrutto'] == pytest.approx(300000)
+    assert female['sesso'] == 'F'
+    assert female['speranza_vita'] > male['speranza_vita']
+    assert female['valore_nuda_proprieta'] < male['valore_nuda_proprieta']
+    
+    path = tmp_path / "tavola.csv"
+    path.write_text("# commento\neta,qx_maschi,qx_femmine\n0,0.1,0.1\n2,0.5,0.5\n")
+    with pytest.raises(ValueError):
+        load_life_table(str(path))
+    assert get_life_table(str(path)) is None
+
+
+def test_complete_valuation_includes_actuarial_value(omi_service):
+    result = omi_service.calculate_complete_valuation(PropertyData(
+        comune='PESCARA', surface_sqm=100, usufructuary_age=78, usufructuary_sex='M', discount_rate=0.025
+    ))
+    
+    actuarial = result['valore_attuariale']
+    assert actuarial['tasso_sconto'] == 0.025
+    assert actuarial['valore_nuda_proprieta'] == pytest.approx(
+        200000 * expected_factor(get_life_table().qx['M'], 78, 0.025)
+    )
+    assert "Nuda Proprietà Attuariale" in omi_service.format_valuation_report(result)
+
+
+def test_grid_endpoint(omi_service):
+    client = TestClient(app)
+    
+    response = client.get("/api/v1/valuation/actuarial", params={
+        'eta_min': 60, 'eta_max': 90, 'tassi': [0.02, 0.04], 'sesso': 'F'
+    })
+    assert response.status_code == 200
+    grid = response.json()
+    assert grid['eta'] == list(range(60, 91))
+    assert np.shape(grid['percentuale_nuda']) == (31, 2)
+    assert grid['percentuale_nuda'][18][0] == pytest.approx(
+        100 * expected_factor(get_life_table().qx['F'], 78, 0.02), abs=0.01
+    )
+    
+    assert client.get("/api/v1/valuation/actuarial", params={'eta_min': 90, 'eta_max': 60}).status_code == 400
+    assert client.get("/api/v1/valuation/actuarial", params={'tassi': [0.5]}).status_code == 400
+    assert client.get("/api/v1/valuation/actuarial", params={'sesso': 'X'}).status_code == 422
@@ -0,0 +1,119 @@
+"""
+Stima per comparabili: ricerca dei vicini, confidenza, combinazione con OMI
+"""
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models import PropertyStatus, User
+from app.services import comparables
+from app.services.comparables import (
+    Comparable, ComparablesIndex, ENERGY_RANK, combine_comparables, feature_vectors, load_listings
+)
+from app.services.listing_valuation import listing_property_data
+from app.services.valuation_service import PropertyData, ValuationService
+from tests.conftest import make_property
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(3)
+    n = 20000
+    columns = dict(
+        ids=np.arange(n),
+        latitude=rng.normal(42.46, 0.05, n),
+        longitude=rng.normal(14.21, 0.05, n),
+        surface_sqm=rng.uniform(40, 200, n),
+        rooms=rng.integers(1, 7, n),
+        energy_rank=rng.integers(0, 11, n),
+        price_sqm=rng.uniform(1000, 4000, n),
+    )
+    index = ComparablesIndex(**columns)
+    
+    found = index.query(42.46, 14.21, 90, rooms=3, energy_class='C', k=10, exclude_ids=[0])
+    
+    features = feature_vectors(*(columns[c] for c in ('latitude', 'longitude', 'surface_sqm', 'rooms', 'energy_rank')))
+    point = feature_vectors(42.46, 14.21, 90, 3, ENERGY_RANK['c'])[0]
+    distances = np.sqrt(((features - point) ** 2).sum(axis=1))
+    expected = [i for i in np.argsort(distances) if i != 0][:10]
+    assert [c.property_id for c in found] == expected
+    assert [c.distance for c in found] == sorted(c.distance for c in found)
+
+
+def test_confidence_reflects_agreement_and_distance():
+    close = [Comparable(i, 0.5, 2000 + i) for i in range(10)]
+    scattered = [Comparable(i, 0.5, 1000 + 400 * i) for i in range(10)]
+    far = [Comparable(i, 4.0, 2000 + i) for i in range(10)]
+    
+    estimate = combine_comparables(close)
+    assert estimate['prezzo_mq'] == pytest.approx(2004.5)
+    assert estimate['confidenza'] > combine_comparables(scattered)['confidenza']
+    assert estimate['confidenza'] > combine_comparables(far)['confidenza']
+    assert combine_comparables(close[:2]) is None
+
+
+@pytest.fixture
+def service(omi_service, monkeypatch):
+    # Annunci e quotazioni OMI nello stesso database, come in produzione
+    Base.metadata.create_all(bind=omi_service.engine)
+    with Session(omi_service.engine) as db:
+        owner = User(email="owner@example.com", password_hash="x", first_name="Test")
+        db.add(owner)
+        db.commit()
+        # 8 annunci a Pescara centro a 3.000 €/mq, uno a Milano e una bozza
+        for i in range(8):
+            make_property(db, owner, latitude=42.462 + i * 0.001, longitude=14.214,
+                          surface_sqm=90 + i, full_property_value=(90 + i) * 3000)
+        make_property(db, owner, latitude=45.46, longitude=9.19, full_property_value=900000)
+        make_property(db, owner, latitude=42.462, longitude=14.214, status=PropertyStatus.DRAFT,
+                      full_property_value=10000)
+        # Senza piena proprietà: riportata dalla nuda (età 78: 1 - 2.5% × 12 = 70%)
+        make_property(db, owner, latitude=42.463, longitude=14.215,
+                      full_property_value=None, bare_property_value=0.7 * 300000)
+    
+    monkeypatch.setattr(comparables, '_index', None)
+    monkeypatch.setattr(comparables, '_failed_at', None)
+    return omi_service
+
+
+def test_index_from_published_listings(service):
+    rows = load_listings(service.engine)
+    index = ComparablesIndex.from_rows(rows, 0.025, ValuationService.get_usufruct_coefficient)
+    
+    assert len(index) == 10
+    assert index.price_sqm.max() == pytest.approx(9000)
+    assert np.isclose(index.price_sqm, 3000).sum() == 9
+
+
+def test_valuation_blends_comparables_with_omi(service):
+    valuation = service.calculate_complete_valuation(PropertyData(
+        comune='PESCARA', surface_sqm=95, rooms=4, latitude=42.465, longitude=14.214
+    ))
+    
+    comp = valuation['stima_comparabili']
+    assert comp['prezzo_mq'] == pytest.approx(3000, rel=0.01)
+    assert comp['numero'] == 9
+    combined = valuation['stima_combinata']
+    omi_value = valuation['stima_miapersempre']['medio']
+    assert omi_value < combined['medio'] < comp['valore']
+    assert 0 < combined['peso_comparabili'] <= comparables.MAX_COMPARABLES_WEIGHT
+    assert valuation['valore_fiscale']['valore_nuda_proprieta'] < combined['medio']
+    
+    # Senza coordinate: solo OMI
+    assert 'stima_combinata' not in service.calculate_complete_valuation(PropertyData(comune='PESCARA'))
+
+
+def test_listing_is_not_its_own_comparable(service):
+    # Annuncio pubblicato nel gruppo di Pescara centro, chiesto a 6.000 €/mq
+    with Session(service.engine) as db:
+        owner = db.query(User).first()
+        listing = make_property(db, owner, latitude=42.465, longitude=14.214, surface_sqm=95,
+                                full_property_value=95 * 6000)
+        property_data = listing_property_data(listing)
+    
+    valuation = service.calculate_complete_valuation(property_data)
+    
+    comp = valuation['stima_comparabili']
+    assert listing.id not in [c['id'] for c in comp['comparabili']]
+    assert comp['numero'] == 9
+    assert comp['prezzo_mq'] == pytest.approx(3000, rel=0.01)
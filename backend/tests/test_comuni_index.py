@@ -0,0 +1,133 @@
+"""
+Dizionario comuni: normalizzazione, alias, ricerca fuzzy e autocompletamento
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api.endpoints import valuation
+from app.main import app
+from app.services import comuni_index
+from app.services.comuni_index import Comune, ComuniIndex, name_keys, normalize_name
+from app.services.valuation_service import ValuationService
+
+COMUNI = [
+    Comune('035033', "REGGIO NELL'EMILIA", 'RE', 'EMILIA-ROMAGNA'),
+    Comune('080063', 'REGGIO DI CALABRIA', 'RC', 'CALABRIA'),
+    Comune('040012', "FORLI'", 'FC', 'EMILIA-ROMAGNA'),
+    Comune('044066', 'SAN BENEDETTO DEL TRONTO', 'AP', 'MARCHE'),
+    Comune('021008', 'BOLZANO/BOZEN', 'BZ', 'TRENTINO-ALTO ADIGE'),
+    Comune('068028', 'PESCARA', 'PE', 'ABRUZZO'),
+    Comune('069022', 'CHIETI', 'CH', 'ABRUZZO'),
+    Comune('090064', 'SAN TEODORO', 'SS', 'SARDEGNA'),
+    Comune('083089', 'SAN TEODORO', 'ME', 'SICILIA'),
+]
+
+
+@pytest.fixture
+def index():
+    return ComuniIndex(COMUNI)
+
+
+def test_normalization_and_aliases():
+    assert normalize_name("  Forlì ") == 'FORLI'
+    assert normalize_name("Reggio nell'Emilia") == 'REGGIO NELL EMILIA'
+    assert 'REGGIO EMILIA' in name_keys("REGGIO NELL'EMILIA")
+    assert 'S BENEDETTO TRONTO' in name_keys('SAN BENEDETTO DEL TRONTO')
+    assert {'BOLZANO', 'BOZEN'} <= name_keys('BOLZANO/BOZEN')
+
+
+def test_resolve_exact_and_fuzzy(index):
+    assert index.resolve('Reggio Emilia').comune.istat == '035033'
+    assert index.resolve('reggio calabria').comune.istat == '080063'
+    assert index.resolve('Forli').comune.nome == "FORLI'"
+    assert index.resolve('S. Benedetto del Tronto').comune.istat == '044066'
+    assert index.resolve('Bozen').comune.istat == '021008'
+    
+    typo = index.resolve('Pescra')
+    assert typo.comune.istat == '068028' and typo.score < 1
+    
+    # Ambigui o troppo lontani: nessuna risoluzione
+    assert index.resolve('Reggio') is None
+    assert index.resolve('San Teodoro') is None
+    assert index.resolve('Milano') is None
+
+
+def test_suggest_prefers_prefix(index):
+    names = [match.comune.nome for match in index.suggest('regg', limit=5)]
+    assert set(names[:2]) == {"REGGIO DI CALABRIA", "REGGIO NELL'EMILIA"}
+    assert index.suggest('san', limit=10)[0].comune.nome.startswith('SAN')
+    assert index.suggest('', limit=5) == []
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    comuni_index.reset_comuni_index()
+    service = ValuationService(database_url=f"sqlite:///{tmp_path}/omi.db")
+    with service.engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE omi_zones (comune_istat TEXT, comune_descrizione TEXT, provincia TEXT, regione TEXT)
+        """))
+        conn.execute(text("""
+            CREATE TABLE omi_quotations (
+                comune_istat TEXT, comune_descrizione TEXT, fascia TEXT, zona_codice TEXT,
+                link_zona TEXT, cod_tipologia TEXT, stato TEXT, prezzo_min REAL, prezzo_max REAL
+            )
+        """))
+        for comune in COMUNI:
+            conn.execute(text("INSERT INTO omi_zones VALUES (:istat, :nome, :provincia, :regione)"),
+                         comune.__dict__)
+        conn.execute(text("""
+            INSERT INTO omi_quotations VALUES
+            ('035033', 'REGGIO NELL''EMILIA', 'B', 'B1', 'RE00000001', '20', 'NORMALE', 1800, 2200)
+        """))
+    monkeypatch.setattr(valuation, 'get_valuation_service', lambda: service)
+    yield service
+    comuni_index.reset_comuni_index()
+
+
+def test_calculate_resolves_comune_by_istat(service):
+    client = TestClient(app)
+    
+    response = client.post("/api/v1/valuation/calculate", json={
+        'comune': 'Reggio Emilia', 'superficie': 100, 'eta_usufruttuario': 78
+    })
+    assert response.status_code == 200
+    summary = response.json()['valutazione']['property_summary']
+    assert summary['comune'] == "REGGIO NELL'EMILIA"
+    assert summary['comune_istat'] == '035033'
+    
+    response = client.post("/api/v1/valuation/calculate", json={
+        'comune': 'Reggio', 'superficie': 100, 'eta_usufruttuario': 78
+    })
+    assert response.status_code == 404
+    assert "REGGIO NELL'EMILIA" in response.json()['detail']['suggestions']
+
+
+def test_index_rebuilt_on_new_semester(service, monkeypatch):
+    monkeypatch.setattr(comuni_index, 'CHECK_INTERVAL_SECONDS', 0)
+    with service.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE omi_settings (chiave TEXT, valore TEXT)"))
+        conn.execute(text("INSERT INTO omi_settings VALUES ('semestre_omi_corrente', '2025/1')"))
+    index = service.get_comuni_index()
+    
+    # Comune nato da una fusione, importato con il nuovo semestre
+    with service.engine.begin() as conn:
+        conn.execute(text("INSERT INTO omi_zones VALUES ('097093', 'VALVARRONE', 'LC', 'LOMBARDIA')"))
+    assert service.get_comuni_index() is index
+    
+    with service.engine.begin() as conn:
+        conn.execute(text("UPDATE omi_settings SET valore = '2025/2'"))
+    rebuilt = service.get_comuni_index()
+    assert rebuilt is not index
+    assert rebuilt.resolve('Valvarrone').comune.istat == '097093'
+    assert service.get_comuni_index() is rebuilt
+
+
+def test_autocomplete_endpoint(service):
+    client = TestClient(app)
+    
+    response = client.get("/api/v1/valuation/comuni", params={'q': 'forl'})
+    assert response.status_code == 200
+    assert response.json()['comuni'][0]['istat'] == '040012'
+    assert client.get("/api/v1/valuation/comuni", params={'q': 'f'}).status_code == 422
@@ -0,0 +1,89 @@
+"""
+Percentile del deal score nella zona: t-digest aggiornati in scrittura
+"""
+import numpy as np
+import pytest
+
+from app.core.tdigest import TDigest
+from app.crud import property as crud_property
+from app.models import PropertyStatus, ZoneDealDigest
+from app.services.deal_distribution import deal_score_rank, rebuild_deal_digests
+from tests.conftest import make_property
+
+
+def test_tdigest_accuracy():
+    values = np.random.default_rng(0).normal(5, 15, 20000)
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    
+    assert len(digest.to_dict()['means']) < 1000
+    for x in (-25, -5, 5, 20, 40):
+        assert digest.cdf(x) == pytest.approx((values <= x).mean(), abs=0.005)
+    assert digest.quantile(0.5) == pytest.approx(np.median(values), abs=0.3)
+    
+    restored = TDigest.from_dict(digest.to_dict())
+    assert restored.cdf(5) == pytest.approx(digest.cdf(5))
+    
+    small = TDigest()
+    for value in (1, 2, 3, 4, 5):
+        small.add(value)
+    assert [small.cdf(x) for x in (0, 3, 5)] == [0.0, 0.5, 1.0]
+    small.remove(5)
+    assert small.count == 4 and small.max == 4
+
+
+def digest_count(db, key):
+    db.expire_all()
+    row = db.get(ZoneDealDigest, key)
+    return row.count if row else 0
+
+
+def test_digests_follow_listing_writes(client, db_session, owner):
+    listings = [
+        make_property(db_session, owner, omi_link_zona='PE1', deal_score=score)
+        for score in (-10, -5, 0, 5, 10, 15)
+    ]
+    draft = make_property(db_session, owner, omi_link_zona='PE1', deal_score=30, status=PropertyStatus.DRAFT)
+    assert digest_count(db_session, 'PE1') == 6
+    
+    best = deal_score_rank(db_session, listings[-1])
+    assert best['percentile'] > 80 and best['zone_listings'] == 6
+    assert deal_score_rank(db_session, listings[0])['percentile'] < 20
+    
+    # Pubblicazione, modifica del prezzo, cambio zona, eliminazione
+    crud_property.publish_property(db_session, draft)
+    assert digest_count(db_session, 'PE1') == 7
+    assert deal_score_rank(db_session, draft)['percentile'] == 100
+    
+    listings[0].deal_score = 40
+    db_session.commit()
+    assert deal_score_rank(db_session, listings[0])['percentile'] == 100
+    assert digest_count(db_session, 'PE1') == 7
+    
+    listings[1].omi_link_zona = 'PE2'
+    db_session.commit()
+    assert digest_count(db_session, 'PE1') == 6
+    assert digest_count(db_session, 'PE2') == 1
+    assert deal_score_rank(db_session, listings[1]) is None  # Zona con pochi annunci
+    
+    crud_property.delete_property(db_session, listings[2])
+    assert digest_count(db_session, 'PE1') == 5
+    
+    # Il dettaglio espone il percentile
+    detail = client.get(f"/api/v1/properties/{listings[-1].id}").json()
+    assert detail['deal_score_rank']['zone'] == 'PE1'
+    assert detail['deal_score_rank']['zone_listings'] == 5
+    
+    # La ricostruzione da zero coincide
+    assert rebuild_deal_digests(db_session, ['Pescara']) == 2
+    db_session.commit()
+    assert digest_count(db_session, 'PE1') == 5
+    assert deal_score_rank(db_session, listings[-1]) == detail['deal_score_rank']
+
+
+def test_zone_falls_back_to_comune(db_session, owner):
+    listing = make_property(db_session, owner, city=" Pescara", deal_score=3)
+    
+    assert digest_count(db_session, 'comune:PESCARA') == 1
+    assert deal_score_rank(db_session, listing) is None
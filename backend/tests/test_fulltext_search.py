@@ -0,0 +1,49 @@
+"""
+Ricerca full-text su titolo e descrizione (indice in-process)
+"""
+from app.services.search_index import InvertedIndex, tokenize
+from tests.conftest import make_property
+
+
+def test_tokenize_stems_and_drops_stopwords():
+    assert tokenize("Attici con terrazzo in città") == tokenize("attico terrazzi citta")
+
+
+def test_index_requires_all_terms_and_ranks_title_first():
+    index = InvertedIndex()
+    index.add(1, "Villa con piscina", "Ampio giardino")
+    index.add(2, "Appartamento centrale", "Villa condominiale con giardino")
+    index.add(3, "Loft industriale", "Nessun giardino")
+    
+    assert [doc for doc, _ in index.search("villa giardino")] == [1, 2]
+    
+    index.remove(1)
+    assert [doc for doc, _ in index.search("villa")] == [2]
+
+
+def test_search_endpoint_with_q(client, db_session, owner):
+    terrace = make_property(
+        db_session, owner,
+        title="Attico con terrazzo panoramico",
+        description="Vista mare"
+    )
+    garden = make_property(
+        db_session, owner,
+        title="Villetta con giardino privato",
+        description="Piccolo terrazzo sul retro"
+    )
+    make_property(db_session, owner, title="Bilocale ristrutturato in centro")
+    
+    results = client.get("/api/v1/properties/search?q=terrazzi").json()
+    
+    assert [p["id"] for p in results] == [terrace.id, garden.id]
+
+
+def test_search_index_follows_updates(client, db_session, owner):
+    prop = make_property(db_session, owner, title="Trilocale con cantina")
+    assert client.get("/api/v1/properties/search?q=cantina").json()
+    
+    client.put(f"/api/v1/properties/{prop.id}", json={"title": "Trilocale con soffitta"})
+    
+    assert client.get("/api/v1/properties/search?q=cantina").json() == []
+    assert len(client.get("/api/v1/properties/search?q=soffitta").json()) == 1
@@ -0,0 +1,94 @@
+"""
+Cache delle risposte per gli endpoint pubblici di listing
+"""
+from app.core.cache import TTLCache, make_cache_key
+from tests.conftest import make_property
+
+
+def test_cache_key_is_normalized():
+    a = make_cache_key("list", {"city": "Pescara ", "skip": 0, "status": None})
+    b = make_cache_key("list", {"skip": 0, "city": "pescara"})
+    
+    assert a == b
+
+
+def test_ttl_cache_tag_invalidation_and_lru():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1, tags={"x"})
+    cache.set("b", 2, tags={"y"})
+    cache.set("c", 3, tags={"x"})
+    
+    assert cache.get("a") is None  # evicted (LRU)
+    assert cache.invalidate_tags("x") == 1
+    assert cache.get("c") is None
+    assert cache.get("b").value == 2
+
+
+def test_stale_entry_is_still_served():
+    cache = TTLCache(ttl=0, stale_ttl=60)
+    cache.set("a", 1)
+    
+    entry = cache.get("a")
+    assert entry is not None and not entry.is_fresh
+
+
+def test_list_served_from_cache(client, db_session, owner):
+    make_property(db_session, owner)
+    
+    first = client.get("/api/v1/properties/?city=Pescara")
+    second = client.get("/api/v1/properties/?city=pescara")
+    
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["X-Query-Count"] == "0"
+    assert second.json() == first.json()
+
+
+def test_etag_not_modified(client, db_session, owner):
+    make_property(db_session, owner)
+    etag = client.get("/api/v1/properties/search").headers["ETag"]
+    
+    response = client.get("/api/v1/properties/search", headers={"If-None-Match": etag})
+    
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_detail_cached_but_views_counted(client, db_session, owner):
+    prop = make_property(db_session, owner)
+    
+    client.get(f"/api/v1/properties/{prop.id}")
+    response = client.get(f"/api/v1/properties/{prop.id}")
+    
+    assert response.headers["X-Cache"] == "HIT"
+    db_session.refresh(prop)
+    assert prop.views_count == 2
+
+
+def test_missing_property_not_cached(client):
+    assert client.get("/api/v1/properties/999").status_code == 404
+    assert client.get("/api/v1/properties/999").status_code == 404
+
+
+def test_write_invalidates_list_and_detail(client, db_session, owner):
+    prop = make_property(db_session, owner)
+    client.get("/api/v1/properties/")
+    client.get(f"/api/v1/properties/{prop.id}")
+    
+    client.put(f"/api/v1/properties/{prop.id}", json={"title": "Nuovo titolo per l'annuncio"})
+    
+    listing = client.get("/api/v1/properties/")
+    detail = client.get(f"/api/v1/properties/{prop.id}")
+    assert listing.headers["X-Cache"] == "MISS"
+    assert detail.headers["X-Cache"] == "MISS"
+    assert detail.json()["title"] == "Nuovo titolo per l'annuncio"
+
+
+def test_publish_shows_new_listing(client, db_session, owner):
+    from app.models import PropertyStatus
+    draft = make_property(db_session, owner, status=PropertyStatus.DRAFT)
+    assert client.get("/api/v1/properties/").json() == []
+    
+    client.post(f"/api/v1/properties/{draft.id}/publish")
+    
+    assert [p["id"] for p in client.get("/api/v1/properties/").json()] == [draft.id]
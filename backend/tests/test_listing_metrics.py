@@ -0,0 +1,45 @@
+"""
+Metriche derivate degli annunci e ordinamento in ricerca
+"""
+from app.services.listing_metrics import compute_listing_metrics
+from tests.conftest import make_property
+
+
+def test_compute_listing_metrics():
+    metrics = compute_listing_metrics(
+        bare_property_value=100000,
+        full_property_value=200000,
+        surface_sqm=100,
+        usufructuary_age=78,  # coefficiente 12
+        omi_price_sqm=2000,
+        legal_rate=0.025
+    )
+    
+    # Stima: 200.000 - 200.000 × 2.5% × 12 = 140.000
+    assert metrics == {
+        'discount_pct': 50.0,
+        'price_per_sqm': 1000.0,
+        'omi_price_sqm': 2000.0,
+        'deal_score': round(40000 / 140000 * 100, 1),
+    }
+
+
+def test_metrics_without_omi():
+    metrics = compute_listing_metrics(120000, None, 80, 70, None)
+    
+    assert metrics['price_per_sqm'] == 1500.0
+    assert metrics['discount_pct'] is None
+    assert metrics['deal_score'] is None
+
+
+def test_search_sorted_by_derived_metrics(client, db_session, owner):
+    low = make_property(db_session, owner, discount_pct=20.0, price_per_sqm=1500.0, deal_score=-5.0)
+    high = make_property(db_session, owner, discount_pct=45.0, price_per_sqm=900.0, deal_score=12.0)
+    unknown = make_property(db_session, owner, discount_pct=None, price_per_sqm=1200.0)
+    
+    def ids(url):
+        return [p["id"] for p in client.get(url).json()]
+    
+    assert ids("/api/v1/properties/search?sort=discount") == [high.id, low.id, unknown.id]
+    assert ids("/api/v1/properties/search?sort=price_sqm") == [high.id, unknown.id, low.id]
+    assert ids("/api/v1/properties/search?min_deal_score=0") == [high.id]
@@ -0,0 +1,80 @@
+"""
+Propagazione import OMI incrementale: solo i comuni modificati
+"""
+from sqlalchemy import text
+
+from app.core.cache import listing_cache, property_tag
+from app.tasks import apply_omi_changes as task
+from app.tasks import recompute_listing_metrics as recompute
+from tests.conftest import make_property
+
+
+ISTAT = {'PESCARA': '068028', 'CHIETI': '069022', 'MILANO': '015146'}
+
+
+class FakeValuationService:
+    def get_legal_rate(self):
+        return 0.025
+    
+    def get_omi_city_reference(self, comune):
+        return {'PESCARA': 2500.0, 'MILANO': 5000.0}.get(comune)
+
+
+def _record_changes(db, semestre, rows):
+    db.execute(text("""
+        CREATE TABLE IF NOT EXISTS omi_quotation_changes (
+            id INTEGER PRIMARY KEY,
+            semestre VARCHAR(10),
+            change_type VARCHAR(10),
+            comune_istat VARCHAR(6),
+            zona_codice VARCHAR(10),
+            comune_descrizione VARCHAR(100)
+        )
+    """))
+    for comune, change_type in rows:
+        db.execute(text("""
+            INSERT INTO omi_quotation_changes (semestre, change_type, comune_istat, zona_codice, comune_descrizione)
+            VALUES (:semestre, :change_type, :istat, 'B1', :comune)
+        """), {'semestre': semestre, 'change_type': change_type, 'comune': comune, 'istat': ISTAT.get(comune)})
+    db.commit()
+
+
+def test_load_change_report(db_session):
+    _record_changes(db_session, '2025/2', [
+        ('PESCARA', 'changed'), ('PESCARA', 'changed'), ('CHIETI', 'inserted'),
+    ])
+    _record_changes(db_session, '2025/1', [('MILANO', 'removed')])
+    
+    report = task.load_change_report(db_session, '2025/2')
+    
+    assert (report.inserted, report.changed, report.removed) == (1, 2, 0)
+    assert report.total == 3
+    assert report.comuni == {'PESCARA', 'CHIETI'}
+    assert report.zone == {'068028': {'B1'}, '069022': {'B1'}}
+
+
+def test_apply_changes_only_touches_affected_comuni(db_session, owner, monkeypatch):
+    monkeypatch.setattr(recompute, 'get_valuation_service', FakeValuationService)
+    pescara = make_property(db_session, owner, city="Pescara")
+    milano = make_property(db_session, owner, city="Milano")
+    listing_cache.clear()
+    listing_cache.set("detail:pescara", b"{}", tags=[property_tag(pescara.id)])
+    listing_cache.set("detail:milano", b"{}", tags=[property_tag(milano.id)])
+    
+    report = task.OmiChangeReport(semestre='2025/2', changed=3, comuni={'PESCARA'})
+    updated = task.apply_omi_changes(db_session, report)
+    
+    db_session.refresh(pescara)
+    db_session.refresh(milano)
+    assert updated == [pescara.id]
+    assert pescara.omi_price_sqm == 2500.0
+    assert milano.omi_price_sqm is None
+    assert listing_cache.get("detail:pescara") is None
+    assert listing_cache.get("detail:milano") is not None
+    listing_cache.clear()
+
+
+def test_no_changes_is_a_noop(db_session):
+    report = task.OmiChangeReport(semestre='2025/2')
+    
+    assert task.apply_omi_changes(db_session, report) == []
@@ -0,0 +1,244 @@
+"""
+Import OMI: validazione staging e naming per lo swap atomico
+"""
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import import_omi_data as omi
+
+
+def _quotation_stats(**overrides):
+    stats = {
+        'rows': 1000,
+        'null_prices': 10,
+        'inverted_prices': 0,
+        'min_price': 250.0,
+        'max_price': 18000.0,
+    }
+    stats.update(overrides)
+    return stats
+
+
+def test_valid_staging_has_no_errors():
+    errors = omi.check_staging_stats('omi_quotations', _quotation_stats(), 1000, live_rows=990)
+    
+    assert errors == []
+
+
+def test_first_import_without_live_rows():
+    assert omi.check_staging_stats('omi_zones', {'rows': 500}, 500, live_rows=0) == []
+
+
+def test_rejects_empty_or_partial_load():
+    assert omi.check_staging_stats('omi_zones', {'rows': 0}, 500) == ["omi_zones: staging vuota"]
+    
+    errors = omi.check_staging_stats('omi_zones', {'rows': 480}, 500)
+    assert len(errors) == 1 and "480" in errors[0]
+
+
+def test_rejects_shrunk_semester():
+    errors = omi.check_staging_stats('omi_quotations', _quotation_stats(), 1000, live_rows=2000)
+    
+    assert len(errors) == 1 and "produzione" in errors[0]
+
+
+def test_rejects_price_anomalies():
+    stats = _quotation_stats(null_prices=600, inverted_prices=50, min_price=0.0, max_price=250000.0)
+    errors = omi.check_staging_stats('omi_quotations', stats, 1000)
+    
+    assert len(errors) == 4
+
+
+def test_canonical_names():
+    assert omi.canonical_name('idx_omi_quot_lookup_staging') == 'idx_omi_quot_lookup'
+    assert omi.canonical_name('omi_quotations_id_seq_prev') == 'omi_quotations_id_seq'
+    assert omi.canonical_name('unique_zona') == 'unique_zona'
+    assert omi.staging_table('omi_zones') == 'omi_zones_staging'
+    assert omi.previous_table('omi_zones') == 'omi_zones_prev'
+
+
+VALORI_SAMPLE = (
+    "Quotazioni OMI;\n"
+    "Area_territoriale;Regione;Prov;Comune_ISTAT;Comune_cat;Sez;Comune_amm;"
+    "Comune_descrizione;Fascia;Zona;LinkZona;Cod_Tip;Descr_Tipologia;Stato;Stato_prev;"
+    "Compr_min;Compr_max;Sup_NL_compr;Loc_min;Loc_max;Sup_NL_loc;\n"
+    "SUD;CAMPANIA;NA;063049;F839;;F839;NAPOLI;B;B1;NA00000001;20;Abitazioni civili;"
+    "NORMALE;N;2800;4100,5;L;9,8;14;L;\n"
+    "SUD;CAMPANIA;NA;063049;F839;;F839;NAPOLI;B;B1;NA00000001;20;Abitazioni civili;"
+    "OTTIMO;N;;;L;;;L;\n"
+)
+
+
+def test_read_and_clean_quotations(tmp_path):
+    path = tmp_path / "valori.csv"
+    path.write_text(VALORI_SAMPLE, encoding='utf-8')
+    
+    df = omi.clean_quotations(omi.read_omi_csv(str(path), list(omi.VALORI_COLUMNS)))
+    
+    assert list(df.columns) == omi.QUOTATION_DB_COLUMNS
+    # 'NA' è la provincia di Napoli, non un valore mancante
+    assert list(df['provincia']) == ['NA', 'NA']
+    assert df['prezzo_max'].iloc[0] == 4100.5
+    assert df['locazione_min'].iloc[0] == 9.8
+    assert df['prezzo_min'].isna().iloc[1]
+    assert df['sezione'].isna().all()
+
+
+def test_clean_decimals_fallback_for_malformed_values():
+    cleaned = omi.clean_decimals(pd.Series([' 1200,5', 'n.d.', None], dtype=str))
+    
+    assert cleaned.iloc[0] == 1200.5
+    assert cleaned.iloc[1:].isna().all()
+
+
+def test_clean_strings_strips_quotes():
+    cleaned = omi.clean_strings(pd.Series(["'CENTRO STORICO' ", "''", None], dtype=str))
+    
+    assert cleaned.iloc[0] == 'CENTRO STORICO'
+    assert cleaned.iloc[1:].isna().all()
+
+
+def test_rejects_duplicate_history_keys():
+    # Chiave del diff e dello storico: controllata anche senza --diff
+    stats = _quotation_stats(duplicate_keys=3)
+    
+    errors = omi.check_staging_stats('omi_quotations', stats, 1000)
+    assert len(errors) == 1 and "duplicate" in errors[0]
+
+
+def test_diff_compares_values_not_keys_or_metadata():
+    assert set(omi.DIFF_KEY_COLUMNS).isdisjoint(omi.DIFF_VALUE_COLUMNS)
+    assert 'semestre' not in omi.DIFF_VALUE_COLUMNS
+    assert {'prezzo_min', 'prezzo_max', 'locazione_min', 'locazione_max'} <= set(omi.DIFF_VALUE_COLUMNS)
+
+
+def _lookup_engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE omi_quotations (
+                id INTEGER PRIMARY KEY, provincia TEXT, comune_istat TEXT, comune_descrizione TEXT,
+                fascia TEXT, zona_codice TEXT, link_zona TEXT, cod_tipologia TEXT, stato TEXT,
+                prezzo_min REAL, prezzo_max REAL
+            )
+        """))
+        for i in range(2000):
+            conn.execute(text("""
+                INSERT INTO omi_quotations (provincia, comune_istat, comune_descrizione, fascia,
+                    zona_codice, link_zona, cod_tipologia, stato, prezzo_min, prezzo_max)
+                VALUES ('PE', :istat, :comune, 'B', :zona, :link, :tipologia, :stato, 1000, 1200)
+            """), {
+                'istat': f"068{i % 200:03d}", 'comune': f"COMUNE {i % 200}", 'zona': f"B{i % 5}", 'link': f"PE{i:08d}",
+                'tipologia': ('20', '21', '1')[i % 3], 'stato': ('NORMALE', 'OTTIMO')[i % 2]
+            })
+    return engine
+
+
+def test_lookup_plans_use_importer_indexes():
+    engine = _lookup_engine()
+    
+    errors = omi.check_lookup_plans(engine)
+    assert len(errors) == len(omi.lookup_plan_checks('X', '068000'))
+    assert all('seq scan' in error for error in errors)
+    
+    omi.ensure_live_indexes(engine, tables=('omi_quotations',))
+    omi.ensure_live_indexes(engine, tables=('omi_quotations',))  # idempotente
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    
+    assert omi.check_lookup_plans(engine) == []
+
+
+def test_postgres_plan_index_names():
+    plan = {
+        'Node Type': 'Limit',
+        'Plans': [{'Node Type': 'Index Scan', 'Index Name': 'idx_omi_quot_comune_upper'}],
+    }
+    
+    assert omi._plan_index_names(plan) == {'idx_omi_quot_comune_upper'}
+
+
+def test_dry_run_reports_anomalies_without_database(tmp_path):
+    row = "SUD;CAMPANIA;NA;063049;F839;;F839;NAPOLI;B;B{zona};NA0000000{zona};20;Abitazioni civili;{stato};N;{prezzi};L;9,8;14;L;\n"
+    lines = [
+        row.format(zona=4, stato='NORMALE', prezzi='2800;4100,5'),
+        row.format(zona=4, stato='NORMALE', prezzi='2800;4100,5'),  # duplicata
+        row.format(zona=2, stato='NORMALE', prezzi='n.d.;3000'),    # prezzo non numerico
+        row.format(zona=3, stato='NORMALE', prezzi='5000;3000'),    # min > max
+    ]
+    path = tmp_path / "valori.csv"
+    path.write_text(VALORI_SAMPLE + ''.join(lines), encoding='utf-8')
+    
+    for workers in (0, 1):
+        report = omi.dry_run_file(str(path), 'quotazioni', workers=workers)
+        stats = report['stats']
+        
+        assert stats['rows'] == 6
+        assert stats['invalid_prices'] == 1
+        assert stats['null_prices'] == 2
+        assert stats['inverted_prices'] == 1
+        assert stats['duplicate_keys'] == 1
+        assert stats['unique_quotation'] == 1
+        assert any('unique_quotation' in error for error in report['errors'])
+        assert report['rows_per_second'] > 0
+
+
+def test_unique_keys_follow_table_constraints():
+    assert omi.unique_keys('omi_zones') == {
+        'omi_zones_link_zona_key': ['link_zona'],
+        'unique_zona': ['comune_amministrativo', 'zona_codice'],
+    }
+    assert omi.unique_keys('omi_quotations')['duplicate_keys'] == list(omi.DIFF_KEY_COLUMNS)
+
+
+def _diff_engine(live, staging):
+    """Live e staging (link_zona, prezzo_min) con la stessa chiave diff, omi_diff già calcolata"""
+    engine = create_engine("sqlite://")
+    columns = ', '.join(omi.QUOTATION_DB_COLUMNS)
+    keys = ', '.join(omi.DIFF_KEY_COLUMNS)
+    with engine.begin() as conn:
+        for table, rows in (('omi_quotations', live), ('omi_quotations_staging', staging)):
+            conn.execute(text(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, {columns})"))
+            for zona, (link, prezzo) in rows.items():
+                conn.execute(text(f"""
+                    INSERT INTO {table} (comune_istat, zona_codice, cod_tipologia, stato, link_zona, prezzo_min)
+                    VALUES ('068028', :zona, '20', 'NORMALE', :link, :prezzo)
+                """), {'zona': zona, 'link': link, 'prezzo': prezzo})
+        conn.execute(text("CREATE UNIQUE INDEX unique_quotation ON omi_quotations (link_zona, cod_tipologia, stato)"))
+        conn.execute(text(f"""
+            CREATE TABLE omi_diff AS
+            SELECT 'changed' AS change_type, l.id AS live_id, s.id AS staging_id,
+                {', '.join(f"l.{c}" for c in omi.DIFF_KEY_COLUMNS)}, l.comune_descrizione,
+                l.prezzo_min AS old_prezzo_min, l.prezzo_max AS old_prezzo_max,
+                s.prezzo_min AS new_prezzo_min, s.prezzo_max AS new_prezzo_max
+            FROM omi_quotations_staging s
+            JOIN omi_quotations l ON l.zona_codice = s.zona_codice
+            WHERE s.link_zona != l.link_zona OR s.prezzo_min != l.prezzo_min
+        """))
+        conn.execute(text(f"""
+            CREATE TABLE {omi.CHANGES_TABLE} (
+                semestre TEXT, change_type TEXT, {keys}, comune_descrizione TEXT,
+                old_prezzo_min REAL, old_prezzo_max REAL, new_prezzo_min REAL, new_prezzo_max REAL
+            )
+        """))
+    return engine
+
+
+def test_diff_swaps_link_zona_without_transient_duplicates():
+    engine = _diff_engine(
+        live={'B1': ('PE1', 1000), 'B2': ('PE2', 1500), 'C1': ('PE3', 800)},
+        staging={'B1': ('PE2', 1000), 'B2': ('PE1', 1500), 'C1': ('PE3', 900)},
+    )
+    with engine.begin() as conn:
+        omi.apply_quotation_diff(conn, '2025/2')
+        rows = conn.execute(text(
+            "SELECT zona_codice, link_zona, prezzo_min FROM omi_quotations ORDER BY zona_codice"
+        )).fetchall()
+        changes = conn.execute(text(f"SELECT COUNT(*) FROM {omi.CHANGES_TABLE}")).scalar()
+    
+    assert [tuple(row) for row in rows] == [
+        ('B1', 'PE2', 1000),
+        ('B2', 'PE1', 1500),
+        ('C1', 'PE3', 900),
+    ]
+    assert changes == 3
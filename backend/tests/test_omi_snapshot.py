@@ -0,0 +1,136 @@
+"""
+Snapshot OMI locale: scrittura, lookup memory-mapped, validità per semestre
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.api.endpoints import valuation
+from app.main import app
+from app.services import omi_snapshot
+from app.services.omi_snapshot import OmiSnapshot, get_snapshot, write_snapshot
+from app.services.valuation_service import ValuationService
+
+QUOTATIONS = pd.DataFrame([
+    # comune, istat, fascia, zona, link, tipologia, stato, prezzo_min, prezzo_max
+    ('Pescara', '068028', 'C', 'C1', 'PE00000003', '20', 'NORMALE', 1500.0, 1900.0),
+    ('PESCARA', '068028', 'B', 'B2', 'PE00000002', '20', 'NORMALE', 2200.0, 2600.0),
+    ('PESCARA', '068028', 'B', 'B1', 'PE00000001', '20', 'NORMALE', 2000.0, 2400.0),
+    ('PESCARA', '068028', 'B', 'B1', 'PE00000001', '20', 'OTTIMO', None, None),
+    ('CHIETI', '069022', 'B', 'B1', 'CH00000001', '20', 'NORMALE', 1100.0, 1300.0),
+    # Omonimi: stesso nome, codici ISTAT diversi
+    ('SAN TEODORO', '083090', 'B', 'B1', 'ME00000001', '20', 'NORMALE', 600.0, 800.0),
+    ('SAN TEODORO', '090092', 'B', 'B1', 'SS00000001', '20', 'NORMALE', 3000.0, 4000.0),
+], columns=[
+    'comune_descrizione', 'comune_istat', 'fascia', 'zona_codice', 'link_zona', 'cod_tipologia',
+    'stato', 'prezzo_min', 'prezzo_max'
+]).assign(locazione_min=np.nan, locazione_max=np.nan)
+
+ZONES = pd.DataFrame([
+    ('PESCARA', 'B', 'B1', 'PE00000001', 'CENTRO'),
+    ('PESCARA', 'C', 'C1', 'PE00000003', None),
+], columns=['comune_descrizione', 'fascia', 'zona_codice', 'link_zona', 'zona_descrizione'])
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    directory = str(tmp_path / "snapshot")
+    write_snapshot(directory, '2025/1', QUOTATIONS, ZONES)
+    return directory
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/omi.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE omi_settings (chiave TEXT, valore TEXT)"))
+        conn.execute(text("INSERT INTO omi_settings VALUES ('semestre_omi_corrente', '2025/1')"))
+    yield engine
+    engine.dispose()
+
+
+def test_lookups_match_database_semantics(snapshot_dir):
+    snapshot = OmiSnapshot(snapshot_dir)
+    
+    # Prima zona della fascia, come ORDER BY fascia, zona_codice LIMIT 1
+    quote = snapshot.quotation('pescara', fascia='B')
+    assert quote['zona_codice'] == 'B1'
+    assert quote['prezzo_medio'] == 2200
+    assert snapshot.quotation('PESCARA', zona_codice='C1')['link_zona'] == 'PE00000003'
+    assert snapshot.quotation('PESCARA', stato='OTTIMO') is None
+    assert snapshot.quotation('ROMA') is None
+    
+    assert snapshot.city_reference('PESCARA') == pytest.approx((1700 + 2400 + 2200) / 3)
+    assert [zone['codice'] for zone in snapshot.zones('Pescara')] == ['B1', 'C1']
+
+
+def test_lookup_by_istat(snapshot_dir):
+    snapshot = OmiSnapshot(snapshot_dir)
+    
+    # Il nome non conta: stesso risultato della query SQL per codice
+    assert snapshot.quotation('Pescara (PE)', comune_istat='068028')['zona_codice'] == 'B1'
+    assert snapshot.quotation('SAN TEODORO', comune_istat='090092')['prezzo_min'] == 3000
+    assert snapshot.quotation('SAN TEODORO', comune_istat='083090')['prezzo_min'] == 600
+    assert snapshot.quotation('PESCARA', comune_istat='999999') is None
+
+
+def test_columns_are_memory_mapped(snapshot_dir):
+    snapshot = OmiSnapshot(snapshot_dir)
+    
+    assert isinstance(snapshot.quotations['prezzo_min'], np.memmap)
+    assert snapshot.quotations['zona_codice'].dtype.kind == 'U'
+
+
+def test_rewrite_replaces_generation(snapshot_dir):
+    first = get_snapshot(snapshot_dir)
+    assert get_snapshot(snapshot_dir) is first
+    
+    write_snapshot(snapshot_dir, '2025/2', QUOTATIONS.head(1), ZONES)
+    
+    second = get_snapshot(snapshot_dir)
+    assert second.semestre == '2025/2'
+    assert second.quotation('PESCARA', fascia='C')['prezzo_min'] == 1500
+    # Il vecchio snapshot resta leggibile da chi l'aveva già aperto
+    assert first.quotation('CHIETI')['prezzo_min'] == 1100
+
+
+def test_service_uses_snapshot_only_for_current_semester(snapshot_dir, engine, monkeypatch):
+    monkeypatch.setattr(omi_snapshot, 'CHECK_INTERVAL_SECONDS', 0)
+    service = ValuationService(database_url=str(engine.url), snapshot_dir=snapshot_dir)
+    
+    assert service.get_omi_snapshot() is not None
+    assert service.get_omi_quotation('CHIETI')['prezzo_min'] == 1100
+    assert service.get_omi_quotation('Chieti Scalo', comune_istat='069022')['prezzo_min'] == 1100
+    
+    with service.engine.begin() as conn:
+        conn.execute(text("UPDATE omi_settings SET valore = '2025/2'"))
+    
+    # Snapshot superato: il servizio torna al database (qui senza omi_quotations)
+    assert service.get_omi_snapshot() is None
+    assert service.get_omi_quotation('CHIETI') is None
+
+
+def test_zones_endpoint_reads_snapshot_while_current(snapshot_dir, engine, monkeypatch):
+    monkeypatch.setattr(omi_snapshot, 'CHECK_INTERVAL_SECONDS', 0)
+    service = ValuationService(database_url=str(engine.url), snapshot_dir=snapshot_dir)
+    monkeypatch.setattr(valuation, 'get_valuation_service', lambda: service)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE omi_quotations (comune_descrizione TEXT, fascia TEXT, "
+            "zona_codice TEXT, link_zona TEXT)"
+        ))
+        conn.execute(text("INSERT INTO omi_quotations VALUES ('PESCARA', 'D', 'D1', 'PE00000009')"))
+    
+    client = TestClient(app)
+    
+    zones = client.get("/api/v1/valuation/zones/pescara").json()['zones']
+    assert [zone['codice'] for zone in zones] == ['B1', 'C1']
+    assert zones[0] == {'codice': 'B1', 'descrizione': 'PE00000001', 'fascia': 'B'}
+    
+    # Snapshot superato: zone lette da omi_quotations
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE omi_settings SET valore = '2025/2'"))
+    zones = client.get("/api/v1/valuation/zones/pescara").json()['zones']
+    assert zones == [{'codice': 'D1', 'descrizione': 'PE00000009', 'fascia': 'D'}]
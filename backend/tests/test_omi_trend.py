@@ -0,0 +1,82 @@
+"""
+Storico OMI per semestre: serie storica di zona e quotazioni "as of"
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.main import app
+from app.services.valuation_service import PropertyData
+
+HISTORY = [
+    # semestre, zona, prezzo_min, prezzo_max
+    ('2024/1', 'B1', 2000, 2400),
+    ('2024/2', 'B1', 2100, 2500),
+    ('2025/1', 'B1', 2300, 2700),
+    ('2024/2', 'B2', 1500, 1700),
+]
+
+
+@pytest.fixture
+def omi_options():
+    rows = [
+        (semestre, '068028', 'PESCARA', 'B', zona, f"PE{zona}", '20', 'NORMALE', prezzo_min, prezzo_max)
+        for semestre, zona, prezzo_min, prezzo_max in HISTORY
+    ]
+    return {
+        'quotations': [row[1:] for row in rows if row[0] == '2025/1'],
+        'history': rows,
+    }
+
+
+def test_trend_is_ordered_with_variation(omi_service):
+    trend = omi_service.get_omi_trend('pescara', zona_codice='B1')
+    
+    assert [point['semestre'] for point in trend] == ['2024/1', '2024/2', '2025/1']
+    assert trend[0]['variazione_pct'] is None
+    assert trend[1]['prezzo_medio'] == 2300
+    assert trend[1]['variazione_pct'] == pytest.approx(4.55)
+
+
+def test_trend_range_and_default_zone(omi_service):
+    trend = omi_service.get_omi_trend('PESCARA', from_semestre='2024/2', to_semestre='2024/2')
+    
+    assert len(trend) == 1
+    assert trend[0]['zona_codice'] == 'B1'
+    assert omi_service.get_omi_trend('CHIETI') == []
+
+
+def test_quotation_as_of_semester(omi_service):
+    current = omi_service.get_omi_quotation('PESCARA', zona_codice='B1')
+    past = omi_service.get_omi_quotation('PESCARA', zona_codice='B1', semestre='2024/1')
+    
+    assert current['prezzo_min'] == 2300
+    assert past['prezzo_min'] == 2000
+    assert omi_service.get_omi_quotation('PESCARA', zona_codice='B2', semestre='2025/1') is None
+    assert omi_service.get_omi_city_reference('PESCARA', semestre='2024/2') == 1950
+
+
+def test_valuation_source_semester(omi_service):
+    def fonte(**kwargs):
+        valuation = omi_service.calculate_complete_valuation(PropertyData(comune='PESCARA', zona_codice='B1', **kwargs))
+        return valuation['valore_piena_proprieta_base']['fonte']
+    
+    assert fonte(semestre='2024/1') == 'OMI Semestre 2024/1'
+    assert fonte() == 'OMI'
+    with omi_service.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE omi_settings (chiave TEXT, valore TEXT)"))
+        conn.execute(text("INSERT INTO omi_settings VALUES ('semestre_omi_corrente', '2025/1')"))
+    assert fonte() == 'OMI Semestre 2025/1'
+
+
+def test_trend_endpoint(omi_service):
+    client = TestClient(app)
+    
+    response = client.get("/api/v1/valuation/trend", params={'comune': 'pescara', 'zona': 'b1'})
+    assert response.status_code == 200
+    assert response.json()['semestri'] == 3
+    
+    assert client.get("/api/v1/valuation/trend", params={'comune': 'CHIETI'}).status_code == 404
+    assert client.get(
+        "/api/v1/valuation/trend", params={'comune': 'PESCARA', 'da_semestre': '2024-1'}
+    ).status_code == 422
@@ -0,0 +1,51 @@
+"""
+Contatori annunci mantenuti in scrittura (totali dashboard O(1))
+"""
+from app.crud import property as crud_property
+from app.models import PropertyStatus
+from tests.conftest import make_property
+
+
+def test_counters_follow_writes(db_session, owner):
+    published = make_property(db_session, owner)
+    draft = make_property(db_session, owner, status=PropertyStatus.DRAFT)
+    
+    crud_property.publish_property(db_session, draft)
+    crud_property.delete_property(db_session, published)
+    
+    for status in PropertyStatus:
+        assert crud_property.count_properties(db_session, status=status) == \
+            crud_property.count_properties(db_session, status=status, exact=True)
+    assert crud_property.count_properties(db_session, owner_id=owner.id) == 2
+    assert crud_property.count_properties_by_status(db_session, owner.id) == {
+        PropertyStatus.PUBLISHED: 1,
+        PropertyStatus.DELETED: 1,
+    }
+    
+    db_session.delete(draft)
+    db_session.commit()
+    assert crud_property.count_properties(db_session, status=PropertyStatus.PUBLISHED) == 0
+
+
+def test_rebuild_counters(db_session, owner):
+    make_property(db_session, owner)
+    make_property(db_session, owner, status=PropertyStatus.DRAFT)
+    
+    crud_property.rebuild_property_counters(db_session)
+    
+    assert crud_property.count_properties(db_session) == 2
+    assert crud_property.count_properties(db_session, owner_id=owner.id, status=PropertyStatus.DRAFT) == 1
+
+
+def test_stats_endpoint(client, db_session, owner):
+    make_property(db_session, owner)
+    make_property(db_session, owner, status=PropertyStatus.DRAFT)
+    
+    response = client.get("/api/v1/properties/stats")
+    
+    assert response.json() == {
+        "total": 2,
+        "by_status": {"published": 1, "draft": 1},
+        "published_total": 1,
+    }
+    assert int(response.headers["X-Query-Count"]) <= 3
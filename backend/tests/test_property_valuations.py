@@ -0,0 +1,155 @@
+"""
+Valutazioni salvate degli annunci: ricalcolo solo delle righe con dipendenze cambiate
+"""
+import pytest
+from sqlalchemy import text
+
+from app.crud import property as crud_property
+from app.models import PropertyValuation
+from app.schemas.property import PropertyUpdate
+from app.services import listing_metrics
+from app.services.listing_valuation import invalidate_all_valuations, invalidate_zone_valuations, parse_floor
+from app.tasks.apply_omi_changes import OmiChangeReport, apply_omi_changes
+from app.tasks.refresh_property_valuations import refresh_property_valuations
+from tests.conftest import PESCARA_B1, make_property
+
+
+@pytest.fixture
+def omi_options():
+    return {
+        'quotations': [
+            PESCARA_B1,
+            ('068028', 'PESCARA', 'C', 'C1', 'PE2', '20', 'NORMALE', 1400, 1600),
+            ('035033', "REGGIO NELL'EMILIA", 'B', 'B1', 'RE1', '20', 'NORMALE', 2000, 2400),
+        ],
+        'zones': [
+            ('068028', 'PESCARA', 'PE', 'ABRUZZO'),
+            ('035033', "REGGIO NELL'EMILIA", 'RE', 'EMILIA-ROMAGNA'),
+        ],
+        'semestre': '2025/1',
+    }
+
+
+@pytest.fixture
+def service(omi_service, monkeypatch):
+    monkeypatch.setattr(listing_metrics, 'get_valuation_service', lambda: omi_service)
+    return omi_service
+
+
+def count_valuations(monkeypatch, service):
+    calls = []
+    calculate = service.calculate_complete_valuation
+    monkeypatch.setattr(service, 'calculate_complete_valuation', lambda data: calls.append(data) or calculate(data))
+    return calls
+
+
+def test_parse_floor():
+    assert parse_floor("3° piano") == 3
+    assert parse_floor("Piano terra") == 0
+    assert parse_floor("primo") == 1
+    assert parse_floor(None) == parse_floor("attico") == 2
+
+
+def test_incremental_refresh(db_session, owner, service, monkeypatch):
+    calls = count_valuations(monkeypatch, service)
+    centro = make_property(db_session, owner, omi_zona_codice='B1')
+    periferia = make_property(db_session, owner, omi_zona_codice='C1')
+    
+    stats = refresh_property_valuations(db_session, service=service)
+    assert (stats.checked, stats.recomputed) == (2, 2)
+    stored = db_session.get(PropertyValuation, centro.id)
+    assert stored.zona_codice == 'B1' and stored.semestre == '2025/1'
+    assert (stored.comune, stored.comune_istat) == ('PESCARA', '068028')
+    assert stored.full_value == pytest.approx(200000)
+    assert stored.bare_value == stored.result['valore_fiscale']['valore_nuda_proprieta']
+    assert refresh_property_valuations(db_session, service=service).checked == 0
+    
+    # Campo non rilevante: niente da verificare
+    crud_property.update_property(db_session, centro, PropertyUpdate(title="Nuovo titolo"))
+    assert refresh_property_valuations(db_session, service=service).checked == 0
+    
+    # Stesso valore riscritto: verificato ma non ricalcolato
+    crud_property.update_property(db_session, centro, PropertyUpdate(usufructuary_age=78))
+    stats = refresh_property_valuations(db_session, service=service)
+    assert (stats.checked, stats.unchanged) == (1, 1)
+    
+    crud_property.update_property(db_session, centro, PropertyUpdate(usufructuary_age=85))
+    assert refresh_property_valuations(db_session, service=service).recomputed == 1
+    assert calls[-1].usufructuary_age == 85
+    
+    # Quotazioni cambiate solo in C1
+    assert invalidate_zone_valuations(db_session, {'068028': {'C1'}}) == 1
+    db_session.commit()
+    refresh_property_valuations(db_session, service=service)
+    assert calls[-1].zona_codice == 'C1'
+    assert len(calls) == 4
+    
+    # Nuovo tasso legale: tutte le righe
+    with service.engine.begin() as conn:
+        conn.execute(text("INSERT INTO omi_settings VALUES ('tasso_legale_corrente', '0.02')"))
+    assert refresh_property_valuations(db_session, service=service).recomputed == 2
+    assert db_session.get(PropertyValuation, periferia.id).legal_rate == 0.02
+
+
+def test_new_semester_recomputes_changed_zones_only(db_session, owner, service, monkeypatch):
+    calls = count_valuations(monkeypatch, service)
+    centro = make_property(db_session, owner, omi_zona_codice='B1')
+    periferia = make_property(db_session, owner, omi_zona_codice='C1')
+    refresh_property_valuations(db_session, service=service)
+    
+    # Import --diff del 2025/2: quotazioni cambiate solo in C1
+    with service.engine.begin() as conn:
+        conn.execute(text("UPDATE omi_settings SET valore = '2025/2' WHERE chiave = 'semestre_omi_corrente'"))
+        conn.execute(text("UPDATE omi_quotations SET prezzo_min = 1500 WHERE zona_codice = 'C1'"))
+    invalidate_zone_valuations(db_session, {'068028': {'C1'}})
+    stats = refresh_property_valuations(db_session, service=service)
+    
+    assert (stats.checked, stats.recomputed, stats.advanced) == (1, 1, 1)
+    assert calls[-1].zona_codice == 'C1' and len(calls) == 3
+    assert db_session.get(PropertyValuation, centro.id).semestre == '2025/2'
+    assert db_session.get(PropertyValuation, periferia.id).semestre == '2025/2'
+    assert refresh_property_valuations(db_session, service=service).checked == 0
+    
+    # Import completo: nessun report delle modifiche, tutte le righe
+    assert invalidate_all_valuations(db_session) == 2
+    assert refresh_property_valuations(db_session, service=service).recomputed == 2
+
+
+def test_listing_comune_resolved(db_session, owner, service):
+    listing = make_property(db_session, owner, city="Reggio Emilia", province="RE")
+    
+    refresh_property_valuations(db_session, service=service)
+    stored = db_session.get(PropertyValuation, listing.id)
+    assert (stored.comune, stored.comune_istat, stored.error) == ("REGGIO NELL'EMILIA", '035033', None)
+    assert stored.full_value == pytest.approx(220000)
+    
+    # Invalidazione per codice ISTAT, non per il nome scritto nell'annuncio
+    assert invalidate_zone_valuations(db_session, {'035033': {None}}) == 1
+    assert invalidate_zone_valuations(db_session, {}, comuni=['Reggio Emilia']) == 0
+
+
+def test_omi_changes_invalidate_resolved_comune(db_session, owner, service):
+    listing = make_property(db_session, owner, city="Reggio Emilia", province="RE")
+    refresh_property_valuations(db_session, service=service)
+    
+    # Nessun annuncio con city = nome OMI: metriche saltate, valutazione invalidata
+    report = OmiChangeReport(
+        semestre='2025/1', changed=1, comuni={"REGGIO NELL'EMILIA"}, zone={'035033': {'B1'}}
+    )
+    assert apply_omi_changes(db_session, report) == []
+    assert db_session.get(PropertyValuation, listing.id).input_hash is None
+    assert refresh_property_valuations(db_session, service=service).recomputed == 1
+
+
+def test_valuation_endpoint(client, db_session, owner, service):
+    listing = make_property(db_session, owner, omi_zona_codice='B1')
+    assert client.get(f"/api/v1/properties/{listing.id}/valuation").status_code == 404
+    
+    refresh_property_valuations(db_session, service=service)
+    response = client.get(f"/api/v1/properties/{listing.id}/valuation")
+    assert response.status_code == 200
+    assert response.json()['aggiornata'] is True
+    assert response.json()['valutazione']['omi_quotation']['zona_codice'] == 'B1'
+    
+    crud_property.update_property(db_session, listing, PropertyUpdate(surface_sqm=90))
+    assert client.get(f"/api/v1/properties/{listing.id}/valuation").json()['aggiornata'] is False
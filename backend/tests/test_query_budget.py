@@ -0,0 +1,54 @@
+"""
+Budget query SQL per gli endpoint di listing (niente N+1)
+"""
+import pytest
+
+from tests.conftest import make_property
+
+# Query massime per richiesta, indipendenti dal numero di righe restituite
+LIST_QUERY_BUDGET = 2      # immobili + copertine
+MY_QUERY_BUDGET = 3        # utente + immobili + immagini
+DETAIL_QUERY_BUDGET = 3    # immobile + immagini + update views
+
+
+@pytest.fixture
+def listings(db_session, owner):
+    return [make_property(db_session, owner, images=3) for _ in range(25)]
+
+
+@pytest.mark.parametrize("url", [
+    "/api/v1/properties/",
+    "/api/v1/properties/?city=pescara",
+    "/api/v1/properties/search",
+    "/api/v1/properties/search?min_sqm=50&city=pesc",
+])
+def test_list_endpoints_within_budget(client, listings, url):
+    response = client.get(url)
+    
+    assert response.status_code == 200
+    assert len(response.json()) == len(listings)
+    assert int(response.headers["X-Query-Count"]) <= LIST_QUERY_BUDGET
+
+
+def test_list_includes_only_cover(client, listings):
+    item = client.get("/api/v1/properties/").json()[0]
+    
+    assert item["cover_image"]["is_cover"] is True
+    assert item["cover_image"]["urls"]["thumbnail"].endswith("img_0_thumbnail.webp")
+    assert "images" not in item
+
+
+def test_my_properties_within_budget(client, listings):
+    response = client.get("/api/v1/properties/my")
+    
+    assert response.status_code == 200
+    assert all(len(p["images"]) == 3 for p in response.json())
+    assert int(response.headers["X-Query-Count"]) <= MY_QUERY_BUDGET
+
+
+def test_detail_within_budget(client, listings):
+    response = client.get(f"/api/v1/properties/{listings[0].id}")
+    
+    assert response.status_code == 200
+    assert [img["display_order"] for img in response.json()["images"]] == [0, 1, 2]
+    assert int(response.headers["X-Query-Count"]) <= DETAIL_QUERY_BUDGET
@@ -0,0 +1,86 @@
+"""
+Simulazione Monte Carlo: durata dalle tavole, rivalutazione dallo storico OMI
+"""
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app.api.endpoints import properties
+from app.services.actuarial import get_life_table
+from app.services.risk_simulation import (
+    DEFAULT_SEMESTER_VOLATILITY, appreciation_parameters, sample_lifetimes, simulate_bare_ownership_returns
+)
+from app.services.valuation_service import ValuationService
+from tests.conftest import make_property
+
+
+def test_appreciation_from_history():
+    market = appreciation_parameters([2000, 2100, None, 2150, 2300])
+    
+    assert market['fonte'] == 'omi'
+    assert market['semestri'] == 3
+    assert market['media_semestrale'] == pytest.approx(np.log(2300 / 2000) / 3)
+    assert appreciation_parameters([2000, 2100])['volatilita_semestrale'] == DEFAULT_SEMESTER_VOLATILITY
+
+
+def test_lifetimes_follow_life_table():
+    table = get_life_table()
+    years = sample_lifetimes(table, 78, 'M', 200_000, np.random.default_rng(0))
+    
+    assert years.mean() == pytest.approx(table.life_expectancy['M'][78], abs=0.05)
+
+
+def test_simulation_is_reproducible_and_fast():
+    table = get_life_table()
+    start = time.perf_counter()
+    result = simulate_bare_ownership_returns(table, 130000, 200000, 78, 'F', 0.01, 0.03, 100_000, seed=42)
+    assert time.perf_counter() - start < 1.0
+    
+    assert result == simulate_bare_ownership_returns(table, 130000, 200000, 78, 'F', 0.01, 0.03, 100_000, seed=42)
+    irr = list(result['irr'].values())
+    assert irr == sorted(irr)
+    assert result['seed'] == 42
+    assert 0 <= result['prob_perdita'] < 0.05
+    
+    # Senza rivalutazione né volatilità il multiplo è certo
+    flat = simulate_bare_ownership_returns(table, 100000, 150000, 78, semester_drift=0,
+                                           semester_volatility=1e-12, simulations=1000, seed=1)
+    assert flat['multiplo']['p5'] == flat['multiplo']['p95'] == 1.5
+    
+    with pytest.raises(ValueError):
+        simulate_bare_ownership_returns(table, 0, 150000, 78)
+
+
+def test_property_simulation_endpoint(client, db_session, owner, tmp_path, monkeypatch):
+    service = ValuationService(database_url=f"sqlite:///{tmp_path}/omi.db")
+    with service.engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE omi_quotation_history (
+                semestre TEXT, comune_descrizione TEXT, fascia TEXT, zona_codice TEXT,
+                cod_tipologia TEXT, stato TEXT, prezzo_min REAL, prezzo_max REAL
+            )
+        """))
+        for i, price in enumerate([2000, 2040, 2100, 2120, 2200]):
+            conn.execute(text("""
+                INSERT INTO omi_quotation_history VALUES
+                (:semestre, 'PESCARA', 'B', 'B1', '20', 'NORMALE', :price, :price)
+            """), {'semestre': f"{2023 + i // 2}/{i % 2 + 1}", 'price': price})
+    monkeypatch.setattr(properties, 'get_valuation_service', lambda: service)
+    listing = make_property(db_session, owner, omi_zona_codice='B1')
+    no_value = make_property(db_session, owner, full_property_value=None)
+    
+    url, params = f"/api/v1/properties/{listing.id}/simulation", {'seed': 7, 'simulazioni': 5000}
+    response = client.get(url, params=params)
+    assert response.status_code == 200
+    simulation = response.json()
+    assert simulation['rivalutazione']['fonte'] == 'omi'
+    assert simulation['rivalutazione']['zona_codice'] == 'B1'
+    assert simulation['prezzo_acquisto'] == 130000
+    assert set(simulation['irr']) == {'p5', 'p10', 'p25', 'p50', 'p75', 'p90', 'p95'}
+    assert client.get(url, params=params).json() == simulation
+    
+    assert client.get(f"/api/v1/properties/{no_value.id}/simulation").status_code == 422
+    assert client.get("/api/v1/properties/999/simulation").status_code == 404
+    service.engine.dispose()
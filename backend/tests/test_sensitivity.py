@@ -0,0 +1,74 @@
+"""
+Griglia what-if: celle coerenti con la valutazione singola, lavoro comune una volta
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.valuation_service import PropertyData
+
+
+def count_calls(monkeypatch, service, name):
+    calls = []
+    method = getattr(service, name)
+    
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+    monkeypatch.setattr(service, name, counted)
+    return calls
+
+
+def test_cells_match_single_valuations(omi_service, monkeypatch):
+    base = PropertyData(comune='PESCARA', usufructuary_sex='F')
+    quotation_calls = count_calls(monkeypatch, omi_service, 'get_omi_quotation')
+    rate_calls = count_calls(monkeypatch, omi_service, 'get_legal_rate')
+    
+    grid = omi_service.calculate_sensitivity(
+        base, ages=[70, 78, 85], conditions=['buono', 'ristrutturato'],
+        surfaces=[80, 100], prices=[100000, 140000]
+    )
+    
+    assert len(grid['celle']) == 3 * 2 * 2 * 2
+    assert len(quotation_calls) == 1 and len(rate_calls) == 1
+    
+    for cell in grid['celle'][::5]:
+        single = omi_service.calculate_complete_valuation(PropertyData(
+            comune='PESCARA', usufructuary_sex='F', usufructuary_age=cell['eta'],
+            condition=cell['stato_conservazione'], surface_sqm=cell['superficie'],
+            requested_price=cell['prezzo_richiesto']
+        ))
+        assert cell['valore_piena_proprieta'] == pytest.approx(single['stima_miapersempre']['medio'])
+        assert cell['valore_nuda_fiscale'] == pytest.approx(single['valore_fiscale']['valore_nuda_proprieta'])
+        assert cell['valore_nuda_attuariale'] == pytest.approx(single['valore_attuariale']['valore_nuda_proprieta'])
+        assert cell['deal_score'] == single['deal_score']['score']
+
+
+def test_sensitivity_endpoint(omi_service):
+    client = TestClient(app)
+    base = {'comune': 'pescara', 'superficie': 100, 'eta_usufruttuario': 78}
+    
+    response = client.post("/api/v1/valuation/sensitivity", json={
+        'base': base,
+        'eta': {'min': 70, 'max': 90, 'passo': 5},
+        'prezzo_richiesto': {'min': 100000, 'max': 150000, 'passo': 25000}
+    })
+    assert response.status_code == 200
+    grid = response.json()
+    assert grid['assi']['eta'] == [70, 75, 80, 85, 90]
+    assert grid['assi']['superficie'] == [100]
+    assert grid['celle_totali'] == 15
+    # Età più alta -> nuda proprietà fiscale più alta
+    nuda = [cell['valore_nuda_fiscale'] for cell in grid['celle'][::3]]
+    assert nuda == sorted(nuda)
+    
+    too_many = {'base': base, 'superficie': {'min': 50, 'max': 99, 'passo': 1},
+                'prezzo_richiesto': {'min': 0, 'max': 490000, 'passo': 10000},
+                'eta': {'min': 50, 'max': 55, 'passo': 1}}
+    assert client.post("/api/v1/valuation/sensitivity", json=too_many).status_code == 422
+    assert client.post("/api/v1/valuation/sensitivity", json={
+        'base': base, 'eta': {'min': 90, 'max': 70, 'passo': 1}
+    }).status_code == 422
+    assert client.post("/api/v1/valuation/sensitivity", json={
+        'base': {**base, 'comune': 'CHIETI'}
+    }).status_code == 404
@@ -0,0 +1,74 @@
+"""
+Usufrutto temporaneo: rendita in forma chiusa, limite del vitalizio, calcolo vettoriale
+"""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.actuarial import bare_ownership_factors, get_life_table
+from app.services.valuation_service import ValuationService
+
+
+def test_closed_form_and_lifetime_cap():
+    service = ValuationService(database_url="sqlite://")
+    
+    # 10 anni al 2,5%: V·r·a_n = V·(1 - 1,025^-10)
+    short = service.calculate_fiscal_value(200000, 50, legal_rate=0.025, usufruct_type='temporaneo', usufruct_years=10)
+    annuity = (1 - 1.025 ** -10) / 0.025
+    assert short['valore_usufrutto'] == pytest.approx(200000 * 0.025 * annuity)
+    assert short['coefficiente'] == pytest.approx(annuity, abs=1e-4)
+    assert short['limitato_al_vitalizio'] is False
+    
+    # A 90 anni il vitalizio (coefficiente 6) vale meno di 10 anni di rendita
+    capped = service.calculate_fiscal_value(200000, 90, legal_rate=0.025, usufruct_type='temporaneo', usufruct_years=10)
+    lifetime = service.calculate_fiscal_value(200000, 90, legal_rate=0.025)
+    assert capped['limitato_al_vitalizio'] is True
+    assert capped['valore_nuda_proprieta'] == pytest.approx(lifetime['valore_nuda_proprieta'])
+    assert lifetime['tipo_usufrutto'] == 'vitalizio'
+
+
+def test_vectorized_matches_scalar():
+    service = ValuationService(database_url="sqlite://")
+    ages = np.array([0, 20, 21, 55, 78, 92, 99, 105])
+    years = np.array([5, 30, 1, 12, 8, 3, 50, 2.5])
+    
+    shares = ValuationService.usufruct_shares(ages, 0.025, 'temporaneo', years)
+    scalar = [
+        service.calculate_fiscal_value(1.0, int(age), 0.025, 'temporaneo', float(term))['valore_usufrutto']
+        for age, term in zip(ages, years)
+    ]
+    assert shares == pytest.approx(scalar)
+    assert ValuationService.usufruct_coefficients(ages).tolist() == [
+        ValuationService.get_usufruct_coefficient(int(age))[0] for age in ages
+    ]
+
+
+def test_actuarial_term():
+    table = get_life_table()
+    lifetime, term = bare_ownership_factors(table, [60], [0.03], 'F'), bare_ownership_factors(table, [60], [0.03], 'F', term=5)
+    
+    # Al più 5 anni di attesa: nuda proprietà vale almeno 1,03^-5
+    assert term[0, 0] > lifetime[0, 0]
+    assert term[0, 0] >= 1.03 ** -5 - 1e-12
+
+
+def test_scalar_and_batch_endpoints(omi_service):
+    client = TestClient(app)
+    base = {'comune': 'PESCARA', 'superficie': 100, 'eta_usufruttuario': 60,
+            'tipo_usufrutto': 'Temporaneo', 'durata_usufrutto': 10}
+    
+    single = client.post("/api/v1/valuation/calculate", json=base)
+    assert single.status_code == 200
+    fiscal = single.json()['valutazione']['valore_fiscale']
+    assert fiscal['tipo_usufrutto'] == 'temporaneo' and fiscal['durata_anni'] == 10
+    assert single.json()['valutazione']['valore_attuariale']['durata_anni'] == 10
+    
+    grid = client.post("/api/v1/valuation/sensitivity", json={
+        'base': base, 'eta': {'min': 45, 'max': 90, 'passo': 15}
+    }).json()
+    cell = next(c for c in grid['celle'] if c['eta'] == 60)
+    assert cell['valore_nuda_fiscale'] == pytest.approx(fiscal['valore_nuda_proprieta'])
+    
+    assert client.post("/api/v1/valuation/calculate", json={**base, 'durata_usufrutto': None}).status_code == 422
+    assert client.post("/api/v1/valuation/calculate", json={**base, 'tipo_usufrutto': 'perpetuo'}).status_code == 422
@@ -0,0 +1,111 @@
+"""
+Cache delle valutazioni: chiave canonica, livelli locale/condiviso, header X-Cache
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.cache import TTLCache
+from app.main import app
+from app.services.valuation_cache import HIT, HIT_SHARED, MISS, ValuationCache, valuation_cache_key
+from app.services.valuation_service import PropertyData
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.data, self.fail = {}, fail
+    
+    def get(self, key):
+        if self.fail:
+            raise ConnectionError("down")
+        return self.data.get(key)
+    
+    def setex(self, key, ttl, value):
+        if self.fail:
+            raise ConnectionError("down")
+        self.data[key] = value
+
+
+def test_canonical_key():
+    key = valuation_cache_key(PropertyData(comune='PESCARA', surface_sqm=100), '2025/1', 0.025)
+    
+    assert key == valuation_cache_key(PropertyData(comune=' PESCARA ', surface_sqm=100.0), '2025/1', 0.025)
+    assert key != valuation_cache_key(PropertyData(comune='PESCARA', surface_sqm=101), '2025/1', 0.025)
+    assert key != valuation_cache_key(PropertyData(comune='PESCARA', surface_sqm=100), '2025/2', 0.025)
+    assert key != valuation_cache_key(PropertyData(comune='PESCARA', surface_sqm=100), '2025/1', 0.02)
+
+
+def test_shared_tier_and_failures():
+    shared = FakeRedis()
+    first = ValuationCache(TTLCache(max_entries=10, ttl=60), shared)
+    second = ValuationCache(TTLCache(max_entries=10, ttl=60), shared)
+    
+    first.set('k', {'valutazione': {'a': 1}})
+    assert first.get('k') == ({'valutazione': {'a': 1}}, HIT)
+    assert second.get('k') == ({'valutazione': {'a': 1}}, HIT_SHARED)
+    assert second.get('k')[1] == HIT
+    
+    # Livello condiviso giù: solo locale, nessun errore
+    broken = ValuationCache(TTLCache(max_entries=10, ttl=60), FakeRedis(fail=True))
+    broken.set('k', {'x': 1})
+    assert broken.get('k') == ({'x': 1}, HIT)
+    assert broken.get('missing') == (None, MISS)
+
+
+@pytest.fixture
+def omi_options():
+    return {'semestre': '2025/1'}
+
+
+def test_calculate_served_from_cache(omi_service, monkeypatch):
+    client = TestClient(app)
+    calls = []
+    calculate = omi_service.calculate_complete_valuation
+    monkeypatch.setattr(omi_service, 'calculate_complete_valuation', lambda data: calls.append(data) or calculate(data))
+    body = {'comune': 'PESCARA', 'superficie': 100, 'eta_usufruttuario': 78}
+    
+    first = client.post("/api/v1/valuation/calculate", json=body)
+    second = client.post("/api/v1/valuation/calculate", json={**body, 'superficie': 100.0})
+    assert first.headers['X-Cache'] == MISS
+    assert second.headers['X-Cache'] == HIT
+    assert second.json() == first.json()
+    assert len(calls) == 1
+    
+    # Nuovo tasso legale: nuova chiave
+    with omi_service.engine.begin() as conn:
+        conn.execute(text("INSERT INTO omi_settings VALUES ('tasso_legale_corrente', '0.02')"))
+    third = client.post("/api/v1/valuation/calculate", json=body)
+    assert third.headers['X-Cache'] == MISS
+    assert third.json()['valutazione']['valore_fiscale']['tasso_legale'] == 0.02
+    
+    # Gli errori non vanno in cache
+    missing = {**body, 'comune': 'CHIETI'}
+    assert client.post("/api/v1/valuation/calculate", json=missing).headers['X-Cache'] == MISS
+    assert client.post("/api/v1/valuation/calculate", json=missing).headers['X-Cache'] == MISS
+
+
+def test_report_is_opt_in(omi_service, monkeypatch):
+    client = TestClient(app)
+    rendered = []
+    format_report = omi_service.format_valuation_report
+    monkeypatch.setattr(omi_service, 'format_valuation_report', lambda v: rendered.append(v) or format_report(v))
+    body = {'comune': 'PESCARA', 'superficie': 100, 'eta_usufruttuario': 78}
+    
+    lean = client.post("/api/v1/valuation/calculate", json=body).json()
+    assert lean['report'] is None
+    assert rendered == []
+    
+    report_url = f"/api/v1/valuation/report/{lean['valutazione_id']}"
+    report = client.get(report_url)
+    assert report.headers['X-Cache'] == HIT
+    assert "PESCARA" in report.json()['report']
+    
+    # Generato una volta, poi riusato (anche da ?include=report)
+    full = client.post("/api/v1/valuation/calculate", params={'include': 'report'}, json=body).json()
+    assert full['report'] == report.json()['report']
+    assert full['valutazione'] == lean['valutazione']
+    assert len(rendered) == 1
+    
+    assert client.post("/api/v1/valuation/calculate", params={'include': 'pdf'}, json=body).status_code == 422
+    assert client.get("/api/v1/valuation/report/" + "0" * 64).status_code == 404
+    assert client.get("/api/v1/valuation/report/not-an-id").status_code == 422
@@ -0,0 +1,156 @@
+"""
+Zona OMI da coordinate: lettura KML, R-tree STR, punto-in-poligono
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+import import_omi_data as omi
+from app.services.listing_metrics import refresh_listing_zone
+from app.services.valuation_service import PropertyData, ValuationService
+from app.services.zone_locator import STRtree, ZoneLocator
+
+# B1: quadrato con un buco centrale coperto da B2; C1: quadrato a est
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+  <Placemark>
+    <name>PE00000001</name>
+    <Polygon>
+      <outerBoundaryIs><LinearRing><coordinates>
+        14.20,42.45 14.22,42.45 14.22,42.47 14.20,42.47 14.20,42.45
+      </coordinates></LinearRing></outerBoundaryIs>
+      <innerBoundaryIs><LinearRing><coordinates>
+        14.205,42.455 14.215,42.455 14.215,42.465 14.205,42.465 14.205,42.455
+      </coordinates></LinearRing></innerBoundaryIs>
+    </Polygon>
+  </Placemark>
+  <Placemark>
+    <name>Zona B2</name>
+    <ExtendedData><SchemaData>
+      <SimpleData name="CODCOM">068028</SimpleData>
+      <SimpleData name="ZONA">B2</SimpleData>
+    </SchemaData></ExtendedData>
+    <Polygon><outerBoundaryIs><LinearRing><coordinates>
+      14.205,42.455 14.215,42.455 14.215,42.465 14.205,42.465 14.205,42.455
+    </coordinates></LinearRing></outerBoundaryIs></Polygon>
+  </Placemark>
+  <Placemark>
+    <name>PE00000009</name>
+    <Polygon><outerBoundaryIs><LinearRing><coordinates>
+      14.22,42.45 14.24,42.45 14.24,42.47 14.22,42.47 14.22,42.45
+    </coordinates></LinearRing></outerBoundaryIs></Polygon>
+  </Placemark>
+  <Placemark>
+    <name>XX99999999</name>
+    <Polygon><outerBoundaryIs><LinearRing><coordinates>
+      0,0 1,0 1,1 0,0
+    </coordinates></LinearRing></outerBoundaryIs></Polygon>
+  </Placemark>
+</Document>
+</kml>
+"""
+
+ZONES = [
+    # link_zona, zona_codice, fascia, prezzo_min, prezzo_max
+    ('PE00000001', 'B1', 'B', 2000, 2400),
+    ('PE00000002', 'B2', 'B', 2600, 3000),
+    ('PE00000009', 'C1', 'C', 1500, 1700),
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/omi.db")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE omi_zones (
+                link_zona TEXT, zona_codice TEXT, fascia TEXT, comune_istat TEXT, comune_descrizione TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE omi_quotations (
+                comune_istat TEXT, comune_descrizione TEXT, fascia TEXT, zona_codice TEXT,
+                link_zona TEXT, cod_tipologia TEXT, stato TEXT, prezzo_min REAL, prezzo_max REAL
+            )
+        """))
+        for link, zona, fascia, prezzo_min, prezzo_max in ZONES:
+            row = {'link': link, 'zona': zona, 'fascia': fascia, 'min': prezzo_min, 'max': prezzo_max}
+            conn.execute(text(
+                "INSERT INTO omi_zones VALUES (:link, :zona, :fascia, '068028', 'PESCARA')"
+            ), row)
+            conn.execute(text("""
+                INSERT INTO omi_quotations VALUES
+                ('068028', 'PESCARA', :fascia, :zona, :link, '20', 'NORMALE', :min, :max)
+            """), row)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def geometry_file(engine, tmp_path):
+    (tmp_path / "zone.kml").write_text(KML, encoding='utf-8')
+    path = str(tmp_path / "zone_geometry.npz")
+    
+    counts = omi.export_zone_geometry(engine, str(tmp_path / "zone.kml"), path)
+    
+    assert counts == {'zones': 3, 'polygons': 3, 'vertices': 20}
+    return path
+
+
+def test_locate_respects_holes(geometry_file):
+    locator = ZoneLocator(geometry_file)
+    
+    assert locator.locate(42.452, 14.202).zona_codice == 'B1'
+    # Nel buco di B1 c'è B2 (associata per codice ISTAT + zona)
+    assert locator.locate(42.46, 14.21).link_zona == 'PE00000002'
+    assert locator.locate(42.46, 14.23).fascia == 'C'
+    assert locator.locate(45.46, 9.19) is None
+
+
+def test_strtree_matches_brute_force():
+    rng = np.random.default_rng(7)
+    corners = rng.uniform(0, 100, (5000, 2))
+    boxes = np.hstack([corners, corners + rng.uniform(0.1, 3, (5000, 2))])
+    tree = STRtree(boxes)
+    
+    assert len(tree.levels) > 2
+    for x, y in rng.uniform(0, 100, (200, 2)):
+        inside = (boxes[:, 0] <= x) & (boxes[:, 2] >= x) & (boxes[:, 1] <= y) & (boxes[:, 3] >= y)
+        assert sorted(tree.query_point(x, y)) == np.flatnonzero(inside).tolist()
+
+
+def test_valuation_uses_zone_from_coordinates(engine, geometry_file, tmp_path):
+    service = ValuationService(
+        database_url=str(engine.url),
+        snapshot_dir=str(tmp_path / "no-snapshot"),
+        geometry_file=geometry_file
+    )
+    
+    # Senza coordinate: prima zona della fascia B
+    assert service.calculate_complete_valuation(
+        PropertyData(comune='PESCARA')
+    )['omi_quotation']['zona_codice'] == 'B1'
+    
+    located = service.calculate_complete_valuation(
+        PropertyData(comune='Pescara', latitude=42.46, longitude=14.21)
+    )
+    assert located['omi_quotation']['zona_codice'] == 'B2'
+    assert located['zona_omi']['link_zona'] == 'PE00000002'
+    
+    # Coordinate di un altro comune: ignorate
+    assert service.locate_omi_zone(42.46, 14.21, comune='CHIETI') is None
+
+
+def test_listing_zone_from_coordinates(geometry_file):
+    locator = ZoneLocator(geometry_file)
+    listing = SimpleNamespace(latitude=42.46, longitude=14.23, omi_link_zona=None, omi_zona_codice=None)
+    
+    refresh_listing_zone(listing, locator)
+    assert (listing.omi_link_zona, listing.omi_zona_codice) == ('PE00000009', 'C1')
+    
+    listing.latitude = None
+    refresh_listing_zone(listing, locator)
+    assert listing.omi_link_zona is None
@@ -192,7 +192,8 @@ export interface ValuationResponse {
     };
     deal_score?: DealScore;
   };
-  report: string;
+  valutazione_id: string;
+  report: string | null; // only with ?include=report
 }
 
 export interface DealScore {